@@ -1,7 +1,24 @@
 import enum
+import heapq
+import itertools
 import random
-from collections import defaultdict
-from typing import Callable
+import sys
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Iterable, Sequence
+from functools import partial
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from blackjack.state import (
+    NUM_STATES,
+    decode_hand,
+    decode_state,
+    encode_hand,
+    encode_state,
+    state_from_index,
+    state_index,
+)
 
 
 class Suit(enum.Enum):
@@ -28,26 +45,86 @@ class Rank(enum.IntEnum):
 
 
 class Card:
-    def __init__(self, suit: Suit, rank: Rank):
-        self.__suit = suit
-        self.__rank = rank
+    """トランプのカード。
+    スートとランクの組み合わせごとに一つだけ生成された不変なインスタンスを使い回す。
+    Card(suit, rank)やCard.from_index(index)は新しいインスタンスを作らず、
+    事前に生成した52枚のうちの一枚を返す。
+    """
 
-    def __eq__(self, other):
-        return (self.__suit, self.__rank) == (other.__suit, other.__rank)
+    __slots__ = ("_suit", "_rank", "_index", "_point", "_as_string", "_hash")
+
+    # 事前に生成した全てのカード。インデックスはDeck()の並び順と一致する
+    _instances: tuple["Card", ...] = ()
+
+    def __new__(cls, suit: Suit, rank: Rank):
+        if not 1 <= rank <= len(Rank):
+            raise ValueError(f"invalid rank {rank}")
+        return cls._instances[(suit.value - 1) * len(Rank) + rank - 1]
+
+    @classmethod
+    def _create(cls, suit: Suit, rank: Rank, index: int) -> "Card":
+        card = object.__new__(cls)
+        replace_patterns = {
+            1: "A",
+            11: "J",
+            12: "Q",
+            13: "K",
+        }
+        for name, value in (
+            ("_suit", suit),
+            ("_rank", rank),
+            ("_index", index),
+            ("_point", min(rank, 10)),
+            ("_as_string", f"{suit.name}_{replace_patterns.get(rank, rank)}"),
+            ("_hash", hash((suit, rank))),
+        ):
+            object.__setattr__(card, name, value)
+        return card
+
+    @classmethod
+    def from_index(cls, index: int) -> "Card":
+        """0から51までのインデックスに対応するカードを取得する。
+
+        Args:
+            index (int): カードのインデックス
+
+        Returns:
+            Card: インデックスに対応するカード
+        """
+        return cls._instances[index]
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # 復元時も同じインスタンスを返す
+        return (Card.from_index, (self._index,))
 
     def __hash__(self):
-        return hash((self.__suit, self.__rank))
+        return self._hash
 
     def __repr__(self) -> str:
-        return self.as_string
+        return self._as_string
+
+    @property
+    def suit(self) -> Suit:
+        return self._suit
 
     @property
-    def suit(self):
-        return self.__suit
+    def rank(self) -> Rank:
+        return self._rank
 
     @property
-    def rank(self):
-        return self.__rank
+    def index(self) -> int:
+        """このカードのインデックスを取得する。
+
+        Returns:
+            int: 0から51までのインデックス
+        """
+        return self._index
 
     @property
     def point(self) -> int:
@@ -56,7 +133,7 @@ class Card:
         Returns:
             int: カードのポイント
         """
-        return min(self.__rank, 10)
+        return self._point
 
     @property
     def as_string(self) -> str:
@@ -65,25 +142,26 @@ class Card:
         Returns:
             str: カードの文字列表現
         """
-        replace_patterns = {
-            1: "A",
-            11: "J",
-            12: "Q",
-            13: "K",
-        }
-        if self.__rank in replace_patterns:
-            return f"{self.__suit.name}_{replace_patterns[self.__rank]}"
+        return self._as_string
 
-        return f"{self.__suit.name}_{self.__rank}"
+
+Card._instances = tuple(
+    Card._create(suit, rank, index)
+    for index, (suit, rank) in enumerate(itertools.product(Suit, Rank))
+)
+# 全てのカードをDeck()の並び順に並べたもの
+CARDS = Card._instances
 
 
 class Deck:
-    def __init__(self):
-        self.cards = [Card(suit, rank) for suit in Suit for rank in Rank]
+    def __init__(self, rng=None):
+        self.cards = list(CARDS)
+        # 乱数生成器（randomモジュールまたはblackjack.rng.RandomStream）
+        self.rng = rng if rng is not None else random
 
     def shuffle(self) -> None:
         """デッキをシャッフルする。"""
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
 
     def pop(self) -> Card:
         """デッキの一番上（一番後ろ）のカードを取り出す。
@@ -94,36 +172,135 @@ class Deck:
         return self.cards.pop()
 
 
+class Shoe:
+    """複数のデッキをまとめたシュー。
+    ラウンドをまたいで使い回し、配ったカードの割合がpenetrationに達した後の
+    ラウンドの開始時にのみシャッフルし直す。ラウンドの途中でカードが尽きた場合は、
+    そのラウンドで配ったカードを除いた捨て札のみをシャッフルし直すため、
+    各ラウンドの開始時にはstart_roundを呼び出す。
+    """
+
+    def __init__(self, num_decks: int = 6, penetration: float = 0.75, rng=None):
+        if num_decks < 1:
+            raise ValueError(f"num_decks must be positive, got {num_decks}")
+        if not 0.0 <= penetration <= 1.0:
+            raise ValueError(f"penetration must be in [0, 1], got {penetration}")
+
+        self.num_decks = num_decks
+        self.penetration = penetration
+        self.rng = rng if rng is not None else random
+        self._all_cards = list(CARDS) * num_decks
+        # 残りのカードがこの枚数以下になったらシャッフルし直す
+        self._reshuffle_at = len(self._all_cards) - int(
+            len(self._all_cards) * penetration
+        )
+        self.cards = []
+        # 現在のラウンドで配ったカード。手札にあるため、シャッフルし直しても戻さない
+        self._in_play: list[Card] = []
+        self.shuffle()
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    @property
+    def needs_shuffle(self) -> bool:
+        """配ったカードの割合がpenetrationに達したかどうか。
+
+        Returns:
+            bool: シャッフルし直す必要があるかどうか
+        """
+        return len(self.cards) <= self._reshuffle_at
+
+    def shuffle(self) -> None:
+        """配ったカードを全て戻してシューをシャッフルする。"""
+        self.cards[:] = self._all_cards
+        self.rng.shuffle(self.cards)
+        self._in_play.clear()
+
+    def start_round(self) -> bool:
+        """ラウンドの開始時に呼び出し、必要であればシャッフルし直す。
+
+        Returns:
+            bool: シャッフルし直したかどうか
+        """
+        self._in_play.clear()
+        if self.needs_shuffle:
+            self.shuffle()
+            return True
+        return False
+
+    def pop(self) -> Card:
+        """シューの一番上（一番後ろ）のカードを取り出す。
+        ラウンドの途中でカードが尽きた場合は、現在のラウンドで配ったカードを
+        除いてシャッフルし直してから取り出す。
+
+        Raises:
+            ValueError: 現在のラウンドで全てのカードを配り終えた場合
+
+        Returns:
+            Card: 取り出されたカード
+        """
+        if not self.cards:
+            discards = Counter(self._all_cards)
+            discards.subtract(self._in_play)
+            self.cards[:] = discards.elements()
+            if not self.cards:
+                raise ValueError("all cards in the shoe are in play")
+            self.rng.shuffle(self.cards)
+        card = self.cards.pop()
+        self._in_play.append(card)
+        return card
+
+
 class Environment:
     """Agentの置かれた環境を表す。
     カードの数字は区別するが、スートは区別しない。
-    順番は区別しない。
+    順番は区別しないが、同じ数字のカードの枚数は区別する。
     相手と自分のカードは区別する。
     """
 
     def __init__(self, hands: list[Card], opponent_hands: list[Card]):
         self.hands = tuple(hands)  # immutable
         self.opponent_hands = tuple(opponent_hands)
+        # 自分と相手のランクごとの枚数を一つの整数に符号化し、生成時に一度だけ計算する
+        self.key = encode_state(
+            encode_hand(c.rank for c in self.hands),
+            encode_hand(c.rank for c in self.opponent_hands),
+        )
+        self._hash = hash(self.key)
+
+    @classmethod
+    def from_key(cls, key: int) -> "Environment":
+        """状態の符号からEnvironmentを復元する。
+        スートは区別しないため、適当なスートのカードを用いる。
+
+        Args:
+            key (int): 状態の符号
+
+        Returns:
+            Environment: 符号に対応するEnvironment
+        """
+        hands = []
+        for code in decode_state(key):
+            counts = decode_hand(code)
+            hands.append(
+                [
+                    Card(suit, rank)
+                    for rank, count in zip(Rank, counts)
+                    for suit, _ in zip(itertools.cycle(Suit), range(count))
+                ]
+            )
+        return cls(*hands)
 
     def __eq__(self, other):
-        # 自分のカードのランクと相手のカードのランクそれぞれが集合として一致するとき
+        # 自分のカードと相手のカードのランクごとの枚数がそれぞれ一致するとき
         # Agentの動作する環境が同値であるとみなす
-        return (
-            frozenset([c.rank for c in self.hands]),
-            frozenset([c.rank for c in self.opponent_hands]),
-        ) == (
-            frozenset([c.rank for c in other.hands]),
-            frozenset([c.rank for c in other.opponent_hands]),
-        )
+        if not isinstance(other, Environment):
+            return NotImplemented
+        return self.key == other.key
 
     def __hash__(self):
-        # 自分のカードのランクの集合と相手のカードのランクの集合の組み合わせによりハッシュを計算する
-        return hash(
-            (
-                frozenset([c.rank for c in self.hands]),
-                frozenset([c.rank for c in self.opponent_hands]),
-            )
-        )
+        return self._hash
 
     def __repr__(self):
         hands = [c.suit.name + "_" + str(c.rank.value) for c in self.hands]
@@ -138,15 +315,100 @@ class Action(enum.Enum):
     stand = enum.auto()
 
 
+# Actionから配列のインデックスへの対応
+ACTION_INDEX = {action: i for i, action in enumerate(Action)}
+
+
 class Reward(enum.IntEnum):
     win = 1
     tie = 0
     lose = -1
 
 
+class Hand:
+    """プレイヤーの手札。
+    カードを加えるたびに総ポイントを更新するため、総ポイントの取得はO(1)で行える。
+    エースは1ポイントとして数えるが、11ポイントとして数えても21を超えない場合は
+    11ポイントとして数える（ソフトハンド）。
+    """
+
+    __slots__ = ("cards", "_hard_points", "_has_ace")
+
+    def __init__(self, cards: Iterable[Card] = ()):
+        self.cards = []
+        self._hard_points = 0
+        self._has_ace = False
+        for card in cards:
+            self.add(card)
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def add(self, card: Card) -> None:
+        """手札にカードを一枚加える。
+
+        Args:
+            card (Card): 加えるカード
+        """
+        self.cards.append(card)
+        self._hard_points += card.point
+        if card.rank == Rank.ace:
+            self._has_ace = True
+
+    def clear(self) -> None:
+        """手札を空にする。"""
+        self.cards.clear()
+        self._hard_points = 0
+        self._has_ace = False
+
+    @property
+    def hard_points(self) -> int:
+        """エースを全て1ポイントとして数えた総ポイントを取得する。
+
+        Returns:
+            int: 総ポイント
+        """
+        return self._hard_points
+
+    @property
+    def is_soft(self) -> bool:
+        """エースを11ポイントとして数えているかどうか。
+
+        Returns:
+            bool: ソフトハンドかどうか
+        """
+        return self._has_ace and self._hard_points <= 11
+
+    @property
+    def total_points(self) -> int:
+        """エースを有利な方で数えた総ポイントを取得する。
+
+        Returns:
+            int: 総ポイント
+        """
+        if self.is_soft:
+            return self._hard_points + 10
+        return self._hard_points
+
+
 class BasePlayer:
     def __init__(self):
-        self.hands = []
+        self.hand = Hand()
+
+    @property
+    def hands(self) -> list[Card]:
+        """プレイヤーの手札のカードを取得する。
+
+        Returns:
+            list[Card]: 手札のカード
+        """
+        return self.hand.cards
+
+    @hands.setter
+    def hands(self, cards: Iterable[Card]) -> None:
+        self.hand.clear()
+        for card in cards:
+            self.hand.add(card)
 
     @property
     def total_points(self) -> int:
@@ -155,24 +417,28 @@ class BasePlayer:
         Returns:
             int: 総ポイント
         """
-        return sum([card.point for card in self.hands])
+        return self.hand.total_points
 
-    def draw(self, deck: Deck, display_card: bool = True, verbose: bool = True) -> None:
+    def draw(
+        self,
+        deck: Union[Deck, Shoe],
+        display_card: bool = True,
+        listeners: Sequence = (),
+    ) -> None:
         """デッキから一枚カードを引く。
 
         Args:
-            deck (Deck): デッキ
+            deck (Union[Deck, Shoe]): デッキ
+            display_card (bool, optional): 表向きに引くかどうか. Defaults to True.
+            listeners (Sequence, optional): 引いたカードを通知する
+                events.GameListener. Defaults to ().
         """
         new_card = deck.pop()
-        self.hands.append(new_card)
-
-        class_name = type(self).__name__
+        self.hand.add(new_card)
 
-        if verbose:
-            if display_card:
-                print(f"{class_name}は{new_card}を引きました。")
-            else:
-                print(f"{class_name}はカードを引きました。")
+        if listeners:
+            for listener in listeners:
+                listener.on_draw(self, new_card, display_card)
 
 
 class Player(BasePlayer):
@@ -203,8 +469,9 @@ class Table:
     def __init__(self):
         # 全てのEnvironment, Actionペアに対してゼロで初期化する
         # ref: https://stackoverflow.com/questions/5029934/defaultdict-of-defaultdict
-        self._table = defaultdict(lambda: defaultdict(float))
-        self._count = defaultdict(lambda: defaultdict(int))
+        # lambdaではなくpartialを用いることで、pickleで別のプロセスに渡せる
+        self._table = defaultdict(partial(defaultdict, float))
+        self._count = defaultdict(partial(defaultdict, int))
 
     def update(
         self, envs: list[Environment], actions: list[Action], reward: Reward
@@ -218,18 +485,45 @@ class Table:
             )
             self._count[env][action] += 1
 
-    def __getitem__(self, key) -> defaultdict[Action, float]:
-        return self._table[key]
+    def merge(self, other: "Table") -> None:
+        """他のTableの評価値を回数で重み付けして取り込む。
+        両方のTableに登録された全てのRewardを平均したものが新しい評価値となる。
 
-    def show(self, k=5) -> None:
+        Args:
+            other (Table): 取り込むTable
+        """
+        for env, counts in other._count.items():
+            for action, count in counts.items():
+                if count == 0:
+                    continue
+                old_value = self._table[env][action]
+                old_count = self._count[env][action]
+                self._table[env][action] = (
+                    old_value * old_count + other._table[env][action] * count
+                ) / (old_count + count)
+                self._count[env][action] += count
+
+    def __getitem__(self, key) -> dict[Action, float]:
+        # 参照によって新しいEnvironmentやActionが追加されないよう、
+        # 未登録のものは0として新しい辞書を返す
+        values = self._table.get(key, {})
+        return {action: values.get(action, 0.0) for action in Action}
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def show(self, k=5, rng=None) -> None:
         """現在の評価値テーブルを表示する。
         k個のEnvironmentにおける各Actionの評価値を表示する。
 
         Args:
             k (int, optional): いくつのEnvironmentに関して表示するか. Defaults to 5.
+            rng (optional): Environmentを選ぶ乱数生成器.
+                Defaults to None (randomモジュール).
 
         """
-        envs = random.sample(list(self._table), k)
+        rng = rng if rng is not None else random
+        envs = rng.sample(list(self._table), min(k, len(self._table)))
         values = [self._table[env] for env in envs]
         counts = [self._count[env] for env in envs]
 
@@ -242,16 +536,281 @@ class Table:
             print("\n" + "-" * 100 + "\n")
 
 
-class Agent(BasePlayer):
+class BoundedTable(Table):
+    """保持するEnvironmentの数に上限を設けたTable。
+    上限を超えた場合は、evictionに従って選んだEnvironmentの評価値を破棄する。
+
+    - "lru": 最も長い間、更新されていないEnvironmentから破棄する。
+      評価や表示のための参照では順番を変えず、方策の評価が後の学習で破棄される
+      Environmentに影響しないようにする。学習中に参照したEnvironmentは
+      エピソードの終了時に更新されるため、参照とともに新しいものとなる
+    - "lfu": 選ばれた回数が最も少ないEnvironmentから破棄する。
+      回数が同じ場合は古く追加されたものから破棄する
+
+    上限を超えるたびに一つずつ破棄するのではなく、上限よりcapacity * slackだけ
+    少なくなるまでまとめて破棄する。
+
+    Args:
+        capacity (int): 保持するEnvironmentの数の上限
+        eviction (str, optional): 破棄するEnvironmentの選び方. Defaults to "lru".
+        slack (float, optional): 一度に余分に破棄する割合. Defaults to 0.05.
+    """
+
+    EVICTIONS = ("lru", "lfu")
+
+    def __init__(self, capacity: int, eviction: str = "lru", slack: float = 0.05):
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        if eviction not in self.EVICTIONS:
+            raise ValueError(
+                f"eviction must be one of {self.EVICTIONS}, got {eviction}"
+            )
+        super().__init__()
+        self.capacity = capacity
+        self.eviction = eviction
+        self.slack = slack
+        self.evictions = 0
+        # 更新された順に並べたEnvironment
+        self._recency = OrderedDict()
+
+    def update(
+        self, envs: list[Environment], actions: list[Action], reward: Reward
+    ) -> None:
+        super().update(envs, actions, reward)
+        for env in envs:
+            self._touch(env)
+        self._evict_if_full()
+
+    def merge(self, other: Table) -> None:
+        super().merge(other)
+        for env in other._count:
+            self._touch(env)
+        self._evict_if_full()
+
+    def _touch(self, env: Environment) -> None:
+        self._recency[env] = None
+        self._recency.move_to_end(env)
+
+    def _evict_if_full(self) -> None:
+        if len(self._recency) <= self.capacity:
+            return
+        target = self.capacity - int(self.capacity * self.slack)
+        num_evictions = len(self._recency) - max(target, 0)
+
+        if self.eviction == "lru":
+            victims = list(itertools.islice(self._recency, num_evictions))
+        else:
+            # _tableの順（追加された順）で回数が同じものは古いものが先に選ばれる
+            victims = heapq.nsmallest(
+                num_evictions,
+                self._table,
+                key=lambda env: sum(self._count[env].values()),
+            )
+
+        for env in victims:
+            del self._table[env]
+            del self._count[env]
+            del self._recency[env]
+        self.evictions += len(victims)
+
+    def memory_bytes(self) -> int:
+        """評価値の保持に用いているメモリのおおよそのバイト数を求める。
+        辞書とEnvironmentのオブジェクトの大きさを合計する。
+
+        Returns:
+            int: バイト数
+        """
+        total = sum(map(sys.getsizeof, (self._table, self._count, self._recency)))
+        for env in self._table:
+            total += sys.getsizeof(self._table[env]) + sys.getsizeof(self._count[env])
+            total += sys.getsizeof(env) + sys.getsizeof(env.__dict__)
+            total += sys.getsizeof(env.hands) + sys.getsizeof(env.opponent_hands)
+        return total
+
+    def info(self) -> dict:
+        """保持しているEnvironmentの数、破棄した数、メモリの使用量を取得する。
+
+        Returns:
+            dict: 統計
+        """
+        return {
+            "states": len(self),
+            "capacity": self.capacity,
+            "eviction": self.eviction,
+            "evictions": self.evictions,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class DenseTable:
+    """Tableと同じ評価値を、事前に確保したNumPy配列に保存する。
+    状態のインデックスとActionのインデックスで配列を参照する。
+    Rewardの合計と回数を保持し、その比を評価値とする。
+    相手の手札が一枚以下のEnvironmentのみ扱える。
+    """
+
     def __init__(self):
+        self._sum = np.zeros((NUM_STATES, len(Action)))
+        self._count = np.zeros((NUM_STATES, len(Action)), dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, sums: np.ndarray, counts: np.ndarray) -> "DenseTable":
+        """既存の配列をそのまま用いるDenseTableを作る。配列はコピーしない。
+
+        Args:
+            sums (np.ndarray): Rewardの合計 (NUM_STATES, len(Action))
+            counts (np.ndarray): 回数 (NUM_STATES, len(Action))
+
+        Raises:
+            ValueError: 配列の形が合わない場合
+
+        Returns:
+            DenseTable: 配列を保持するDenseTable
+        """
+        shape = (NUM_STATES, len(Action))
+        if sums.shape != shape or counts.shape != shape:
+            raise ValueError(
+                f"expected arrays of shape {shape}, got {sums.shape} and {counts.shape}"
+            )
+        table = cls.__new__(cls)
+        table._sum = sums
+        table._count = counts
+        return table
+
+    @staticmethod
+    def index(env: Environment) -> int:
+        """Environmentに対応する配列のインデックスを取得する。
+
+        Args:
+            env (Environment): Agentの置かれた環境
+
+        Returns:
+            int: 状態のインデックス
+        """
+        return state_index(env.key)
+
+    @property
+    def values(self) -> np.ndarray:
+        """全ての状態とActionの評価値を取得する。一度も選ばれていないものは0とする。
+
+        Returns:
+            np.ndarray: 評価値 (NUM_STATES, len(Action))
+        """
+        return self.lookup(slice(None))
+
+    def lookup(self, states: np.ndarray) -> np.ndarray:
+        """複数の状態の評価値をまとめて取得する。
+
+        Args:
+            states (np.ndarray): 状態のインデックス (n,)
+
+        Returns:
+            np.ndarray: 各状態の各Actionの評価値 (n, len(Action))
+        """
+        sums = self._sum[states]
+        counts = self._count[states]
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    def update(
+        self, envs: list[Environment], actions: list[Action], reward: Reward
+    ) -> None:
+        states = np.array([self.index(env) for env in envs], dtype=np.int64)
+        action_indices = np.array([ACTION_INDEX[action] for action in actions])
+        self.update_batch(states, action_indices, np.full(len(states), reward.value))
+
+    def update_batch(
+        self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray
+    ) -> None:
+        """複数の状態とActionのペアにまとめてRewardを加える。
+        同じペアが複数回含まれていてもよい。
+
+        Args:
+            states (np.ndarray): 状態のインデックス (n,)
+            actions (np.ndarray): ActionのインデックスACTION_INDEX (n,)
+            rewards (np.ndarray): Reward (n,)
+        """
+        np.add.at(self._sum, (states, actions), rewards)
+        np.add.at(self._count, (states, actions), 1)
+
+    def merge(self, other: "DenseTable") -> None:
+        """他のDenseTableのRewardの合計と回数を足し合わせる。
+        同じ経験を一つのDenseTableに登録した場合と完全に一致する。
+
+        Args:
+            other (DenseTable): 取り込むDenseTable
+        """
+        self._sum += other._sum
+        self._count += other._count
+
+    def __getitem__(self, key: Environment) -> dict[Action, float]:
+        index = self.index(key)
+        counts = self._count[index]
+        sums = self._sum[index]
+        return {
+            action: sums[i] / counts[i] if counts[i] > 0 else 0.0
+            for action, i in ACTION_INDEX.items()
+        }
+
+    def __len__(self) -> int:
+        # 一度でも選ばれたActionをもつ状態の数
+        return int(np.count_nonzero(self._count.any(axis=1)))
+
+    def show(self, k=5, rng=None) -> None:
+        """現在の評価値テーブルを表示する。
+        k個のEnvironmentにおける各Actionの評価値を表示する。
+
+        Args:
+            k (int, optional): いくつのEnvironmentに関して表示するか. Defaults to 5.
+            rng (optional): Environmentを選ぶ乱数生成器.
+                Defaults to None (randomモジュール).
+
+        """
+        rng = rng if rng is not None else random
+        visited = np.flatnonzero(self._count.any(axis=1))
+        indices = rng.sample(list(visited), min(k, len(visited)))
+        values = self.values
+
+        print("\nShowing table after training...\n")
+
+        for index in indices:
+            print(Environment.from_key(state_from_index(index)))
+            print(
+                "Count of each action taken:",
+                {a: int(self._count[index, i]) for a, i in ACTION_INDEX.items()},
+            )
+            print(
+                "Average reward of each action:",
+                {a: float(values[index, i]) for a, i in ACTION_INDEX.items()},
+            )
+            print("\n" + "-" * 100 + "\n")
+
+
+class Agent(BasePlayer):
+    def __init__(
+        self,
+        table: Optional[Union[Table, DenseTable]] = None,
+        experience_log=None,
+        rng=None,
+        learner=None,
+    ):
         super().__init__()
-        self.table = Table()
+        # Tableの実装は辞書を用いるTableと配列を用いるDenseTableから選べる
+        self.table = table if table is not None else Table()
+        # 評価値の更新則（blackjack.learners.Learner）。Noneの場合はTable.updateで
+        # 全期間のRewardを平均する
+        if learner is not None and not isinstance(self.table, DenseTable):
+            raise TypeError("learner requires a DenseTable")
+        self.learner = learner
+        # 登録した経験を追記するログ（blackjack.replay.ExperienceWriter）
+        self.experience_log = experience_log
+        # Actionの評価値が同じ場合と探索時に用いる乱数生成器
+        self.rng = rng if rng is not None else random
 
     def reset_hands(self) -> None:
         """新しいゲームをプレイする際に、
         過去のゲームで引いたカードの情報を削除する。
         """
-        self.hands = []
+        self.hand.clear()
 
     def register_experience(
         self, envs: list[Environment], actions: list[Action], reward: Reward
@@ -259,7 +818,12 @@ class Agent(BasePlayer):
         """勝敗決定時にそれまでにAgentがとったEnvironmentと
         Actionのペアに対してRewardを割り当ててTableを更新する。
         """
-        self.table.update(envs, actions, reward)
+        if self.learner is not None:
+            self.learner.update(self.table, envs, actions, reward)
+        else:
+            self.table.update(envs, actions, reward)
+        if self.experience_log is not None:
+            self.experience_log.append(envs, actions, reward)
 
     def _strategy(self, env: Environment) -> Action:
         """過去のRewardをもとに、このEnvironmentに対する
@@ -275,7 +839,7 @@ class Agent(BasePlayer):
 
         # Actionの評価値が同じ場合はランダムに選ぶ
         if scores[Action.draw] == scores[Action.stand]:
-            if random.random() > 0.5:
+            if self.rng.random() > 0.5:
                 return Action.draw
             else:
                 return Action.stand
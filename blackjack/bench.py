@@ -0,0 +1,270 @@
+"""主要な処理の速度とメモリ使用量を測定するベンチマーク。
+
+結果はJSONで保存し、--baselineで過去の結果と比較できる。
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import numpy as np
+
+from blackjack.base import (
+    ACTION_INDEX,
+    Agent,
+    Deck,
+    DenseTable,
+    Environment,
+    Shoe,
+    Table,
+)
+from blackjack.cli import run_episode
+from blackjack.policy import FrozenPolicy
+from blackjack.rng import RandomStream
+from blackjack.simulator import play_batch, register_batch, shuffled_decks
+
+
+def measure_rate(func: Callable[[], object], number: int, repeat: int = 3) -> float:
+    """funcをnumber回呼び出すのにかかった時間から、一秒あたりの回数を求める。
+    repeat回測定して最も速かったものを採用する。
+
+    Args:
+        func (Callable[[], object]): 測定する関数
+        number (int): 一回の測定で呼び出す回数
+        repeat (int, optional): 測定の回数. Defaults to 3.
+
+    Returns:
+        float: 一秒あたりの回数
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return number / best if best > 0 else float("inf")
+
+
+def _sample_experiences(num_episodes: int, seed: int) -> list:
+    """ベンチマークに用いる(envs, actions, reward)をランダムなプレイで集める。"""
+    rng = np.random.default_rng(seed)
+    decks = shuffled_decks(num_episodes, rng)
+    result = play_batch(Agent(), decks, np.full(num_episodes, 0.5), rng)
+    return [result.episode(i) for i in range(len(result))]
+
+
+def bench_environment(experiences: list, number: int) -> dict[str, float]:
+    envs = [env for env_list, _, _ in experiences for env in env_list]
+    env = envs[0]
+    hands, opponent_hands = list(env.hands), list(env.opponent_hands)
+    return {
+        "environment_hash_per_sec": measure_rate(lambda: hash(env), number),
+        "environment_eq_per_sec": measure_rate(lambda: env == envs[-1], number),
+        "environment_init_per_sec": measure_rate(
+            lambda: Environment(hands, opponent_hands), number
+        ),
+    }
+
+
+def bench_table(experiences: list, number: int) -> dict[str, float]:
+    results = {}
+    num_tuples = sum(len(actions) for _, actions, _ in experiences)
+
+    for name, factory in (("table", Table), ("dense_table", DenseTable)):
+        def update_all():
+            table = factory()
+            for envs, actions, reward in experiences:
+                table.update(envs, actions, reward)
+            return table
+
+        rate = measure_rate(update_all, 1)
+        results[f"{name}_updates_per_sec"] = rate * num_tuples
+
+        table = update_all()
+        envs = [env for env_list, _, _ in experiences for env in env_list]
+        index = iter(range(number))
+
+        def lookup():
+            return table[envs[next(index) % len(envs)]]
+
+        results[f"{name}_lookups_per_sec"] = measure_rate(lookup, number, repeat=1)
+
+    # DenseTable.update_batchで全ての経験をまとめて書き込む
+    states, actions, rewards = [], [], []
+    for envs, action_list, reward in experiences:
+        for env, action in zip(envs, action_list):
+            states.append(DenseTable.index(env))
+            actions.append(ACTION_INDEX[action])
+            rewards.append(reward.value)
+    states, actions, rewards = map(np.array, (states, actions, rewards))
+    table = DenseTable()
+    rate = measure_rate(lambda: table.update_batch(states, actions, rewards), 1)
+    results["dense_table_batch_updates_per_sec"] = rate * len(states)
+    rate = measure_rate(lambda: table.lookup(states), 1)
+    results["dense_table_batch_lookups_per_sec"] = rate * len(states)
+    return results
+
+
+def bench_policy(experiences: list, number: int) -> dict[str, float]:
+    """Agent.draw_againによる一回ずつの推論と、FrozenPolicy.decideによる推論を比較する。"""
+    table = DenseTable()
+    for envs, actions, reward in experiences:
+        table.update(envs, actions, reward)
+    agent = Agent(table)
+    envs = [env for env_list, _, _ in experiences for env in env_list]
+    index = iter(range(number))
+
+    def draw_again():
+        return agent.draw_again(envs[next(index) % len(envs)])
+
+    policy = FrozenPolicy.freeze(table)
+    states = np.array([DenseTable.index(env) for env in envs])
+    u_tie = np.random.default_rng(0).random(len(states))
+    rate = measure_rate(lambda: policy.decide(states, u_tie), 10)
+    return {
+        "agent_decisions_per_sec": measure_rate(draw_again, number, repeat=1),
+        "frozen_policy_decisions_per_sec": rate * len(states),
+        "frozen_policy_freeze_per_sec": measure_rate(
+            lambda: FrozenPolicy.freeze(table), 10
+        ),
+    }
+
+
+def bench_memory(experiences: list) -> dict[str, float]:
+    """Tableに保存した状態一つあたりのバイト数を測定する。"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = Table()
+    for envs, actions, reward in experiences:
+        table.update(envs, actions, reward)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    dense_table = DenseTable()
+    for envs, actions, reward in experiences:
+        dense_table.update(envs, actions, reward)
+    dense_bytes = dense_table._sum.nbytes + dense_table._count.nbytes
+
+    return {
+        "table_states": len(table._table),
+        "table_bytes_per_state": (after - before) / len(table._table),
+        "dense_table_states": len(dense_table),
+        "dense_table_bytes_per_state": dense_bytes / len(dense_table),
+    }
+
+
+def bench_deck(number: int) -> dict[str, float]:
+    deck = Deck()
+    shoe = Shoe(num_decks=6, penetration=0.75)
+
+    def shoe_round():
+        shoe.start_round()
+        for _ in range(6):
+            shoe.pop()
+
+    return {
+        "deck_init_per_sec": measure_rate(Deck, number),
+        "deck_shuffle_per_sec": measure_rate(deck.shuffle, number),
+        "shoe_rounds_per_sec": measure_rate(shoe_round, number),
+    }
+
+
+def bench_rng(number: int) -> dict[str, float]:
+    """RandomStream.randomとrandom.randomの一様乱数一つあたりの速度を比較する。"""
+    stream = RandomStream(0)
+    return {
+        "random_module_draws_per_sec": measure_rate(random.random, number),
+        "random_stream_draws_per_sec": measure_rate(stream.random, number),
+    }
+
+
+def bench_episodes(num_episodes: int, batch_size: int) -> dict[str, float]:
+    results = {}
+
+    agent = Agent()
+    shoe = Shoe(num_decks=1, penetration=0.0)
+
+    def object_episode():
+        shoe.start_round()
+        run_episode(agent, shoe, epsilon=0.1)
+
+    results["object_episodes_per_sec"] = measure_rate(
+        object_episode, num_episodes, repeat=1
+    )
+
+    for name, factory in (("table", Table), ("dense_table", DenseTable)):
+        agent = Agent(factory())
+        rng = np.random.default_rng(0)
+
+        def batch():
+            decks = shuffled_decks(batch_size, rng)
+            result = play_batch(agent, decks, np.full(batch_size, 0.1), rng)
+            register_batch(agent, result)
+
+        num_batches = max(1, num_episodes // batch_size)
+        rate = measure_rate(batch, num_batches, repeat=1)
+        results[f"batch_{name}_episodes_per_sec"] = rate * batch_size
+
+    return results
+
+
+def run(quick: bool = False) -> dict[str, float]:
+    """全てのベンチマークを実行する。
+
+    Args:
+        quick (bool, optional): 回数を減らして短時間で実行するかどうか. Defaults to False.
+
+    Returns:
+        dict[str, float]: 測定結果
+    """
+    scale = 0.01 if quick else 1.0
+    number = max(100, int(200000 * scale))
+    experiences = _sample_experiences(max(100, int(20000 * scale)), seed=0)
+
+    results = {}
+    results.update(bench_environment(experiences, number))
+    results.update(bench_table(experiences, number))
+    results.update(bench_policy(experiences, number))
+    results.update(bench_memory(experiences))
+    results.update(bench_deck(max(100, int(50000 * scale))))
+    results.update(bench_rng(number))
+    results.update(bench_episodes(max(100, int(20000 * scale)), batch_size=1000))
+    return results
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="ベンチマークを実行する。")
+    parser.add_argument("--output", help="結果を保存するJSONのパス")
+    parser.add_argument("--baseline", help="比較する過去の結果のJSONのパス")
+    parser.add_argument("--quick", action="store_true", help="短時間で実行する")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    for name, value in results.items():
+        line = f"{name:40s} {value:16,.1f}"
+        if name in baseline and baseline[name]:
+            line += f"  ({value / baseline[name]:.2f}x)"
+        print(line)
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,109 @@
+"""DenseTableのRewardの合計と回数をバイナリ形式で保存・読み込みする。
+
+ファイルは固定長のヘッダと、それに続くRewardの合計(float64)と回数(int64)の
+配列からなる。配列はヘッダの直後にそのまま並べるため、np.memmapで
+コピーせずに読み込める。
+"""
+import os
+import struct
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import Action, DenseTable
+from blackjack.state import NUM_STATES
+
+MAGIC = b"BJTABLE\0"
+VERSION = 1
+# magic, version, 状態数, Action数, 学習済みのエピソード数
+_HEADER = struct.Struct("<8sIQIQ")
+HEADER_SIZE = 64
+
+
+class CheckpointError(ValueError):
+    """チェックポイントのファイルが不正な場合に送出される。"""
+
+
+def save_table(table: DenseTable, path: str, episodes: int = 0) -> None:
+    """DenseTableをファイルに保存する。
+    一時ファイルに書き込んでから置き換えるため、途中で中断しても元のファイルは壊れない。
+
+    Args:
+        table (DenseTable): 保存するDenseTable
+        path (str): 保存先のパス
+        episodes (int, optional): 学習済みのエピソード数. Defaults to 0.
+    """
+    header = _HEADER.pack(MAGIC, VERSION, NUM_STATES, len(Action), episodes)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(np.ascontiguousarray(table._sum, dtype="<f8").tobytes())
+        f.write(np.ascontiguousarray(table._count, dtype="<i8").tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_episodes(path: str) -> int:
+    """チェックポイントに記録された学習済みのエピソード数を取得する。
+
+    Args:
+        path (str): チェックポイントのパス
+
+    Returns:
+        int: 学習済みのエピソード数
+    """
+    with open(path, "rb") as f:
+        return _read_header(f.read(HEADER_SIZE))
+
+
+def _read_header(header: bytes) -> int:
+    if len(header) < HEADER_SIZE:
+        raise CheckpointError("checkpoint is truncated")
+    magic, version, num_states, num_actions, episodes = _HEADER.unpack_from(header)
+    if magic != MAGIC:
+        raise CheckpointError("not a table checkpoint")
+    if version != VERSION:
+        raise CheckpointError(f"unsupported checkpoint version {version}")
+    if (num_states, num_actions) != (NUM_STATES, len(Action)):
+        raise CheckpointError(
+            f"checkpoint has shape {(num_states, num_actions)}, "
+            f"expected {(NUM_STATES, len(Action))}"
+        )
+    return episodes
+
+
+def load_table(path: str, mmap_mode: Optional[str] = "r") -> DenseTable:
+    """チェックポイントからDenseTableを読み込む。
+
+    Args:
+        path (str): チェックポイントのパス
+        mmap_mode (Optional[str], optional): np.memmapのmode。
+            "r"は読み込み専用で複数のプロセスから同じファイルを共有できる。
+            "c"は書き込みをメモリ上にのみ反映する。
+            Noneの場合はメモリ上にコピーする. Defaults to "r".
+
+    Raises:
+        CheckpointError: ファイルが不正な場合
+
+    Returns:
+        DenseTable: 読み込んだDenseTable
+    """
+    read_episodes(path)
+    shape = (NUM_STATES, len(Action))
+    size = NUM_STATES * len(Action) * 8
+    if os.path.getsize(path) != HEADER_SIZE + 2 * size:
+        raise CheckpointError("checkpoint has unexpected size")
+
+    if mmap_mode is None:
+        with open(path, "rb") as f:
+            f.seek(HEADER_SIZE)
+            sums = np.fromfile(f, dtype="<f8", count=shape[0] * shape[1])
+            counts = np.fromfile(f, dtype="<i8", count=shape[0] * shape[1])
+        return DenseTable.from_arrays(sums.reshape(shape), counts.reshape(shape))
+
+    sums = np.memmap(path, dtype="<f8", mode=mmap_mode, offset=HEADER_SIZE, shape=shape)
+    counts = np.memmap(
+        path, dtype="<i8", mode=mmap_mode, offset=HEADER_SIZE + size, shape=shape
+    )
+    return DenseTable.from_arrays(sums, counts)
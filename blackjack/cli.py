@@ -1,14 +1,36 @@
-import random
+import argparse
+from typing import Optional, Union
 
+import numpy as np
 from tqdm import tqdm
 
-from blackjack.base import Action, Agent, Dealer, Deck, Environment, Player, Reward
+from blackjack.base import (
+    Action,
+    Agent,
+    BoundedTable,
+    Deck,
+    DenseTable,
+    Player,
+    Reward,
+    Shoe,
+)
+from blackjack.checkpoint import load_table, read_episodes, save_table
+from blackjack.dealer import DealerCache
+from blackjack.engine import BlackjackEnv
+from blackjack.evaluation import evaluate
+from blackjack.events import JsonTranscriptWriter, TranscriptWriter
+from blackjack.learners import LEARNERS, create_learner
+from blackjack.parallel import train_parallel
+from blackjack.profiling import Profiler
+from blackjack.replay import ExperienceWriter
+from blackjack.rng import RandomStream
+from blackjack.shared import train_shared
+from blackjack.simulator import epsilon_schedule, train_batch
 from blackjack.strategy import ALLOWED_STRATEGIES, input_strategy, random_strategy
+from blackjack.training import train_until
 
 
 def play():
-    over = False
-
     input_ = input(f"Choose player strategy. {ALLOWED_STRATEGIES} > ")
 
     while input_ not in ALLOWED_STRATEGIES:
@@ -23,166 +45,435 @@ def play():
 
     deck = Deck()
     player = Player(player_strategy)
-    dealer = Dealer()
+    # 入力を求める前に表示されるよう、一行ずつ書き出す
+    env = BlackjackEnv(deck, player, listeners=[TranscriptWriter(buffer_size=1)])
 
     deck.shuffle()
-
-    player.draw(deck)
-    dealer.draw(deck)
-
-    player.draw(deck)
-    dealer.draw(deck, display_card=False)
+    env.reset()
+
+    done = False
+    while not done:
+        action = Action.draw if player.draw_again() else Action.stand
+        _, _, done = env.step(action)
+
+
+def run_episode(
+    agent: Agent,
+    deck: Union[Deck, Shoe, BlackjackEnv],
+    epsilon: float = 0.0,
+    learn: bool = True,
+    profiler: Optional[Profiler] = None,
+) -> Reward:
+    """シャッフル済みのデッキを用いてAgentとDealerのゲームを一回行う。
+
+    Args:
+        agent (Agent): プレイするAgent
+        deck (Union[Deck, Shoe, BlackjackEnv]): シャッフル済みのデッキ。
+            BlackjackEnvを渡した場合はそのデッキと手札を使い回す
+        epsilon (float, optional): Epsilon-Greedyのepsilon. Defaults to 0.0.
+        learn (bool, optional): 結果をTableに登録するかどうか. Defaults to True.
+        profiler (Optional[Profiler], optional): 各フェーズの時間を記録する. Defaults to None.
+
+    Returns:
+        Reward: Agentから見たゲームの結果
+    """
+    if profiler is not None:
+        t = profiler.now()
+
+    env = deck if isinstance(deck, BlackjackEnv) else BlackjackEnv(deck, agent)
+    # dealerの2枚目はagentには見えない
+    envs = [env.reset()]
+    actions = []
+
+    if profiler is not None:
+        t = profiler.lap("deal", t)
 
     while True:
-        print(f"現在の総ポイントは{player.total_points}です。")
-        if not player.draw_again():
-            break
-
-        player.draw(deck)
-
-        if player.total_points > 21:
-            print("Dealerの勝ちです。")
-            over = True
-            break
-
-    if not over:
-
-        while dealer.total_points < 17:
-            dealer.draw(deck)
-
-            if dealer.total_points > 21:
-                print("Playerの勝ちです。")
-                over = True
-                break
-
-    if not over:
-
-        if dealer.total_points > player.total_points:
-            print("Dealerの勝ちです。")
-        elif dealer.total_points < player.total_points:
-            print("Playerの勝ちです。")
+        # Epsilon-Greedy
+        # 探索時は常にカードを引く
+        if epsilon > 0 and agent.rng.random() < epsilon:
+            random_strategy(agent.rng)
+            action = Action.draw
         else:
-            print("引き分けです。")
+            action = Action.draw if agent.draw_again(envs[-1]) else Action.stand
+            if profiler is not None:
+                t = profiler.lap("strategy", t)
 
+        actions.append(action)
+        observation, reward, done = env.step(action)
 
-def train():
-    num_plays_train = 10000
+        if profiler is not None:
+            t = profiler.lap("player" if action == Action.draw else "dealer", t)
+        if done:
+            break
+        envs.append(observation)
+
+    if learn:
+        agent.register_experience(envs, actions, reward)
+
+    if profiler is not None:
+        profiler.lap("update", t)
+        profiler.count("decisions", len(actions))
+
+    return reward
+
+
+def run_evaluation(agent: Agent, args: argparse.Namespace):
+    """bj-trainの引数に従ってAgentを評価する。
+    --eval-precisionを省略した場合はevaluateの既定の精度で評価する。
+    """
+    precision = args.eval_precision if args.eval_precision is not None else 0.01
+    return evaluate(
+        agent,
+        precision=precision,
+        confidence=args.eval_confidence,
+        threshold=args.eval_threshold,
+        seed=args.seed,
+        dealer_cache=DealerCache() if args.eval_expected else None,
+    )
+
+
+def train(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Agentを学習させる。")
+    parser.add_argument(
+        "--engine",
+        choices=("object", "batch"),
+        default="object",
+        help="objectは一回ずつ、batchはNumPyで複数のゲームを同時にプレイする。"
+        "二つは異なる乱数列を用い、batchはバッチの途中でTableを更新しないため、"
+        "同じ--seedでも結果は一致せず、統計的に同等となる",
+    )
+    parser.add_argument(
+        "--table",
+        choices=("dict", "dense"),
+        default="dict",
+        help="dictは辞書、denseはNumPy配列に評価値を保存する",
+    )
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        default=None,
+        help="dictで保持するEnvironmentの数の上限。超えた場合は--evictionに従って破棄する",
+    )
+    parser.add_argument("--eviction", choices=BoundedTable.EVICTIONS, default="lru")
+    parser.add_argument(
+        "--learner",
+        choices=LEARNERS,
+        default="average",
+        help="評価値の更新則。averageは全期間の平均、mcは一定のステップサイズの"
+        "モンテカルロ法、sarsaはSARSA(λ)、qはQ(λ)。average以外はdenseが必要",
+    )
+    parser.add_argument("--alpha", type=float, default=0.05, help="更新則のステップサイズ")
+    parser.add_argument("--lam", type=float, default=0.8, help="sarsaとqのtraceの減衰率")
+    parser.add_argument(
+        "--episodes",
+        type=int,
+        default=None,
+        help="学習するエピソード数。既定は10000で、--time-budgetと--convergeでは上限なし",
+    )
+    parser.add_argument("--test-episodes", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--decks",
+        type=int,
+        default=1,
+        help="objectで用いるシューのデッキ数。batchは常に1デッキを毎回シャッフルする",
+    )
+    parser.add_argument(
+        "--penetration",
+        type=float,
+        default=0.0,
+        help="シューをシャッフルし直すまでに配るカードの割合。0の場合は毎回シャッフルする。"
+        "objectでのみ使える",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="2以上の場合はbatchとdenseを用いて複数のプロセスで学習する",
+    )
+    parser.add_argument(
+        "--shared",
+        action="store_true",
+        help="--workersの各プロセスが、共有メモリ上の一つのTableを同時に更新する",
+    )
+    parser.add_argument(
+        "--stripes",
+        type=int,
+        default=0,
+        help="--sharedで書き込み時にロックをとるstripeの数。0の場合はロックをとらない",
+    )
+    parser.add_argument("--save", help="学習したTableを保存するパス")
+    parser.add_argument(
+        "--save-every",
+        type=int,
+        default=0,
+        help="指定したエピソードごとに--saveへ保存する",
+    )
+    parser.add_argument(
+        "--resume",
+        help="保存したTableから学習を再開する。--episodesは再開前を含めた総数",
+    )
+    parser.add_argument("--log", help="学習に用いた経験を追記するログのパス")
+    parser.add_argument(
+        "--transcript",
+        help="学習中のゲームの進行を一行に一つのJSONで書き出すパス。objectでのみ使える",
+    )
+    parser.add_argument(
+        "--profile",
+        help="各フェーズの時間とカウンタの要約を書き出すJSONのパス",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        default=0,
+        help="指定したエピソードごとにスナップショットをとり--profileへ書き出す",
+    )
+    parser.add_argument(
+        "--eval-precision",
+        type=float,
+        default=None,
+        help="指定した場合は--test-episodesの代わりに、勝率などの信頼区間の半幅が"
+        "この値以下になるまで評価する。--eval-thresholdか--eval-expectedのみを"
+        "指定した場合は0.01",
+    )
+    parser.add_argument("--eval-confidence", type=float, default=0.95)
+    parser.add_argument(
+        "--eval-threshold",
+        type=float,
+        default=None,
+        help="--test-episodesの代わりに評価し、勝率がこの値より高いか低いかを"
+        "逐次確率比検定で判定できたら打ち切る",
+    )
+    parser.add_argument(
+        "--eval-expected",
+        action="store_true",
+        help="--test-episodesの代わりに評価し、勝敗をDealerの結果の分布から"
+        "求めた確率で数える",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help="学習時間の上限（秒）。batchでのみ使える",
+    )
+    parser.add_argument(
+        "--converge",
+        action="store_true",
+        help="方策の変化が小さいwindowが--patience回続いたら学習を打ち切る",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=10000,
+        help="--time-budgetと--convergeで進捗を表示し収束を判定する間隔のエピソード数",
+    )
+    parser.add_argument("--patience", type=int, default=3)
+    parser.add_argument(
+        "--decay",
+        type=float,
+        default=0.7,
+        help="--time-budgetと--convergeでwindowごとにepsilonに掛ける減衰率",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.005,
+        help="変化しなかったとみなす、訪れた状態のうち方策が変わった割合",
+    )
+    args = parser.parse_args(argv)
+
+    budgeted = args.time_budget is not None or args.converge
+    if budgeted and (args.engine != "batch" or args.workers > 1):
+        parser.error(
+            "--time-budget and --converge require --engine batch without --workers"
+        )
+    if args.workers > 1 and (args.engine, args.table) != ("batch", "dense"):
+        parser.error("--workers requires --engine batch --table dense")
+    if args.learner != "average" and (args.table != "dense" or args.workers > 1):
+        parser.error("--learner requires --table dense without --workers")
+    if args.shared and args.workers < 2:
+        parser.error("--shared requires --workers 2 or more")
+    if args.capacity is not None and args.table != "dict":
+        parser.error("--capacity requires --table dict")
+    if (args.save or args.resume) and args.table != "dense":
+        parser.error("--save and --resume require --table dense")
+    if args.log and args.workers > 1:
+        parser.error("--log cannot be used with --workers")
+    if args.engine == "batch" and (args.decks != 1 or args.penetration != 0.0):
+        # batchのデッキはゲームごとに独立しており、シューの状態を持ち越せない
+        parser.error("--decks and --penetration require --engine object")
+    if args.transcript and args.engine != "object":
+        parser.error("--transcript requires --engine object")
+
+    # いずれかの評価の設定を指定した場合は--test-episodesの代わりにevaluateで評価する
+    eval_requested = (
+        args.eval_precision is not None
+        or args.eval_threshold is not None
+        or args.eval_expected
+    )
+
+    num_plays_train = args.episodes if args.episodes is not None else 10000
     num_explores = num_plays_train / 2
-    num_plays_test = 1000
-    agent = Agent()
+    num_plays_test = args.test_episodes
+    if args.table == "dense":
+        agent = Agent(
+            DenseTable(), learner=create_learner(args.learner, args.alpha, args.lam)
+        )
+    elif args.capacity is not None:
+        agent = Agent(BoundedTable(args.capacity, args.eviction))
+    else:
+        agent = Agent()
 
     epsilon = 0.8
     factor = 0.99
-
-    for episode in tqdm(range(num_plays_train), desc="Training..."):
-        over = False
-        deck = Deck()
-        dealer = Dealer()
-        agent.reset_hands()
-        envs = []
-        actions = []
-
-        deck.shuffle()
-
-        agent.draw(deck, verbose=False)
-        dealer.draw(deck, verbose=False)
-
-        agent.draw(deck, verbose=False)
-        dealer.draw(deck, verbose=False)
-
-        # dealerの2枚目はagentには見えない
-        envs.append(Environment(agent.hands, dealer.hands[:-1]))
-
-        while True:
-            # Epsilon-Greedy
-            if random.random() < epsilon:
-                random_strategy()
-            else:
-                if not agent.draw_again(envs[-1]):
-                    actions.append(Action.stand)
-                    break
-
-            agent.draw(deck, verbose=False)
-            actions.append(Action.draw)
-
-            if agent.total_points > 21:
-                over = True
-                agent.register_experience(envs, actions, Reward.lose)
-                break
-
-            envs.append(Environment(agent.hands, dealer.hands[:-1]))
-
-        if not over:
-
-            while dealer.total_points < 17:
-                dealer.draw(deck, verbose=False)
-
-                if dealer.total_points > 21:
-                    over = True
-                    agent.register_experience(envs, actions, Reward.win)
-                    break
-
-        if not over:
-
-            if dealer.total_points > agent.total_points:
-                agent.register_experience(envs, actions, Reward.lose)
-            elif dealer.total_points < agent.total_points:
-                agent.register_experience(envs, actions, Reward.win)
+    if not budgeted:
+        epsilons = epsilon_schedule(num_plays_train, epsilon, factor, num_explores)
+
+    start = 0
+    if args.resume:
+        agent.table = load_table(args.resume, mmap_mode=None)
+        start = read_episodes(args.resume)
+        if not budgeted or args.episodes is not None:
+            start = min(start, num_plays_train)
+
+    def checkpoint(episodes: int) -> None:
+        if args.save:
+            save_table(agent.table, args.save, episodes)
+
+    if args.log:
+        agent.experience_log = ExperienceWriter(args.log)
+
+    chunk = args.save_every if args.save_every > 0 else num_plays_train
+    profiler = Profiler(args.profile_every, args.profile) if args.profile else None
+
+    if args.engine == "batch":
+        # 再開した場合は、最初から学習した場合と異なる乱数を用いる
+        rng = np.random.default_rng(None if args.seed is None else [args.seed, start])
+        if budgeted:
+            report = train_until(
+                agent,
+                rng,
+                max_episodes=None if args.episodes is None else args.episodes - start,
+                max_seconds=args.time_budget,
+                window=args.window,
+                patience=args.patience if args.converge else None,
+                tolerance=args.tolerance,
+                epsilon=epsilon,
+                decay=args.decay,
+                batch_size=args.batch_size,
+                profiler=profiler,
+                callback=print,
+                start_episode=start,
+            )
+            print(
+                f"{report.episodes}エピソードを{report.elapsed:.1f}秒で学習しました"
+                f"（{report.episodes_per_sec:,.0f}エピソード/秒, {report.stopped_by}）"
+            )
+            checkpoint(start + report.episodes)
+        elif args.workers > 1:
+            if args.shared:
+                table = train_shared(
+                    num_plays_train - start,
+                    args.workers,
+                    epsilon,
+                    factor,
+                    args.batch_size,
+                    None if args.seed is None else args.seed + start,
+                    args.stripes,
+                    start_episode=start,
+                )
             else:
-                agent.register_experience(envs, actions, Reward.tie)
-
-        if episode > num_explores:
-            epsilon *= factor
-
-    agent.table.show()
+                table = train_parallel(
+                    num_plays_train - start,
+                    args.workers,
+                    epsilon,
+                    factor,
+                    args.batch_size,
+                    None if args.seed is None else args.seed + start,
+                    start_episode=start,
+                )
+            agent.table.merge(table)
+            checkpoint(num_plays_train)
+        else:
+            for chunk_start in range(start, num_plays_train, chunk):
+                chunk_end = min(chunk_start + chunk, num_plays_train)
+                train_batch(
+                    agent,
+                    epsilons[chunk_start:chunk_end],
+                    args.batch_size,
+                    rng,
+                    profiler=profiler,
+                )
+                checkpoint(chunk_end)
+
+        if agent.experience_log is not None:
+            agent.experience_log.close()
+            agent.experience_log = None
+        if profiler is not None:
+            profiler.snapshot(agent.table)
+        agent.table.show(rng=RandomStream(rng))
+        if isinstance(agent.table, BoundedTable):
+            print(agent.table.info())
+
+        if eval_requested:
+            print(run_evaluation(agent, args))
+            return
+
+        rewards = train_batch(
+            agent, np.zeros(num_plays_test), args.batch_size, rng, learn=False
+        )
+        win_count = int(np.sum(rewards == Reward.win))
+        print(f"Agentの勝率: {win_count / num_plays_test:.3f}")
+        return
+
+    # シャッフル・探索・同点時の選択は全て一つの乱数列から引く
+    stream = RandomStream(None if args.seed is None else [args.seed, start])
+    agent.rng = stream
+    shoe = Shoe(args.decks, args.penetration, rng=stream)
+    transcript = None
+    if args.transcript:
+        transcript = JsonTranscriptWriter(open(args.transcript, "w", encoding="utf-8"))
+    listeners = [transcript] if transcript is not None else None
+    env = BlackjackEnv(shoe, agent, listeners=listeners)
+
+    for episode in tqdm(range(start, num_plays_train), desc="Training..."):
+        if profiler is not None:
+            t = profiler.now()
+            shoe.start_round()
+            profiler.lap("shuffle", t)
+            run_episode(agent, env, epsilons[episode], profiler=profiler)
+            profiler.episode_done(agent.table)
+        else:
+            shoe.start_round()
+            run_episode(agent, env, epsilons[episode])
+
+        if args.save_every > 0 and (episode + 1) % args.save_every == 0:
+            checkpoint(episode + 1)
+
+    checkpoint(num_plays_train)
+    if agent.experience_log is not None:
+        agent.experience_log.close()
+        agent.experience_log = None
+    if transcript is not None:
+        # テストのゲームは書き出さない
+        transcript.close()
+        env.listeners.clear()
+    if profiler is not None:
+        profiler.snapshot(agent.table)
+    agent.table.show(rng=stream)
+    if isinstance(agent.table, BoundedTable):
+        print(agent.table.info())
+
+    if eval_requested:
+        print(run_evaluation(agent, args))
+        return
 
     win_count = 0
     for _ in tqdm(range(num_plays_test), desc="Testing..."):
-        over = False
-        deck = Deck()
-        dealer = Dealer()
-        agent.reset_hands()
-        envs = []
-
-        deck.shuffle()
-
-        agent.draw(deck, verbose=False)
-        dealer.draw(deck, verbose=False)
-
-        agent.draw(deck, verbose=False)
-        dealer.draw(deck, verbose=False)
-
-        envs.append(Environment(agent.hands, dealer.hands[:-1]))
-
-        while True:
-            if not agent.draw_again(envs[-1]):
-                break
-
-            agent.draw(deck, verbose=False)
-
-            if agent.total_points > 21:
-                over = True
-                break
-
-            envs.append(Environment(agent.hands, dealer.hands[:-1]))
-
-        if not over:
-
-            while dealer.total_points < 17:
-                dealer.draw(deck, verbose=False)
-
-                if dealer.total_points > 21:
-                    over = True
-                    win_count += 1
-                    break
-
-        if not over:
-
-            if dealer.total_points > agent.total_points:
-                pass
-            elif dealer.total_points < agent.total_points:
-                win_count += 1
-            else:
-                pass
+        shoe.start_round()
+        if run_episode(agent, env, learn=False) == Reward.win:
+            win_count += 1
 
     print(f"Agentの勝率: {win_count / num_plays_test:.3f}")
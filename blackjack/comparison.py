@@ -0,0 +1,197 @@
+"""二つの方策を同じカードの並びでプレイさせ、期待Rewardの差を比較する。
+
+両方の方策に同一のシャッフル済みデッキと同一の乱数を与える（共通乱数法）ため、
+配られたカードの運による結果のばらつきが差をとることで打ち消され、
+別々のゲームで比較する場合よりも少ないゲーム数で差を検出できる。
+"""
+import argparse
+import math
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import Agent, DenseTable
+from blackjack.checkpoint import load_table
+from blackjack.dealer import DealerCache
+from blackjack.simulator import expected_rewards, play_batch, shuffled_decks
+
+
+def random_agent() -> Agent:
+    """random_strategyと同じく、毎回1/2の確率でカードを引くAgentを作る。
+    空のDenseTableでは評価値が常に同じになるため、Actionはランダムに選ばれる。
+
+    Returns:
+        Agent: ランダムに行動するAgent
+    """
+    return Agent(DenseTable())
+
+
+@dataclass
+class ComparisonResult:
+    """方策Aと方策Bの比較の結果。
+
+    Attributes:
+        games (int): 比較したゲームの数（一つの方策あたり）
+        mean_a (float): 方策Aの平均Reward
+        mean_b (float): 方策Bの平均Reward
+        std_error (float): 同じゲームどうしの差の平均の標準誤差
+        unpaired_std_error (float): 別々のゲームで比較した場合の差の標準誤差
+        confidence (float): 信頼水準
+    """
+
+    games: int
+    mean_a: float
+    mean_b: float
+    std_error: float
+    unpaired_std_error: float
+    confidence: float = 0.95
+
+    @property
+    def difference(self) -> float:
+        """方策Aの平均Rewardから方策Bの平均Rewardを引いた値。"""
+        return self.mean_a - self.mean_b
+
+    @property
+    def interval(self) -> tuple[float, float]:
+        """差の信頼区間。"""
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        margin = z * self.std_error
+        return self.difference - margin, self.difference + margin
+
+    @property
+    def variance_reduction(self) -> float:
+        """別々のゲームで比較した場合に、同じ精度を得るのに必要なゲーム数の倍率。"""
+        if self.std_error == 0:
+            return math.inf
+        return (self.unpaired_std_error / self.std_error) ** 2
+
+    @property
+    def significant(self) -> bool:
+        """差の信頼区間が0を含まないかどうか。"""
+        low, high = self.interval
+        return low > 0 or high < 0
+
+    def __str__(self) -> str:
+        low, high = self.interval
+        return "\n".join(
+            [
+                f"{self.games}ゲーム",
+                f"A: {self.mean_a:+.4f}, B: {self.mean_b:+.4f}",
+                f"差: {self.difference:+.4f} [{low:+.4f}, {high:+.4f}] "
+                f"({self.confidence:.0%})",
+                f"分散の削減: {self.variance_reduction:.1f}倍",
+            ]
+        )
+
+
+def _rewards(result, dealer_cache: Optional[DealerCache]) -> np.ndarray:
+    if dealer_cache is not None:
+        return expected_rewards(result, dealer_cache)
+    return result.rewards.astype(np.float64)
+
+
+def compare(
+    agent_a: Agent,
+    agent_b: Optional[Agent] = None,
+    num_games: int = 100000,
+    batch_size: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    dealer_cache: Optional[DealerCache] = None,
+) -> ComparisonResult:
+    """二つのAgentに同じデッキの並びで探索を行わずにプレイさせ、平均Rewardの差を求める。
+    Tableは更新しない。
+
+    Args:
+        agent_a (Agent): 方策A
+        agent_b (Optional[Agent], optional): 方策B。Noneの場合はランダムな方策.
+            Defaults to None.
+        num_games (int, optional): ゲームの数. Defaults to 100000.
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 10000.
+        confidence (float, optional): 信頼水準. Defaults to 0.95.
+        seed (Optional[int], optional): 乱数のシード. Defaults to None.
+        dealer_cache (Optional[DealerCache], optional): 指定した場合は、Dealerの結果を
+            分布の期待値で置き換えたRewardを比較し、分散をさらに小さくする.
+            Defaults to None.
+
+    Returns:
+        ComparisonResult: 比較の結果
+    """
+    if agent_b is None:
+        agent_b = random_agent()
+
+    rng = np.random.default_rng(seed)
+    # 各統計量の合計: A, B, 差のRewardとその二乗
+    sums = np.zeros(6)
+    for start in range(0, num_games, batch_size):
+        size = min(batch_size, num_games - start)
+        decks = shuffled_decks(size, rng)
+        epsilons = np.zeros(size)
+        # 同点時のランダムな選択にも同じ乱数を用いる
+        batch_seed = rng.integers(2**63)
+        rewards_a, rewards_b = (
+            _rewards(
+                play_batch(agent, decks, epsilons, np.random.default_rng(batch_seed)),
+                dealer_cache,
+            )
+            for agent in (agent_a, agent_b)
+        )
+        differences = rewards_a - rewards_b
+        for i, x in enumerate((rewards_a, rewards_b, differences)):
+            sums[2 * i] += x.sum()
+            sums[2 * i + 1] += (x**2).sum()
+
+    means = sums[0::2] / num_games
+    variances = sums[1::2] / num_games - means**2
+    if num_games > 1:
+        variances *= num_games / (num_games - 1)
+    variances = np.maximum(variances, 0.0)
+
+    return ComparisonResult(
+        games=num_games,
+        mean_a=float(means[0]),
+        mean_b=float(means[1]),
+        std_error=math.sqrt(variances[2] / num_games),
+        unpaired_std_error=math.sqrt((variances[0] + variances[1]) / num_games),
+        confidence=confidence,
+    )
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="保存した二つのTableの方策を同じデッキの並びで比較する。"
+    )
+    parser.add_argument("table_a", help="方策AのTableのパス")
+    parser.add_argument(
+        "table_b",
+        nargs="?",
+        default="random",
+        help="方策BのTableのパス。randomの場合はランダムな方策",
+    )
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--expected",
+        action="store_true",
+        help="Dealerの結果を分布の期待値で置き換えて比較する",
+    )
+    args = parser.parse_args(argv)
+
+    agent_a = Agent(load_table(args.table_a))
+    agent_b = None if args.table_b == "random" else Agent(load_table(args.table_b))
+    dealer_cache = DealerCache() if args.expected else None
+    print(
+        compare(
+            agent_a,
+            agent_b,
+            args.games,
+            args.batch_size,
+            args.confidence,
+            args.seed,
+            dealer_cache,
+        )
+    )
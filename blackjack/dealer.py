@@ -0,0 +1,198 @@
+"""Dealerの最終的な結果の確率分布を求めてキャッシュする。
+
+Dealerは17ポイント以上になるまで引くため、最終的な結果の分布は
+表向きのカードと、残りのカードのポイントごとの枚数のみで決まる。
+カードを一枚ずつ引く代わりに、この分布から一度のサンプリングで結果を決めたり、
+期待Rewardを直接計算したりできる。
+"""
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Optional
+
+import numpy as np
+
+# ポイントごとの枚数の添字。0がエース、9が10ポイントのカードを表す
+NUM_POINTS = 10
+# Dealerの最終的な結果の添字。0から4が17から21ポイント、5がバーストを表す
+DEALER_BUST = 5
+NUM_DEALER_OUTCOMES = 6
+# 各結果のポイント。バーストは22とする
+OUTCOME_POINTS = np.arange(17, 17 + NUM_DEALER_OUTCOMES)
+
+
+def hand_value(hard_points: int, has_ace: bool) -> int:
+    # Hand.total_pointsと同じ規則
+    if has_ace and hard_points <= 11:
+        return hard_points + 10
+    return hard_points
+
+
+def point_counts(rank_counts: Sequence[int]) -> tuple[int, ...]:
+    """ランクごとの枚数を、10, J, Q, Kを同一視したポイントごとの枚数にする。
+
+    Args:
+        rank_counts (Sequence[int]): エースからキングまでの枚数 (NUM_RANKS,)
+
+    Returns:
+        tuple[int, ...]: ポイントごとの枚数 (NUM_POINTS,)
+    """
+    return tuple(int(c) for c in rank_counts[: NUM_POINTS - 1]) + (
+        int(sum(rank_counts[NUM_POINTS - 1 :])),
+    )
+
+
+def dealer_distribution(
+    hard_points: int, has_ace: bool, remaining: tuple[int, ...], memo: dict
+) -> np.ndarray:
+    """Dealerが残りのカードから17ポイント以上になるまで引いたときの、
+    最終的な結果の確率分布を求める。
+
+    Args:
+        hard_points (int): エースを1ポイントとして数えたDealerの総ポイント
+        has_ace (bool): Dealerの手札にエースが含まれるかどうか
+        remaining (tuple[int, ...]): 残りのカードのポイントごとの枚数
+        memo (dict): 途中の計算結果を保存する辞書
+
+    Returns:
+        np.ndarray: 17から21ポイントとバーストの確率 (NUM_DEALER_OUTCOMES,)
+    """
+    key = (hard_points, has_ace, remaining)
+    if key in memo:
+        return memo[key]
+
+    distribution = np.zeros(NUM_DEALER_OUTCOMES)
+    value = hand_value(hard_points, has_ace)
+    if hard_points > 21:
+        distribution[DEALER_BUST] = 1.0
+    elif value >= 17:
+        distribution[value - 17] = 1.0
+    else:
+        total = sum(remaining)
+        for i, count in enumerate(remaining):
+            if count == 0:
+                continue
+            next_remaining = remaining[:i] + (count - 1,) + remaining[i + 1 :]
+            distribution += (count / total) * dealer_distribution(
+                hard_points + i + 1, has_ace or i == 0, next_remaining, memo
+            )
+
+    memo[key] = distribution
+    return distribution
+
+
+class DealerCache:
+    """表向きのカードと配られたカードの枚数ごとに、Dealerの最終的な結果の分布を
+    LRUで保持する。Hole cardは残りのカードから引くものとして扱う。
+
+    Args:
+        num_decks (int, optional): デッキの数. Defaults to 1.
+        maxsize (Optional[int], optional): 保持する分布の数の上限。
+            Noneの場合は上限なし. Defaults to 65536.
+        memo_size (int, optional): 分布を求める途中の計算結果を保持する数の上限。
+            超えた場合は全て破棄する. Defaults to 1 << 20.
+    """
+
+    def __init__(
+        self,
+        num_decks: int = 1,
+        maxsize: Optional[int] = 65536,
+        memo_size: int = 1 << 20,
+    ):
+        self.num_decks = num_decks
+        self.maxsize = maxsize
+        self.memo_size = memo_size
+        self._full = (4 * num_decks,) * (NUM_POINTS - 1) + (16 * num_decks,)
+        self._cache = OrderedDict()
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def distribution(self, upcard: int, removed: Sequence[int]) -> np.ndarray:
+        """Dealerの最終的な結果の確率分布を取得する。
+
+        Args:
+            upcard (int): Dealerの表向きのカードのランク
+            removed (Sequence[int]): 表向きのカード以外に配られたカードの
+                ランクごとの枚数。エースからキングの順 (NUM_RANKS,)
+
+        Returns:
+            np.ndarray: 17から21ポイントとバーストの確率 (NUM_DEALER_OUTCOMES,)
+        """
+        upcard_point = min(upcard, 10) - 1
+        key = (upcard_point, point_counts(removed))
+        distribution = self._cache.get(key)
+        if distribution is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return distribution
+
+        self.misses += 1
+        remaining = [full - r for full, r in zip(self._full, key[1])]
+        remaining[upcard_point] -= 1
+        if min(remaining) < 0:
+            raise ValueError(f"more cards removed than in {self.num_decks} deck(s)")
+
+        # 途中の計算結果は他の分布と共有できるが、メモリを際限なく使わないよう
+        # 上限を超えたら破棄する
+        if len(self._memo) > self.memo_size:
+            self._memo.clear()
+        distribution = dealer_distribution(
+            upcard_point + 1, upcard_point == 0, tuple(remaining), self._memo
+        ).copy()
+        distribution.flags.writeable = False
+        self._cache[key] = distribution
+        if self.maxsize is not None and len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return distribution
+
+    def sample(self, upcard: int, removed: Sequence[int], u: float) -> int:
+        """一様乱数を一つ用いて、Dealerの最終的なポイントを決める。
+
+        Args:
+            upcard (int): Dealerの表向きのカードのランク
+            removed (Sequence[int]): 表向きのカード以外に配られたカードの枚数 (NUM_RANKS,)
+            u (float): [0, 1)の一様乱数
+
+        Returns:
+            int: Dealerの最終的なポイント。バーストの場合は22
+        """
+        cumulative = np.cumsum(self.distribution(upcard, removed))
+        outcome = min(int(np.searchsorted(cumulative, u, side="right")), DEALER_BUST)
+        return int(OUTCOME_POINTS[outcome])
+
+    def expected_reward(
+        self, player_points: int, upcard: int, removed: Sequence[int]
+    ) -> float:
+        """Playerがstandしたときの期待Rewardを求める。
+
+        Args:
+            player_points (int): Playerの総ポイント
+            upcard (int): Dealerの表向きのカードのランク
+            removed (Sequence[int]): 表向きのカード以外に配られたカードの枚数 (NUM_RANKS,)
+
+        Returns:
+            float: 期待Reward
+        """
+        if player_points > 21:
+            return -1.0
+        distribution = self.distribution(upcard, removed)
+        outcomes = np.sign(player_points - OUTCOME_POINTS)
+        outcomes[DEALER_BUST] = 1
+        return float(distribution @ outcomes)
+
+    def info(self) -> dict:
+        """キャッシュの統計を取得する。
+
+        Returns:
+            dict: ヒット数、ミス数、保持している分布の数、上限
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+        }
+
@@ -0,0 +1,381 @@
+"""配る・引く・バースト・Dealerの手番・勝敗の判定をまとめたゲームエンジン。
+
+BlackjackEnvは一つのゲームを、VectorBlackjackEnvは複数のゲームをまとめて
+reset()で配り、step()でPlayerのActionを一つずつ与えて進める。
+対戦(bj-play)、学習と評価(bj-train)、サーバー(bj-serve)はこのエンジンを用いる。
+BlackjackEnvはゲームの進行をevents.GameListenerに通知する。
+どちらも手札や配列をラウンドをまたいで使い回し、ラウンドごとに確保し直さない。
+"""
+from typing import Optional, Union
+
+import numpy as np
+
+from blackjack.base import (
+    Action,
+    BasePlayer,
+    Dealer,
+    Deck,
+    Environment,
+    Rank,
+    Reward,
+    Shoe,
+    Suit,
+)
+from blackjack.dealer import DEALER_BUST, OUTCOME_POINTS, DealerCache
+from blackjack.events import GameListener
+from blackjack.state import HAND_UNITS, encode_counts_array, state_index_array
+
+NUM_CARDS = len(Suit) * len(Rank)
+# 手札の合計が21以下となる最大の枚数（エースのみの場合）
+MAX_HAND_SIZE = 21
+
+# Deck()を生成した直後のカードの並び順をランクで表したもの
+DECK_RANKS = np.array([rank.value for suit in Suit for rank in Rank], dtype=np.int8)
+# ランクからポイントへの変換表（インデックス0は未使用）
+RANK_POINTS = np.minimum(np.arange(len(Rank) + 1), 10).astype(np.int16)
+# ランクから一枚だけの手札の符号への変換表
+RANK_CODES = np.array(HAND_UNITS, dtype=np.uint64)
+
+# 配列演算の中で毎回Enumの属性を参照しないよう、値を取り出しておく
+_ACE = Rank.ace.value
+_WIN = Reward.win.value
+_LOSE = Reward.lose.value
+
+
+def hand_values(hard_points: np.ndarray, has_ace: np.ndarray) -> np.ndarray:
+    """Hand.total_pointsと同じ規則で、エースを有利な方で数えた総ポイントを求める。
+
+    Args:
+        hard_points (np.ndarray): エースを1ポイントとして数えた総ポイント
+        has_ace (np.ndarray): エースを含むかどうか
+
+    Returns:
+        np.ndarray: 総ポイント
+    """
+    return np.where(has_ace & (hard_points <= 11), hard_points + 10, hard_points)
+
+
+def lookup_dealer_distributions(
+    dealer_cache: DealerCache, upcards: np.ndarray, counts: np.ndarray
+) -> np.ndarray:
+    """各ゲームのDealerの最終的な結果の分布を求める。
+    状態（手札と表向きのカード）が同じゲームは一度の参照にまとめる。
+    Playerの手札は21ポイント以下でなければならない。
+
+    Args:
+        dealer_cache (DealerCache): Dealerの結果の分布
+        upcards (np.ndarray): Dealerの表向きのカードのランク (games,)
+        counts (np.ndarray): Playerの手札のランクごとの枚数。
+            インデックス0は未使用 (games, NUM_RANKS + 1)
+
+    Returns:
+        np.ndarray: 17から21ポイントとバーストの確率 (games, NUM_DEALER_OUTCOMES)
+    """
+    states = state_index_array(encode_counts_array(counts[:, 1:]), upcards)
+    unique_states, first, inverse = np.unique(
+        states, return_index=True, return_inverse=True
+    )
+    distributions = np.array(
+        [dealer_cache.distribution(int(upcards[i]), counts[i, 1:]) for i in first]
+    ).reshape(len(unique_states), -1)
+    return distributions[inverse]
+
+
+class BlackjackEnv:
+    """一つのゲームをreset()とstep(action)で進める。
+    デッキのシャッフルは行わないため、必要であればreset()の前に行う。
+
+    Args:
+        deck (Union[Deck, Shoe]): カードを配るデッキ
+        player (Optional[BasePlayer], optional): 手札を持つPlayer。Agentを渡すと
+            Agentの手札に配る. Defaults to None.
+        dealer (Optional[Dealer], optional): Dealer. Defaults to None.
+        listeners (Optional[list[GameListener]], optional): ゲームの進行を通知する
+            リスナー. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        deck: Union[Deck, Shoe],
+        player: Optional[BasePlayer] = None,
+        dealer: Optional[Dealer] = None,
+        listeners: Optional[list[GameListener]] = None,
+    ):
+        self.deck = deck
+        self.player = player if player is not None else BasePlayer()
+        self.dealer = dealer if dealer is not None else Dealer()
+        # 空の場合はイベントを作らない
+        self.listeners = listeners if listeners is not None else []
+        self.done = True
+        # 終了したゲームの結果。ゲームの途中ではNone
+        self.reward: Optional[Reward] = None
+
+    def observation(self) -> Environment:
+        """Playerから見た現在のEnvironmentを取得する。Dealerの2枚目は含まない。
+
+        Returns:
+            Environment: Playerの置かれた環境
+        """
+        return Environment(self.player.hands, self.dealer.hands[:1])
+
+    def reset(self, deck: Optional[Union[Deck, Shoe]] = None) -> Environment:
+        """手札を空にして、Player, Dealer, Player, Dealerの順に一枚ずつ配る。
+
+        Args:
+            deck (Optional[Union[Deck, Shoe]], optional): 指定した場合は
+                このデッキに替えて配る. Defaults to None.
+
+        Returns:
+            Environment: 最初のEnvironment
+        """
+        if deck is not None:
+            self.deck = deck
+        self.player.hand.clear()
+        self.dealer.hand.clear()
+
+        listeners = self.listeners
+        self.player.draw(self.deck, listeners=listeners)
+        self.dealer.draw(self.deck, listeners=listeners)
+        self.player.draw(self.deck, listeners=listeners)
+        self.dealer.draw(self.deck, display_card=False, listeners=listeners)
+
+        self.done = False
+        self.reward = None
+        if listeners:
+            for listener in listeners:
+                listener.on_turn(self.player)
+        return self.observation()
+
+    def step(
+        self, action: Action
+    ) -> tuple[Optional[Environment], Optional[Reward], bool]:
+        """PlayerのActionを一つ与えてゲームを進める。
+        standした場合はDealerが17ポイント以上になるまで引き、勝敗を決める。
+
+        Args:
+            action (Action): PlayerのAction
+
+        Raises:
+            RuntimeError: ゲームが終了している場合
+
+        Returns:
+            tuple[Optional[Environment], Optional[Reward], bool]: 次のEnvironment、
+                Reward、ゲームが終了したかどうか。終了した場合はEnvironmentをNone、
+                終了していない場合はRewardをNoneとする
+        """
+        if self.done:
+            raise RuntimeError("the game is over; call reset() first")
+
+        listeners = self.listeners
+        if action == Action.draw:
+            self.player.draw(self.deck, listeners=listeners)
+            if self.player.total_points > 21:
+                return self._finish(Reward.lose, self.player)
+            if listeners:
+                for listener in listeners:
+                    listener.on_turn(self.player)
+            return self.observation(), None, False
+
+        if listeners:
+            for listener in listeners:
+                listener.on_stand(self.player)
+        while self.dealer.total_points < 17:
+            self.dealer.draw(self.deck, listeners=listeners)
+            if self.dealer.total_points > 21:
+                return self._finish(Reward.win, self.dealer)
+        if listeners:
+            for listener in listeners:
+                listener.on_stand(self.dealer)
+
+        player_points = self.player.total_points
+        dealer_points = self.dealer.total_points
+        if dealer_points > player_points:
+            return self._finish(Reward.lose)
+        if dealer_points < player_points:
+            return self._finish(Reward.win)
+        return self._finish(Reward.tie)
+
+    def _finish(
+        self, reward: Reward, busted: Optional[BasePlayer] = None
+    ) -> tuple[None, Reward, bool]:
+        self.done = True
+        self.reward = reward
+        if self.listeners:
+            for listener in self.listeners:
+                if busted is not None:
+                    listener.on_bust(busted)
+                listener.on_result(reward, self.player, self.dealer)
+        return None, reward, True
+
+
+class VectorBlackjackEnv:
+    """複数のゲームを配列として保持し、全ゲームの同じ手番をまとめて進める。
+    カードはDeck.popと同様に各デッキの末尾から配る。
+    配列はゲームの数が変わらない限りラウンドをまたいで使い回す。
+
+    Args:
+        dealer_cache (Optional[DealerCache], optional): 指定した場合は、Dealerの結果を
+            カードを引く代わりに最終的な結果の分布から一度のサンプリングで決める.
+            Defaults to None.
+        rng (Optional[np.random.Generator], optional): dealer_cacheで
+            Dealerの結果を決める乱数生成器。reset()で替えられる. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        dealer_cache: Optional[DealerCache] = None,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        self.dealer_cache = dealer_cache
+        self.rng = rng
+        self.num_envs = 0
+
+    def _allocate(self, num_envs: int) -> None:
+        self.num_envs = num_envs
+        self._games = np.arange(num_envs)
+        # Playerが受け取ったカードのランク
+        self.player_cards = np.zeros((num_envs, MAX_HAND_SIZE + 1), dtype=np.int8)
+        # Playerの手札のランクごとの枚数
+        self.counts = np.zeros((num_envs, len(Rank) + 1), dtype=np.int8)
+        # Playerの手札の符号。カードを引くたびに足していく
+        self.hand_codes = np.zeros(num_envs, dtype=np.uint64)
+        # 各手番でカードを引いたかどうか
+        self.actions = np.zeros((num_envs, MAX_HAND_SIZE), dtype=bool)
+        self.num_actions = np.zeros(num_envs, dtype=np.int64)
+        self.rewards = np.zeros(num_envs, dtype=np.int8)
+        self.done = np.zeros(num_envs, dtype=bool)
+        self.upcards = np.zeros(num_envs, dtype=np.int8)
+        self._hole_cards = np.zeros(num_envs, dtype=np.int8)
+        self._num_cards = np.zeros(num_envs, dtype=np.int64)
+        self._next_card = np.zeros(num_envs, dtype=np.int64)
+        self._player_points = np.zeros(num_envs, dtype=np.int16)
+        self._player_aces = np.zeros(num_envs, dtype=bool)
+
+    def observation(self) -> np.ndarray:
+        """各ゲームのPlayerの手札の符号を取得する。
+        upcardsと組み合わせて状態を表す。終了したゲームの値は意味をもたない。
+
+        Returns:
+            np.ndarray: 手札の符号 (num_envs,)
+        """
+        return self.hand_codes
+
+    def reset(
+        self, decks: np.ndarray, rng: Optional[np.random.Generator] = None
+    ) -> np.ndarray:
+        """デッキごとに一つずつゲームを始め、Player, Dealer, Player, Dealerの順に配る。
+
+        Args:
+            decks (np.ndarray): シャッフル済みのデッキ (num_envs, NUM_CARDS)
+            rng (Optional[np.random.Generator], optional): dealer_cacheで
+                Dealerの結果を決める乱数生成器。Noneの場合はそれまでのものを
+                用いる. Defaults to None.
+
+        Raises:
+            ValueError: dealer_cacheを用いるが乱数生成器がない場合
+
+        Returns:
+            np.ndarray: 手札の符号 (num_envs,)
+        """
+        if rng is not None:
+            self.rng = rng
+        # シードを指定した学習で再現できるよう、乱数生成器は必ず外から渡す
+        if self.dealer_cache is not None and self.rng is None:
+            raise ValueError("an rng is required to sample from dealer_cache")
+        if len(decks) != self.num_envs:
+            self._allocate(len(decks))
+        self.decks = decks
+        games = self._games
+
+        self.player_cards.fill(0)
+        self.counts.fill(0)
+        self.actions.fill(False)
+        self.num_actions.fill(0)
+        self.rewards.fill(0)
+        self.done.fill(False)
+
+        self.player_cards[:, 0] = decks[:, -1]
+        self.player_cards[:, 1] = decks[:, -3]
+        self.upcards[:] = decks[:, -2]
+        self._hole_cards[:] = decks[:, -4]
+        np.add.at(self.counts, (games, self.player_cards[:, 0]), 1)
+        np.add.at(self.counts, (games, self.player_cards[:, 1]), 1)
+        self._num_cards.fill(2)
+        self._next_card.fill(NUM_CARDS - 5)
+
+        first, second = self.player_cards[:, 0], self.player_cards[:, 1]
+        self._player_points[:] = RANK_POINTS[first] + RANK_POINTS[second]
+        self._player_aces[:] = (first == _ACE) | (second == _ACE)
+        self.hand_codes[:] = RANK_CODES[first] + RANK_CODES[second]
+        return self.observation()
+
+    def step(self, draws: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """終了していない全ゲームでPlayerのActionを一つずつ進める。
+        standしたゲームではDealerが17ポイント以上になるまで引き、勝敗を決める。
+
+        Args:
+            draws (np.ndarray): 各ゲームでカードを引くかどうか。
+                終了したゲームの値は用いない (num_envs,)
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: 手札の符号、Reward、
+                ゲームが終了したかどうか。Rewardは終了したゲームでのみ意味をもつ
+        """
+        idx = np.flatnonzero(~self.done)
+        draws = draws[idx]
+        self.actions[idx, self.num_actions[idx]] = draws
+        self.num_actions[idx] += 1
+
+        drawers = idx[draws]
+        cards = self.decks[drawers, self._next_card[drawers]]
+        self._next_card[drawers] -= 1
+        self.player_cards[drawers, self._num_cards[drawers]] = cards
+        self.counts[drawers, cards] += 1
+        self.hand_codes[drawers] += RANK_CODES[cards]
+        self._num_cards[drawers] += 1
+        self._player_points[drawers] += RANK_POINTS[cards]
+        self._player_aces[drawers] |= cards == _ACE
+
+        bust = drawers[self._player_points[drawers] > 21]
+        self.rewards[bust] = _LOSE
+        self.done[bust] = True
+
+        standers = idx[~draws]
+        if len(standers) > 0:
+            self._play_dealer(standers)
+            self.done[standers] = True
+        return self.observation(), self.rewards, self.done
+
+    def _play_dealer(self, idx: np.ndarray) -> None:
+        """Dealerが17ポイント以上になるまでカードを引き、勝敗を決める。"""
+        upcards = self.upcards[idx]
+        hole_cards = self._hole_cards[idx]
+        dealer_points = RANK_POINTS[upcards] + RANK_POINTS[hole_cards]
+        dealer_aces = (upcards == _ACE) | (hole_cards == _ACE)
+
+        if self.dealer_cache is not None:
+            # Hole cardを含め、残りのカードから引いた場合の分布に従って結果を決める
+            distributions = lookup_dealer_distributions(
+                self.dealer_cache, self.upcards[idx], self.counts[idx]
+            )
+            cumulative = np.cumsum(distributions, axis=1)
+            outcomes = (self.rng.random(len(idx))[:, None] >= cumulative).sum(axis=1)
+            dealer_points = OUTCOME_POINTS[np.minimum(outcomes, DEALER_BUST)]
+            dealer_aces = np.zeros(len(idx), dtype=bool)
+        else:
+            next_card = self._next_card[idx]
+            drawing = hand_values(dealer_points, dealer_aces) < 17
+            while drawing.any():
+                j = np.flatnonzero(drawing)
+                cards = self.decks[idx[j], next_card[j]]
+                next_card[j] -= 1
+                dealer_points[j] += RANK_POINTS[cards]
+                dealer_aces[j] |= cards == _ACE
+                drawing[j] = hand_values(dealer_points[j], dealer_aces[j]) < 17
+            self._next_card[idx] = next_card
+
+        player_points = hand_values(self._player_points[idx], self._player_aces[idx])
+        dealer_points = hand_values(dealer_points, dealer_aces)
+        self.rewards[idx] = np.where(
+            dealer_points > 21, _WIN, np.sign(player_points - dealer_points)
+        )
@@ -0,0 +1,263 @@
+"""Agentの勝率を信頼区間つきで評価する。
+
+ゲームをバッチごとにプレイし、各バッチの後で信頼区間の幅や逐次確率比検定(SPRT)を
+確認して、目標の精度または判定に達した時点で評価を打ち切る。
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Optional, Union
+
+import numpy as np
+
+from blackjack.base import Agent, DenseTable, Reward, Table
+from blackjack.dealer import DealerCache
+from blackjack.engine import VectorBlackjackEnv
+from blackjack.simulator import expected_outcomes, play_batch, shuffled_decks
+
+
+def wilson_interval(
+    successes: int, trials: int, confidence: float = 0.95
+) -> tuple[float, float]:
+    """二項分布の割合に対するWilsonスコア信頼区間を求める。
+
+    Args:
+        successes (int): 成功の回数
+        trials (int): 試行の回数
+        confidence (float, optional): 信頼水準. Defaults to 0.95.
+
+    Returns:
+        tuple[float, float]: 信頼区間の下限と上限
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z**2 / trials
+    center = (p + z**2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+@dataclass
+class EvaluationResult:
+    """評価の結果。
+
+    Attributes:
+        wins (float): 勝った回数。Dealerの結果の分布で評価した場合は確率の合計
+        ties (float): 引き分けた回数
+        losses (float): 負けた回数
+        confidence (float): 信頼水準
+        stopped_by (str): 評価を打ち切った理由（"precision", "sprt", "max_games"）
+        decision (Optional[str]): SPRTの判定。勝率が閾値より高ければ"better"、
+            低ければ"worse"、判定していなければNone
+    """
+
+    wins: float
+    ties: float
+    losses: float
+    confidence: float
+    stopped_by: str
+    decision: Optional[str] = None
+
+    @property
+    def games(self) -> int:
+        # 確率の合計は丸め誤差を含むため、整数に丸める
+        return round(self.wins + self.ties + self.losses)
+
+    def rate(self, reward: Reward) -> float:
+        """あるRewardとなった割合を取得する。
+
+        Args:
+            reward (Reward): Reward
+
+        Returns:
+            float: 割合
+        """
+        return self._count(reward) / self.games if self.games else 0.0
+
+    def interval(self, reward: Reward) -> tuple[float, float]:
+        """あるRewardとなった割合の信頼区間を取得する。
+
+        Args:
+            reward (Reward): Reward
+
+        Returns:
+            tuple[float, float]: 信頼区間の下限と上限
+        """
+        return wilson_interval(self._count(reward), self.games, self.confidence)
+
+    def _count(self, reward: Reward) -> float:
+        return {Reward.win: self.wins, Reward.tie: self.ties, Reward.lose: self.losses}[
+            reward
+        ]
+
+    def __str__(self) -> str:
+        lines = [f"{self.games}ゲーム ({self.stopped_by})"]
+        names = (("勝率", Reward.win), ("引き分け", Reward.tie), ("負け", Reward.lose))
+        for name, reward in names:
+            low, high = self.interval(reward)
+            lines.append(
+                f"{name}: {self.rate(reward):.3f} "
+                f"[{low:.3f}, {high:.3f}] ({self.confidence:.0%})"
+            )
+        if self.decision is not None:
+            lines.append(f"SPRT: {self.decision}")
+        return "\n".join(lines)
+
+
+def _play(
+    table: Union[Table, DenseTable],
+    num_games: int,
+    batch_size: int,
+    seed,
+    dealer_cache: Optional[DealerCache] = None,
+) -> np.ndarray:
+    """tableに従ってnum_gamesゲームをプレイし、勝ち・引き分け・負けの回数を返す。
+    dealer_cacheを指定した場合は、Dealerの結果の分布から求めた確率の合計を返す。
+    """
+    agent = Agent(table)
+    rng = np.random.default_rng(seed)
+    # 配列はバッチをまたいで使い回す
+    env = VectorBlackjackEnv()
+    counts = np.zeros(3)
+    for start in range(0, num_games, batch_size):
+        size = min(batch_size, num_games - start)
+        decks = shuffled_decks(size, rng)
+        result = play_batch(agent, decks, np.zeros(size), rng, env=env)
+        if dealer_cache is not None:
+            counts += expected_outcomes(result, dealer_cache).sum(axis=0)
+        else:
+            counts += [
+                np.count_nonzero(result.rewards == r)
+                for r in (Reward.win, Reward.tie, Reward.lose)
+            ]
+    return counts
+
+
+# 各ワーカープロセスが保持するDealerCache。バッチをまたいで分布を再利用する
+_worker_dealer_cache: Optional[DealerCache] = None
+
+
+def _init_worker(dealer_cache: Optional[DealerCache]) -> None:
+    global _worker_dealer_cache
+    _worker_dealer_cache = dealer_cache
+
+
+def _play_worker(
+    table: Union[Table, DenseTable], num_games: int, batch_size: int, seed
+) -> np.ndarray:
+    return _play(table, num_games, batch_size, seed, _worker_dealer_cache)
+
+
+def evaluate(
+    agent: Agent,
+    precision: float = 0.01,
+    confidence: float = 0.95,
+    min_games: int = 1000,
+    max_games: int = 1_000_000,
+    batch_size: int = 10000,
+    threshold: Optional[float] = None,
+    indifference: float = 0.01,
+    alpha: float = 0.05,
+    beta: float = 0.05,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    dealer_cache: Optional[DealerCache] = None,
+) -> EvaluationResult:
+    """探索を行わずにゲームをプレイしてAgentを評価する。
+    勝ち・引き分け・負けの割合の信頼区間の半幅が全てprecision以下になるか、
+    thresholdを指定した場合はSPRTの判定が出た時点で打ち切る。
+
+    Args:
+        agent (Agent): 評価するAgent。Tableは更新しない
+        precision (float, optional): 信頼区間の半幅の目標. Defaults to 0.01.
+        confidence (float, optional): 信頼水準. Defaults to 0.95.
+        min_games (int, optional): 打ち切る前に最低限プレイするゲーム数. Defaults to 1000.
+        max_games (int, optional): プレイするゲーム数の上限. Defaults to 1_000_000.
+        batch_size (int, optional): 一度にプレイするゲーム数. Defaults to 10000.
+        threshold (Optional[float], optional): SPRTで比較する勝率. Defaults to None.
+        indifference (float, optional): SPRTでthreshold±indifferenceの勝率を
+            比較する. Defaults to 0.01.
+        alpha (float, optional): SPRTの第一種の誤りの確率. Defaults to 0.05.
+        beta (float, optional): SPRTの第二種の誤りの確率. Defaults to 0.05.
+        workers (int, optional): 並列にプレイするプロセス数. Defaults to 1.
+        seed (Optional[int], optional): 乱数のシード. Defaults to None.
+        dealer_cache (Optional[DealerCache], optional): 指定した場合は、各ゲームの
+            勝敗をDealerの結果の分布から求めた確率で数え、分散を小さくする.
+            回数は実数となる. Defaults to None.
+
+    Returns:
+        EvaluationResult: 評価の結果
+    """
+    seeds = np.random.SeedSequence(seed)
+    counts = np.zeros(3)
+    # 確率で数える場合は回数を実数のまま保持する
+    convert = float if dealer_cache is not None else int
+
+    if threshold is not None:
+        p0 = max(threshold - indifference, 1e-9)
+        p1 = min(threshold + indifference, 1 - 1e-9)
+        upper = math.log((1 - beta) / alpha)
+        lower = math.log(beta / (1 - alpha))
+
+    def result(stopped_by: str, decision: Optional[str] = None) -> EvaluationResult:
+        return EvaluationResult(
+            *map(convert, counts), confidence, stopped_by, decision
+        )
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(dealer_cache,)
+        )
+    try:
+        while round(counts.sum()) < max_games:
+            remaining = max_games - round(counts.sum())
+            # 各プロセスにbatch_sizeゲームずつ割り当てる
+            num_games = min(batch_size * workers, remaining)
+            sizes = [
+                size
+                for size in np.diff(np.linspace(0, num_games, workers + 1).astype(int))
+                if size > 0
+            ]
+            batch_seeds = seeds.spawn(len(sizes))
+
+            if executor is None:
+                counts += _play(
+                    agent.table, sizes[0], batch_size, batch_seeds[0], dealer_cache
+                )
+            else:
+                tables = [agent.table] * len(sizes)
+                batch_sizes = [batch_size] * len(sizes)
+                for c in executor.map(
+                    _play_worker, tables, sizes, batch_sizes, batch_seeds
+                ):
+                    counts += c
+
+            games = round(counts.sum())
+            if games < min_games:
+                continue
+
+            if threshold is not None:
+                wins = counts[0]
+                llr = wins * math.log(p1 / p0) + (games - wins) * math.log(
+                    (1 - p1) / (1 - p0)
+                )
+                if llr >= upper:
+                    return result("sprt", "better")
+                if llr <= lower:
+                    return result("sprt", "worse")
+
+            half_widths = [
+                (high - low) / 2
+                for low, high in (wilson_interval(c, games, confidence) for c in counts)
+            ]
+            if max(half_widths) <= precision:
+                return result("precision")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return result("max_games")
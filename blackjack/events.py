@@ -0,0 +1,214 @@
+"""ゲームの進行を通知するイベントと、それを受け取るリスナー。
+
+BlackjackEnvとBasePlayer.drawは、カードを引いた・バーストした・standした・
+勝敗が決まったといったイベントを登録されたGameListenerに通知する。
+リスナーが一つもない場合は通知のための処理を一切行わないため、学習や評価のように
+表示の不要なゲームは遅くならない。対戦の表示、ログへの記録、集計はいずれも
+リスナーとして同じエンジンに登録する。
+"""
+import json
+import sys
+from collections import Counter
+from typing import Optional, TextIO
+
+from blackjack.base import BasePlayer, Card, Reward
+
+
+class GameListener:
+    """イベントを受け取るリスナーの基底クラス。
+    必要なメソッドのみをオーバーライドする。
+    """
+
+    def on_draw(self, player: BasePlayer, card: Card, display_card: bool) -> None:
+        """カードを引いたときに呼び出される。
+
+        Args:
+            player (BasePlayer): カードを引いたプレイヤー
+            card (Card): 引いたカード
+            display_card (bool): カードを表向きに引いたかどうか
+        """
+
+    def on_turn(self, player: BasePlayer) -> None:
+        """PlayerがActionを選ぶ前に呼び出される。
+
+        Args:
+            player (BasePlayer): Actionを選ぶPlayer
+        """
+
+    def on_stand(self, player: BasePlayer) -> None:
+        """standしたときに呼び出される。
+
+        Args:
+            player (BasePlayer): standしたプレイヤー
+        """
+
+    def on_bust(self, player: BasePlayer) -> None:
+        """総ポイントが21を超えたときに呼び出される。
+
+        Args:
+            player (BasePlayer): バーストしたプレイヤー
+        """
+
+    def on_result(self, reward: Reward, player: BasePlayer, dealer: BasePlayer) -> None:
+        """勝敗が決まったときに呼び出される。
+
+        Args:
+            reward (Reward): Playerから見たゲームの結果
+            player (BasePlayer): Player
+            dealer (BasePlayer): Dealer
+        """
+
+
+class BufferedWriter(GameListener):
+    """イベントを一行ずつの文字列にしてバッファに溜め、buffer_size行ごとに書き出す。
+    最後に溜まった行はflushまたはcloseで書き出す。
+
+    Args:
+        file (Optional[TextIO], optional): 書き出す先。Noneの場合は標準出力.
+            Defaults to None.
+        buffer_size (int, optional): 一度に書き出す行数。1の場合は行ごとに
+            書き出す. Defaults to 1000.
+    """
+
+    def __init__(self, file: Optional[TextIO] = None, buffer_size: int = 1000):
+        if buffer_size < 1:
+            raise ValueError(f"buffer_size must be positive, got {buffer_size}")
+        self.file = file
+        self.buffer_size = buffer_size
+        self._lines: list[str] = []
+
+    def write(self, line: str) -> None:
+        """一行をバッファに加える。
+
+        Args:
+            line (str): 改行を含まない一行
+        """
+        self._lines.append(line)
+        if len(self._lines) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """バッファに溜まった行を書き出す。"""
+        if not self._lines:
+            return
+        # 標準出力は書き出す時点のものを用いる（pytestのcapsysなどで差し替えられる）
+        file = self.file if self.file is not None else sys.stdout
+        file.write("\n".join(self._lines) + "\n")
+        file.flush()
+        self._lines.clear()
+
+    def close(self) -> None:
+        """バッファを書き出し、ファイルを閉じる。標準出力は閉じない。"""
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self) -> "BufferedWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TranscriptWriter(BufferedWriter):
+    """イベントを対戦の表示と同じ文章で書き出す。"""
+
+    def on_draw(self, player: BasePlayer, card: Card, display_card: bool) -> None:
+        name = type(player).__name__
+        if display_card:
+            self.write(f"{name}は{card}を引きました。")
+        else:
+            self.write(f"{name}はカードを引きました。")
+
+    def on_turn(self, player: BasePlayer) -> None:
+        self.write(f"現在の総ポイントは{player.total_points}です。")
+
+    def on_stand(self, player: BasePlayer) -> None:
+        self.write(f"{type(player).__name__}は{player.total_points}でstandしました。")
+
+    def on_bust(self, player: BasePlayer) -> None:
+        self.write(f"{type(player).__name__}はバーストしました。")
+
+    def on_result(self, reward: Reward, player: BasePlayer, dealer: BasePlayer) -> None:
+        if reward == Reward.win:
+            self.write("Playerの勝ちです。")
+        elif reward == Reward.lose:
+            self.write("Dealerの勝ちです。")
+        else:
+            self.write("引き分けです。")
+
+
+class JsonTranscriptWriter(BufferedWriter):
+    """イベントを一行に一つのJSONとして書き出す。
+    Dealerが伏せて引いたカードも記録する。
+    """
+
+    def _event(self, event: str, player: BasePlayer, **values) -> None:
+        values = {"event": event, "player": type(player).__name__, **values}
+        self.write(json.dumps(values, ensure_ascii=False))
+
+    def on_draw(self, player: BasePlayer, card: Card, display_card: bool) -> None:
+        self._event(
+            "draw",
+            player,
+            suit=card.suit.name,
+            rank=card.rank.value,
+            hidden=not display_card,
+        )
+
+    def on_stand(self, player: BasePlayer) -> None:
+        self._event("stand", player, points=player.total_points)
+
+    def on_bust(self, player: BasePlayer) -> None:
+        self._event("bust", player, points=player.total_points)
+
+    def on_result(self, reward: Reward, player: BasePlayer, dealer: BasePlayer) -> None:
+        self._event(
+            "result",
+            player,
+            reward=reward.name,
+            points=player.total_points,
+            dealer_points=dealer.total_points,
+        )
+
+
+class CounterListener(GameListener):
+    """プレイヤーごとのカードを引いた回数、standとバーストの回数、
+    ゲームの結果の回数を数える。プレイヤーはクラス名で区別する。
+    """
+
+    def __init__(self):
+        self.draws: Counter[str] = Counter()
+        self.stands: Counter[str] = Counter()
+        self.busts: Counter[str] = Counter()
+        self.results: Counter[Reward] = Counter()
+
+    @property
+    def games(self) -> int:
+        return sum(self.results.values())
+
+    def on_draw(self, player: BasePlayer, card: Card, display_card: bool) -> None:
+        self.draws[type(player).__name__] += 1
+
+    def on_stand(self, player: BasePlayer) -> None:
+        self.stands[type(player).__name__] += 1
+
+    def on_bust(self, player: BasePlayer) -> None:
+        self.busts[type(player).__name__] += 1
+
+    def on_result(self, reward: Reward, player: BasePlayer, dealer: BasePlayer) -> None:
+        self.results[reward] += 1
+
+    def summary(self) -> dict:
+        """集計をJSONに書き出せる形式で取得する。
+
+        Returns:
+            dict: 集計
+        """
+        return {
+            "games": self.games,
+            "draws": dict(self.draws),
+            "stands": dict(self.stands),
+            "busts": dict(self.busts),
+            "results": {reward.name: count for reward, count in self.results.items()},
+        }
@@ -0,0 +1,330 @@
+"""評価値を一定のステップサイズで目標に近づける学習則。
+
+Table.updateは同じEnvironmentとActionのペアに対する全期間のRewardを平均するため、
+探索の初期に得たRewardがいつまでも評価値に残る。ここでの学習則は評価値を
+目標との差のalpha倍だけ動かすため、古い経験ほど早く忘れる。
+
+学習則はAgent(DenseTable(), learner=...)として渡す。DenseTableのRewardの合計の
+代わりに評価値と回数の積を保存するため、評価値の参照、merge、保存と読み込みは
+DenseTableのまま行える。Rewardはゲームの終了時にのみ与えられ、割引は行わない。
+"""
+import abc
+import argparse
+import csv
+import sys
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import ACTION_INDEX, Action, Agent, DenseTable, Environment, Reward
+from blackjack.policy import FrozenPolicy
+from blackjack.simulator import play_batch, shuffled_decks, train_batch
+
+LEARNERS = ("average", "mc", "sarsa", "q")
+
+
+class Learner(abc.ABC):
+    """一つのエピソードの経験からDenseTableの評価値を更新する学習則の基底クラス。
+
+    Args:
+        alpha (float, optional): ステップサイズ. Defaults to 0.05.
+    """
+
+    def __init__(self, alpha: float = 0.05):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        self.alpha = alpha
+
+    def update(
+        self,
+        table: DenseTable,
+        envs: list[Environment],
+        actions: list[Action],
+        reward: Reward,
+    ) -> None:
+        """Agent.register_experienceと同じ形式の経験で評価値を更新する。
+
+        Args:
+            table (DenseTable): 更新するDenseTable
+            envs (list[Environment]): 各手番のEnvironment
+            actions (list[Action]): 各手番のAction
+            reward (Reward): ゲームの結果
+        """
+        self.learn_episode(
+            table,
+            [table.index(env) for env in envs],
+            [ACTION_INDEX[action] for action in actions],
+            float(reward.value),
+        )
+
+    def update_episodes(
+        self,
+        table: DenseTable,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        num_actions: np.ndarray,
+    ) -> None:
+        """BatchResult.transitionsの形式で並べた複数のエピソードを順に学習する。
+
+        Args:
+            table (DenseTable): 更新するDenseTable
+            states (np.ndarray): ゲームの順に並べた各手番の状態のインデックス (n,)
+            actions (np.ndarray): 各手番のActionのインデックス (n,)
+            rewards (np.ndarray): 各ゲームのReward (games,)
+            num_actions (np.ndarray): 各ゲームの手番の数 (games,)
+        """
+        states, actions = states.tolist(), actions.tolist()
+        ends = np.cumsum(num_actions).tolist()
+        start = 0
+        for end, reward in zip(ends, rewards.tolist()):
+            self.learn_episode(table, states[start:end], actions[start:end], reward)
+            start = end
+
+    @abc.abstractmethod
+    def learn_episode(
+        self, table: DenseTable, states: list[int], actions: list[int], reward: float
+    ) -> None:
+        """一つのエピソードを学習する。
+
+        Args:
+            table (DenseTable): 更新するDenseTable
+            states (list[int]): 各手番の状態のインデックス
+            actions (list[int]): 各手番のActionのインデックス
+            reward (float): ゲームの結果
+        """
+
+    @staticmethod
+    def _value(table: DenseTable, state: int, action: int) -> float:
+        count = table._count[state, action]
+        return table._sum[state, action] / count if count > 0 else 0.0
+
+    @staticmethod
+    def _store(table: DenseTable, state: int, action: int, value: float) -> None:
+        table._sum[state, action] = value * table._count[state, action]
+
+    def _visit(self, table: DenseTable, state: int, action: int) -> float:
+        # 評価値を変えずに回数を増やし、現在の評価値を返す
+        value = self._value(table, state, action)
+        table._count[state, action] += 1
+        self._store(table, state, action, value)
+        return value
+
+
+class MonteCarlo(Learner):
+    """各手番の評価値をゲームの結果に向けてalphaだけ近づける、
+    ステップサイズが一定のモンテカルロ法。
+    """
+
+    def learn_episode(
+        self, table: DenseTable, states: list[int], actions: list[int], reward: float
+    ) -> None:
+        for state, action in zip(states, actions):
+            value = self._visit(table, state, action)
+            self._store(table, state, action, value + self.alpha * (reward - value))
+
+
+class SarsaLambda(Learner):
+    """Eligibility traceを用いるSARSA(λ)。
+    手番ごとのTD誤差を、それまでに通った手番へtraceの大きさに応じて伝える。
+    エピソードの終了時に、手番の順に逐次更新する。
+
+    Args:
+        alpha (float, optional): ステップサイズ. Defaults to 0.05.
+        lam (float, optional): traceの減衰率。1に近いほどモンテカルロ法に近づく.
+            Defaults to 0.8.
+    """
+
+    def __init__(self, alpha: float = 0.05, lam: float = 0.8):
+        super().__init__(alpha)
+        if not 0 <= lam <= 1:
+            raise ValueError(f"lam must be in [0, 1], got {lam}")
+        self.lam = lam
+
+    def _next_value(self, table: DenseTable, state: int, action: int) -> float:
+        # 次の手番で実際に選んだActionの評価値
+        return self._value(table, state, action)
+
+    def _keeps_traces(self, table: DenseTable, state: int, action: int) -> bool:
+        return True
+
+    def learn_episode(
+        self, table: DenseTable, states: list[int], actions: list[int], reward: float
+    ) -> None:
+        traces = {}
+        last = len(states) - 1
+        for t, (state, action) in enumerate(zip(states, actions)):
+            value = self._visit(table, state, action)
+            if t < last:
+                target = self._next_value(table, states[t + 1], actions[t + 1])
+            else:
+                target = reward
+            delta = target - value
+
+            traces[state, action] = traces.get((state, action), 0.0) + 1.0
+            for (s, a), trace in traces.items():
+                self._store(
+                    table, s, a, self._value(table, s, a) + self.alpha * delta * trace
+                )
+
+            if t < last and not self._keeps_traces(
+                table, states[t + 1], actions[t + 1]
+            ):
+                traces.clear()
+            else:
+                traces = {key: trace * self.lam for key, trace in traces.items()}
+
+
+class QLambda(SarsaLambda):
+    """WatkinsのQ(λ)。次の手番の評価値の最大値を目標とし、
+    探索によって評価値が最大でないActionを選んだ時点でtraceを打ち切る。
+
+    Args:
+        alpha (float, optional): ステップサイズ. Defaults to 0.05.
+        lam (float, optional): traceの減衰率. Defaults to 0.8.
+    """
+
+    def _next_value(self, table: DenseTable, state: int, action: int) -> float:
+        return max(self._value(table, state, a) for a in ACTION_INDEX.values())
+
+    def _keeps_traces(self, table: DenseTable, state: int, action: int) -> bool:
+        return self._value(table, state, action) == self._next_value(
+            table, state, action
+        )
+
+
+def create_learner(
+    name: str, alpha: float = 0.05, lam: float = 0.8
+) -> Optional[Learner]:
+    """名前から学習則を作る。
+
+    Args:
+        name (str): LEARNERSのいずれか。"average"は全期間の平均（Table.update）
+        alpha (float, optional): ステップサイズ. Defaults to 0.05.
+        lam (float, optional): traceの減衰率. Defaults to 0.8.
+
+    Returns:
+        Optional[Learner]: 学習則。"average"の場合はNone
+    """
+    if name == "average":
+        return None
+    if name == "mc":
+        return MonteCarlo(alpha)
+    if name == "sarsa":
+        return SarsaLambda(alpha, lam)
+    if name == "q":
+        return QLambda(alpha, lam)
+    raise ValueError(f"unknown learner: {name}")
+
+
+def learning_curve(
+    learner: Optional[Learner],
+    num_episodes: int,
+    eval_every: int,
+    eval_games: int = 20000,
+    epsilon: float = 0.8,
+    decay: float = 0.7,
+    batch_size: int = 100,
+    seed: Optional[int] = None,
+) -> list[tuple[int, float]]:
+    """学習則を用いてAgentを学習させ、eval_everyエピソードごとに勝率を測る。
+    epsilonは各区間でdecay倍に減らす。勝率は学習中の評価値を固定した方策で、
+    毎回同じデッキを用いて測るため、学習則の間や区間の間で比較しやすい。
+
+    Args:
+        learner (Optional[Learner]): 学習則。Noneの場合は全期間の平均
+        num_episodes (int): 学習するエピソード数
+        eval_every (int): 勝率を測る間隔のエピソード数
+        eval_games (int, optional): 勝率を測るゲームの数. Defaults to 20000.
+        epsilon (float, optional): 最初の区間のepsilon. Defaults to 0.8.
+        decay (float, optional): 区間ごとにepsilonに掛ける減衰率. Defaults to 0.7.
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 100.
+        seed (Optional[int], optional): 乱数のシード. Defaults to None.
+
+    Returns:
+        list[tuple[int, float]]: 学習したエピソード数と勝率の組
+    """
+    train_seed, eval_seed = np.random.SeedSequence(seed).spawn(2)
+    rng = np.random.default_rng(train_seed)
+    eval_decks = shuffled_decks(eval_games, np.random.default_rng(eval_seed))
+    agent = Agent(DenseTable(), learner=learner)
+
+    curve = []
+    for k, start in enumerate(range(0, num_episodes, eval_every)):
+        size = min(eval_every, num_episodes - start)
+        train_batch(agent, np.full(size, epsilon * decay**k), batch_size, rng)
+
+        policy = Agent(FrozenPolicy.freeze(agent.table))
+        result = play_batch(
+            policy,
+            eval_decks,
+            np.zeros(eval_games),
+            np.random.default_rng(eval_seed),
+        )
+        curve.append((start + size, float(np.mean(result.rewards == Reward.win))))
+    return curve
+
+
+def _plot(curves: dict[str, list[tuple[int, float]]], path: str) -> bool:
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    fig, ax = plt.subplots()
+    for name, curve in curves.items():
+        episodes, win_rates = zip(*curve)
+        ax.plot(episodes, win_rates, label=name)
+    ax.set_xlabel("episodes")
+    ax.set_ylabel("win rate")
+    ax.legend()
+    fig.savefig(path)
+    plt.close(fig)
+    return True
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="学習則ごとに、学習したエピソード数に対する勝率を比較する。"
+    )
+    parser.add_argument(
+        "--learners", nargs="+", choices=LEARNERS, default=list(LEARNERS)
+    )
+    parser.add_argument("--episodes", type=int, default=200000)
+    parser.add_argument("--eval-every", type=int, default=10000)
+    parser.add_argument("--eval-games", type=int, default=20000)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--lam", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果を保存するCSVのパス")
+    parser.add_argument(
+        "--plot", help="グラフを保存する画像のパス。matplotlibが必要"
+    )
+    args = parser.parse_args(argv)
+
+    curves = {}
+    for name in args.learners:
+        curves[name] = learning_curve(
+            create_learner(name, args.alpha, args.lam),
+            args.episodes,
+            args.eval_every,
+            args.eval_games,
+            seed=args.seed,
+        )
+
+    print("episodes " + " ".join(f"{name:>8s}" for name in curves))
+    for i, (episodes, _) in enumerate(next(iter(curves.values()))):
+        rates = " ".join(f"{curve[i][1]:8.4f}" for curve in curves.values())
+        print(f"{episodes:8d} {rates}")
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["learner", "episodes", "win_rate"])
+            for name, curve in curves.items():
+                writer.writerows((name, episodes, rate) for episodes, rate in curve)
+    if args.plot and not _plot(curves, args.plot):
+        print("matplotlib is not installed; skipped --plot", file=sys.stderr)
@@ -0,0 +1,124 @@
+"""複数のプロセスでAgentを独立に学習させ、得られたDenseTableを統合する。"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import Agent, DenseTable
+from blackjack.simulator import epsilon_schedule, train_batch
+
+
+def worker_epsilons(
+    num_episodes: int, epsilon: float, factor: float, start_episode: int = 0
+) -> np.ndarray:
+    """一つのプロセスが学習する各エピソードのepsilonを求める。
+    epsilonの減衰は再開前を含めたエピソード数の半分を過ぎてから始め、
+    再開した場合はstart_episodeエピソード目の値から続ける。
+
+    Args:
+        num_episodes (int): このプロセスで学習するエピソード数
+        epsilon (float): epsilonの初期値
+        factor (float): epsilonの減衰率
+        start_episode (int, optional): このプロセスの分の再開前のエピソード数.
+            Defaults to 0.
+
+    Returns:
+        np.ndarray: 各エピソードのepsilon (num_episodes,)
+    """
+    total = start_episode + num_episodes
+    return epsilon_schedule(total, epsilon, factor, total / 2)[start_episode:]
+
+
+def split_episodes(
+    num_episodes: int, workers: int, start_episode: int = 0
+) -> list[tuple[int, int]]:
+    """再開前と再開後のエピソードをそれぞれworkers個のプロセスに分ける。
+
+    Args:
+        num_episodes (int): 全プロセスで学習するエピソード数
+        workers (int): プロセスの数
+        start_episode (int, optional): 再開前のエピソード数. Defaults to 0.
+
+    Returns:
+        list[tuple[int, int]]: 各プロセスの学習するエピソード数と再開前のエピソード数
+    """
+
+    def split(n: int) -> list[int]:
+        return [len(c) for c in np.array_split(np.arange(n), workers)]
+
+    totals = split(start_episode + num_episodes)
+    starts = split(start_episode)
+    return [(total - start, start) for total, start in zip(totals, starts)]
+
+
+def train_worker(
+    num_episodes: int,
+    epsilon: float,
+    factor: float,
+    batch_size: int,
+    seed: np.random.SeedSequence,
+    start_episode: int = 0,
+) -> DenseTable:
+    """一つのプロセスで空のDenseTableからAgentを学習させる。
+    epsilonはworker_epsilonsに従う。
+
+    Args:
+        num_episodes (int): エピソード数
+        epsilon (float): epsilonの初期値
+        factor (float): epsilonの減衰率
+        batch_size (int): 一度にプレイするゲームの数
+        seed (np.random.SeedSequence): このプロセスの乱数のシード
+        start_episode (int, optional): このプロセスの分の再開前のエピソード数.
+            Defaults to 0.
+
+    Returns:
+        DenseTable: 学習したDenseTable
+    """
+    agent = Agent(DenseTable())
+    epsilons = worker_epsilons(num_episodes, epsilon, factor, start_episode)
+    train_batch(agent, epsilons, batch_size, np.random.default_rng(seed))
+    return agent.table
+
+
+def train_parallel(
+    num_episodes: int,
+    workers: int,
+    epsilon: float = 0.8,
+    factor: float = 0.99,
+    batch_size: int = 100,
+    seed: Optional[int] = None,
+    start_episode: int = 0,
+) -> DenseTable:
+    """エピソードをworkers個のプロセスに分けて学習させ、DenseTable.mergeで統合する。
+    各プロセスはSeedSequence.spawnで分けた独立な乱数を用いる。
+
+    Args:
+        num_episodes (int): 全プロセスの合計エピソード数
+        workers (int): プロセスの数
+        epsilon (float, optional): epsilonの初期値. Defaults to 0.8.
+        factor (float, optional): epsilonの減衰率. Defaults to 0.99.
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 100.
+        seed (Optional[int], optional): 乱数のシード. Defaults to None.
+        start_episode (int, optional): 再開前に学習したエピソード数。各プロセスの
+            epsilonは再開前の分だけ減衰させた値から始める. Defaults to 0.
+
+    Returns:
+        DenseTable: 統合したDenseTable
+    """
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    args = [
+        (n, epsilon, factor, batch_size, worker_seed, start)
+        for (n, start), worker_seed in zip(
+            split_episodes(num_episodes, workers, start_episode), seeds
+        )
+    ]
+
+    if workers == 1:
+        return train_worker(*args[0])
+
+    table = DenseTable()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for worker_table in executor.map(train_worker, *zip(*args)):
+            table.merge(worker_table)
+
+    return table
@@ -0,0 +1,165 @@
+"""学習済みのTableを、状態のインデックスから直接Actionを引ける配列に固定する。
+
+推論時はTableの評価値を比較する必要がないため、状態ごとに選ぶActionだけを
+1バイトで保持する。配列は書き込み不可とし、参照によってTableが変化することもない。
+"""
+from typing import Optional, Union
+
+import numpy as np
+
+from blackjack.base import ACTION_INDEX, Action, DenseTable, Environment, Table
+from blackjack.state import NUM_STATES, state_index
+
+# 両方のActionの評価値が等しく、ランダムに選ぶ状態
+TIE = -1
+DRAW = ACTION_INDEX[Action.draw]
+STAND = ACTION_INDEX[Action.stand]
+
+
+def table_values(table: Union[Table, DenseTable]) -> np.ndarray:
+    """Tableの評価値をDenseTable.valuesと同じ形式の配列にする。Tableは変更しない。
+
+    Args:
+        table (Union[Table, DenseTable]): Table
+
+    Returns:
+        np.ndarray: 評価値 (NUM_STATES, len(Action))
+    """
+    if isinstance(table, DenseTable):
+        return table.values
+
+    values = np.zeros((NUM_STATES, len(Action)))
+    for env, scores in table._table.items():
+        try:
+            index = state_index(env.key)
+        except KeyError:
+            # DenseTableで扱えない状態は、推論時にも現れない
+            continue
+        for action, i in ACTION_INDEX.items():
+            values[index, i] = scores.get(action, 0.0)
+    return values
+
+
+class FrozenPolicy:
+    """状態ごとに選ぶActionを保持する変更不可の方策。
+    Agent(FrozenPolicy)として学習済みのTableの代わりに用いることもできる。
+
+    Args:
+        decisions (np.ndarray): 各状態で選ぶActionのインデックス。
+            TIEはランダムに選ぶことを表す (NUM_STATES,)
+    """
+
+    def __init__(self, decisions: np.ndarray):
+        if decisions.shape != (NUM_STATES,):
+            raise ValueError(
+                f"expected an array of shape {(NUM_STATES,)}, got {decisions.shape}"
+            )
+        self.decisions = decisions.astype(np.int8)
+        self.decisions.flags.writeable = False
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "FrozenPolicy":
+        """評価値の配列から、評価値の高いActionを選ぶ方策を作る。
+
+        Args:
+            values (np.ndarray): 評価値 (NUM_STATES, len(Action))
+
+        Returns:
+            FrozenPolicy: 方策
+        """
+        draw = values[:, DRAW]
+        stand = values[:, STAND]
+        decisions = np.where(draw > stand, DRAW, STAND)
+        decisions[draw == stand] = TIE
+        return cls(decisions)
+
+    @classmethod
+    def freeze(cls, table: Union[Table, DenseTable]) -> "FrozenPolicy":
+        """学習済みのTableを方策に固定する。Tableは変更しない。
+
+        Args:
+            table (Union[Table, DenseTable]): 学習済みのTable
+
+        Returns:
+            FrozenPolicy: Tableの評価値が高いActionを選ぶ方策
+        """
+        return cls.from_values(table_values(table))
+
+    def decide(
+        self,
+        states: np.ndarray,
+        u_tie: Optional[np.ndarray] = None,
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.ndarray:
+        """複数の状態でカードを引くかどうかをまとめて決める。
+        評価値が等しい状態の選択を再現できるよう、u_tieかrngのいずれかが必要となる。
+
+        Args:
+            states (np.ndarray): 状態のインデックス (n,)
+            u_tie (Optional[np.ndarray], optional): 評価値が等しい状態でActionを選ぶための
+                [0, 1)の一様乱数。0.5より大きければカードを引く。
+                Noneの場合はrngから生成する. Defaults to None.
+            rng (Optional[np.random.Generator], optional): u_tieを生成する乱数生成器.
+                Defaults to None.
+
+        Raises:
+            ValueError: u_tieとrngのいずれも指定しなかった場合
+
+        Returns:
+            np.ndarray: カードを引くかどうか (n,)
+        """
+        decisions = self.decisions[states]
+        tie = decisions == TIE
+        if u_tie is None:
+            if rng is None:
+                raise ValueError("either u_tie or an rng is required to break ties")
+            u_tie = rng.random(len(decisions))
+        return np.where(tie, u_tie > 0.5, decisions == DRAW)
+
+    def lookup(self, states: np.ndarray) -> np.ndarray:
+        """DenseTable.lookupと同じ形式で、選ぶActionを1、それ以外を0とした評価値を返す。
+
+        Args:
+            states (np.ndarray): 状態のインデックス (n,)
+
+        Returns:
+            np.ndarray: 各状態の各Actionの評価値 (n, len(Action))
+        """
+        decisions = self.decisions[states]
+        scores = np.zeros((len(decisions), len(Action)))
+        scores[decisions == DRAW, DRAW] = 1.0
+        scores[decisions == STAND, STAND] = 1.0
+        return scores
+
+    def __getitem__(self, key: Environment) -> dict[Action, float]:
+        decision = self.decisions[state_index(key.key)]
+        return {action: float(i == decision) for action, i in ACTION_INDEX.items()}
+
+    def __len__(self) -> int:
+        # Actionが一つに決まっている状態の数
+        return int(np.count_nonzero(self.decisions != TIE))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FrozenPolicy):
+            return NotImplemented
+        return np.array_equal(self.decisions, other.decisions)
+
+    def save(self, path: str) -> None:
+        """方策をNumPyの.npy形式で保存する。
+
+        Args:
+            path (str): 保存するパス
+        """
+        np.save(path, self.decisions, allow_pickle=False)
+
+    @classmethod
+    def load(cls, path: str) -> "FrozenPolicy":
+        """saveで保存した方策を読み込む。
+
+        Args:
+            path (str): 読み込むパス
+
+        Returns:
+            FrozenPolicy: 方策
+        """
+        return cls(np.load(path, allow_pickle=False))
@@ -0,0 +1,143 @@
+"""学習ループの各フェーズにかかった時間と回数を記録する。
+
+計測する側では``profiler is not None``のときにのみProfilerを呼び出すため、
+Profilerを渡さない場合は計測のための処理が一切行われない。
+"""
+import json
+import time
+from collections import defaultdict
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def max_rss_kb() -> Optional[int]:
+    """このプロセスの最大常駐メモリを取得する。
+
+    Returns:
+        Optional[int]: 最大常駐メモリ(KB)。取得できない環境ではNone
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Profiler:
+    """フェーズごとの経過時間、カウンタ、定期的なスナップショットを保持する。
+
+    Args:
+        snapshot_every (int, optional): 何エピソードごとにスナップショットをとるか。
+            0の場合はとらない. Defaults to 0.
+        path (Optional[str], optional): スナップショットのたびに要約を書き出すJSONのパス.
+            Defaults to None.
+    """
+
+    def __init__(self, snapshot_every: int = 0, path: Optional[str] = None):
+        self.snapshot_every = snapshot_every
+        self.path = path
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.snapshots = []
+        self._started = time.perf_counter()
+
+    @staticmethod
+    def now() -> float:
+        return time.perf_counter()
+
+    def lap(self, phase: str, since: float) -> float:
+        """sinceからの経過時間をphaseに加算する。
+
+        Args:
+            phase (str): フェーズの名前
+            since (float): フェーズの開始時刻
+
+        Returns:
+            float: 現在時刻。次のフェーズの開始時刻として用いる
+        """
+        now = time.perf_counter()
+        self.times[phase] += now - since
+        self.calls[phase] += 1
+        return now
+
+    def count(self, name: str, n: int = 1) -> None:
+        """カウンタを増やす。
+
+        Args:
+            name (str): カウンタの名前
+            n (int, optional): 増やす数. Defaults to 1.
+        """
+        self.counters[name] += n
+
+    def episode_done(self, table, n: int = 1) -> None:
+        """エピソードの終了を記録し、必要であればスナップショットをとる。
+
+        Args:
+            table: 学習中のTable。状態数をスナップショットに含める
+            n (int, optional): 終了したエピソードの数. Defaults to 1.
+        """
+        before = self.counters["episodes"]
+        self.counters["episodes"] += n
+        if self.snapshot_every <= 0:
+            return
+        # n個のエピソードの間にsnapshot_everyの倍数をまたいだらスナップショットをとる
+        after = self.counters["episodes"]
+        if before // self.snapshot_every != after // self.snapshot_every:
+            self.snapshot(table)
+
+    def snapshot(self, table=None) -> dict:
+        """現在の計測結果を記録する。
+
+        Args:
+            table (optional): 学習中のTable. Defaults to None.
+
+        Returns:
+            dict: スナップショット
+        """
+        elapsed = time.perf_counter() - self._started
+        snapshot = {
+            "elapsed": elapsed,
+            "episodes": self.counters["episodes"],
+            "episodes_per_sec": self.counters["episodes"] / elapsed if elapsed else 0,
+            "table_size": len(table) if table is not None else None,
+            "max_rss_kb": max_rss_kb(),
+            "times": dict(self.times),
+        }
+        self.snapshots.append(snapshot)
+        if self.path:
+            self.write(self.path)
+        return snapshot
+
+    def summary(self) -> dict:
+        """計測結果の要約を取得する。
+
+        Returns:
+            dict: フェーズごとの合計時間・呼び出し回数・割合、カウンタ、スナップショット
+        """
+        total = sum(self.times.values())
+        return {
+            "elapsed": time.perf_counter() - self._started,
+            "phases": {
+                phase: {
+                    "seconds": seconds,
+                    "calls": self.calls[phase],
+                    "fraction": seconds / total if total else 0.0,
+                }
+                for phase, seconds in self.times.items()
+            },
+            "counters": dict(self.counters),
+            "max_rss_kb": max_rss_kb(),
+            "snapshots": self.snapshots,
+        }
+
+    def write(self, path: str) -> None:
+        """要約をJSONとして書き出す。
+
+        Args:
+            path (str): 書き出すパス
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,251 @@
+"""自己対戦で得た経験を追記専用のバイナリログに保存し、後からまとめて学習する。
+
+ログは16バイトのヘッダと、手番ごとの固定長のレコードからなる。
+レコードは状態のインデックス、Actionのインデックス、エピソードのReward、
+エピソード内での手番の番号を持つ。手番の番号が0のレコードがエピソードの先頭となる。
+"""
+import argparse
+import os
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from blackjack.base import ACTION_INDEX, Action, DenseTable, Environment, Reward
+from blackjack.checkpoint import load_table, save_table
+
+if TYPE_CHECKING:
+    from blackjack.learners import Learner
+
+MAGIC = b"BJEXPLOG"
+VERSION = 1
+HEADER = MAGIC + VERSION.to_bytes(4, "little") + bytes(4)
+RECORD_DTYPE = np.dtype(
+    [("state", "<u4"), ("action", "u1"), ("reward", "i1"), ("step", "u1"), ("_", "u1")]
+)
+
+
+class ExperienceLogError(ValueError):
+    """ログのファイルが不正な場合に送出される。"""
+
+
+def _check_header(header: bytes) -> None:
+    if header != HEADER:
+        raise ExperienceLogError("not an experience log")
+
+
+def episode_steps(num_actions: np.ndarray) -> np.ndarray:
+    """各エピソードの手番の番号を並べた配列を作る。
+
+    Args:
+        num_actions (np.ndarray): 各エピソードの手番の数 (episodes,)
+
+    Returns:
+        np.ndarray: 手番の番号 (sum(num_actions),)
+    """
+    starts = np.cumsum(num_actions) - num_actions
+    return np.arange(num_actions.sum()) - np.repeat(starts, num_actions)
+
+
+class ExperienceWriter:
+    """経験をログに追記する。書き込みはbuffer_size手番分ずつまとめて行う。
+
+    Args:
+        path (str): ログのパス。既存のログには追記する。書き込み途中で途切れた
+            末尾のレコードは、追記するレコードがずれないように切り詰める
+        buffer_size (int, optional): まとめて書き込む手番の数. Defaults to 65536.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 65536):
+        self.path = path
+        self._buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self._size = 0
+        self.records = 0
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, "rb") as f:
+                _check_header(f.read(len(HEADER)))
+            num_records = (os.path.getsize(path) - len(HEADER)) // RECORD_DTYPE.itemsize
+            os.truncate(path, len(HEADER) + num_records * RECORD_DTYPE.itemsize)
+        self._file = open(path, "ab")
+        if not exists:
+            self._file.write(HEADER)
+
+    def __enter__(self) -> "ExperienceWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(
+        self, envs: list[Environment], actions: list[Action], reward: Reward
+    ) -> None:
+        """一つのエピソードを追記する。Agent.register_experienceと同じ引数をとる。
+
+        Args:
+            envs (list[Environment]): 各手番のEnvironment
+            actions (list[Action]): 各手番のAction
+            reward (Reward): エピソードのReward
+        """
+        states = np.array([DenseTable.index(env) for env in envs])
+        action_indices = np.array([ACTION_INDEX[action] for action in actions])
+        rewards = np.full(len(states), reward.value)
+        self.append_batch(states, action_indices, rewards, np.arange(len(states)))
+
+    def append_batch(
+        self,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        steps: np.ndarray,
+    ) -> None:
+        """複数の手番をまとめて追記する。
+
+        Args:
+            states (np.ndarray): 状態のインデックス (n,)
+            actions (np.ndarray): Actionのインデックス (n,)
+            rewards (np.ndarray): エピソードのReward (n,)
+            steps (np.ndarray): エピソード内での手番の番号 (n,)
+        """
+        records = np.zeros(len(states), dtype=RECORD_DTYPE)
+        records["state"] = states
+        records["action"] = actions
+        records["reward"] = rewards
+        records["step"] = steps
+
+        if self._size + len(records) > len(self._buffer):
+            self.flush()
+        if len(records) > len(self._buffer):
+            self._file.write(records.tobytes())
+        else:
+            self._buffer[self._size : self._size + len(records)] = records
+            self._size += len(records)
+        self.records += len(records)
+
+    def flush(self) -> None:
+        """バッファに溜まった手番をファイルに書き込む。"""
+        if self._size > 0:
+            self._file.write(self._buffer[: self._size].tobytes())
+            self._size = 0
+        self._file.flush()
+
+    def close(self) -> None:
+        """残りの手番を書き込んでファイルを閉じる。"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_experiences(path: str, chunk_size: int = 1 << 20) -> Iterator[np.ndarray]:
+    """ログの手番をchunk_size個ずつ読み込む。
+    ファイルはメモリマップで参照するため、ログ全体をメモリに載せることはない。
+    書き込み途中で途切れた末尾のレコードは読み飛ばす。
+
+    Args:
+        path (str): ログのパス
+        chunk_size (int, optional): 一度に読み込む手番の数. Defaults to 1 << 20.
+
+    Raises:
+        ExperienceLogError: ファイルが不正な場合
+
+    Yields:
+        Iterator[np.ndarray]: RECORD_DTYPEの配列
+    """
+    with open(path, "rb") as f:
+        _check_header(f.read(len(HEADER)))
+
+    num_records = (os.path.getsize(path) - len(HEADER)) // RECORD_DTYPE.itemsize
+    if num_records == 0:
+        return
+    records = np.memmap(
+        path, dtype=RECORD_DTYPE, mode="r", offset=len(HEADER), shape=(num_records,)
+    )
+    for start in range(0, num_records, chunk_size):
+        yield records[start : start + chunk_size]
+
+
+def _learn_records(learner: "Learner", table: DenseTable, records: np.ndarray) -> None:
+    # recordsはエピソードの先頭から始まり、エピソードの途中で終わらない
+    starts = np.flatnonzero(records["step"] == 0)
+    if len(starts) == 0:
+        return
+    learner.update_episodes(
+        table,
+        records["state"].astype(np.int64),
+        records["action"].astype(np.int64),
+        records["reward"][starts].astype(np.float64),
+        np.diff(np.append(starts, len(records))),
+    )
+
+
+def replay(
+    path: str,
+    table: Optional[DenseTable] = None,
+    chunk_size: int = 1 << 20,
+    learner: Optional["Learner"] = None,
+) -> DenseTable:
+    """ログの全ての手番を学習する。learnerを指定しない場合は
+    DenseTable.update_batchでまとめて平均し、指定した場合はエピソードごとに
+    learnerで学習する。
+
+    Args:
+        path (str): ログのパス
+        table (Optional[DenseTable], optional): 学習を続けるDenseTable。
+            Noneの場合は空のDenseTableから学習する. Defaults to None.
+        chunk_size (int, optional): 一度に学習する手番の数. Defaults to 1 << 20.
+        learner (Optional[Learner], optional): 学習則。Noneの場合は全期間の平均.
+            Defaults to None.
+
+    Returns:
+        DenseTable: 学習したDenseTable
+    """
+    if table is None:
+        table = DenseTable()
+    pending = np.zeros(0, dtype=RECORD_DTYPE)
+    for records in read_experiences(path, chunk_size):
+        if learner is None:
+            table.update_batch(
+                records["state"].astype(np.int64),
+                records["action"].astype(np.int64),
+                records["reward"].astype(np.float64),
+            )
+            continue
+        # 最後のエピソードは次のchunkに続くことがあるため、次のchunkと合わせて学習する
+        records = np.concatenate([pending, records])
+        starts = np.flatnonzero(records["step"] == 0)
+        end = starts[-1] if len(starts) > 0 else 0
+        _learn_records(learner, table, records[:end])
+        pending = records[end:]
+    if learner is not None:
+        _learn_records(learner, table, pending)
+    return table
+
+
+def main(argv: Optional[list[str]] = None):
+    # blackjack.learnersはblackjack.simulatorを経由してこのモジュールを読み込む
+    from blackjack.learners import LEARNERS, create_learner
+
+    parser = argparse.ArgumentParser(description="経験のログからTableを学習する。")
+    parser.add_argument("log", help="経験のログのパス")
+    parser.add_argument("--save", help="学習したTableを保存するパス")
+    parser.add_argument("--resume", help="このTableに追加で学習する")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20)
+    parser.add_argument(
+        "--learner",
+        choices=LEARNERS,
+        default="average",
+        help="評価値の更新則。averageは全期間の平均、mcは一定のステップサイズの"
+        "モンテカルロ法、sarsaはSARSA(λ)、qはQ(λ)",
+    )
+    parser.add_argument("--alpha", type=float, default=0.05, help="更新則のステップサイズ")
+    parser.add_argument("--lam", type=float, default=0.8, help="sarsaとqのtraceの減衰率")
+    args = parser.parse_args(argv)
+
+    table = load_table(args.resume, mmap_mode=None) if args.resume else None
+    learner = create_learner(args.learner, args.alpha, args.lam)
+    table = replay(args.log, table, args.chunk_size, learner)
+
+    print(f"{int(table._count.sum())}手番から{len(table)}個の状態を学習しました。")
+    if args.save:
+        save_table(table, args.save)
@@ -0,0 +1,99 @@
+"""シード付きの独立した乱数列。
+
+Deck, Shoe, Agentなどは乱数生成器をrngとして受け取り、省略した場合は
+randomモジュールのグローバルな乱数を用いる。RandomStreamはrandomモジュールと
+同じメソッドを持ち、これらにそのまま渡すことができる。
+"""
+import itertools
+from collections.abc import Iterator, Sequence
+from typing import Union
+
+import numpy as np
+
+Seed = Union[None, int, Sequence[int], np.random.SeedSequence, np.random.Generator]
+
+
+class RandomStream:
+    """NumPyのGeneratorを用いた、randomモジュールと互換の乱数生成器。
+    一様乱数はblock_size個ずつまとめて生成し、random()で一つずつ取り出す。
+    同じシードからは常に同じ乱数列が得られる。
+
+    Args:
+        seed (Seed, optional): シード。Generatorを渡した場合はそれをそのまま用いる.
+            Defaults to None.
+        block_size (int, optional): 一度に生成する一様乱数の数. Defaults to 4096.
+    """
+
+    def __init__(self, seed: Seed = None, block_size: int = 4096):
+        if isinstance(seed, np.random.Generator):
+            self.generator = seed
+        else:
+            if not isinstance(seed, np.random.SeedSequence):
+                seed = np.random.SeedSequence(seed)
+            self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.block_size = block_size
+        self._start([])
+
+    def _start(self, values: list) -> None:
+        # random()は一回のゲームで何度も呼ばれるため、Cで実装されたイテレータの
+        # __next__をそのまま用い、ブロックを使い切ったときだけPythonの処理を挟む
+        self._block = iter(values)
+        self.random = itertools.chain(
+            self._block, itertools.chain.from_iterable(self._blocks())
+        ).__next__
+
+    def _blocks(self) -> Iterator[Iterator[float]]:
+        while True:
+            self._block = iter(self.generator.random(self.block_size).tolist())
+            yield self._block
+
+    def __getstate__(self) -> dict:
+        # 取り出していない一様乱数を残して、同じ乱数列を続けられるようにする
+        remaining = list(self._block)
+        self._start(remaining)
+        return {
+            "generator": self.generator,
+            "block_size": self.block_size,
+            "remaining": remaining,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.generator = state["generator"]
+        self.block_size = state["block_size"]
+        self._start(state["remaining"])
+
+    def shuffle(self, x: list) -> None:
+        """リストをその場でシャッフルする。
+
+        Args:
+            x (list): シャッフルするリスト
+        """
+        x[:] = [x[i] for i in self.generator.permutation(len(x)).tolist()]
+
+    def sample(self, population: Sequence, k: int) -> list:
+        """重複なしでk個の要素を選ぶ。
+
+        Args:
+            population (Sequence): 選ぶ対象
+            k (int): 選ぶ数
+
+        Returns:
+            list: 選ばれた要素
+        """
+        indices = self.generator.choice(len(population), k, replace=False)
+        return [population[i] for i in indices.tolist()]
+
+    def spawn(self, n: int) -> list["RandomStream"]:
+        """互いに独立なn個の乱数列を作る。並列に動かすワーカーごとに用いる。
+
+        Args:
+            n (int): 乱数列の数
+
+        Returns:
+            list[RandomStream]: 乱数列
+        """
+        return [
+            RandomStream(generator, self.block_size)
+            for generator in self.generator.spawn(n)
+        ]
+
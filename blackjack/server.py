@@ -0,0 +1,356 @@
+"""複数のゲームを同時に受け付けるasyncioのサーバー。
+
+接続ごとに独立したBlackjackEnvを持ち、行単位のテキストで通信する。
+ゲームの進行はI/Oを伴わない同期的な処理であり、入力待ちの間は他の接続の処理に移る。
+
+プロトコル（UTF-8, 改行区切り）:
+    接続時: ``WELCOME blackjack <VERSION>``
+    ``DEAL``  -> ``STATE <総ポイント> <手札> <Dealerの表向きのカード>``
+    ``HIT``   -> ``STATE ...`` またはバーストした場合は ``RESULT ...``
+    ``STAND`` -> ``RESULT <win|tie|lose> <総ポイント> <Dealerの総ポイント> <Dealerの手札>``
+    ``QUIT``  -> ``BYE`` の後に切断
+    不正なコマンドには ``ERROR <理由>`` を返す。
+    StreamReaderの上限（64KiB）より長い行には ``ERROR line too long`` を返して切断する。
+手札はカンマ区切りのカード（例: ``spade_A,heart_10``）で表す。
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from blackjack.base import CARDS, Action, BasePlayer, Dealer, Deck, Reward
+from blackjack.engine import BlackjackEnv
+
+VERSION = 1
+RESULT_NAMES = {Reward.win: "win", Reward.tie: "tie", Reward.lose: "lose"}
+
+
+class ProtocolError(ValueError):
+    """ゲームの状態に合わないコマンドを受け取った場合に送出される。"""
+
+
+class GameSession:
+    """一つの接続で行うゲームの状態。コマンドを一つ受け取り、応答を一行返す。
+
+    Args:
+        rng (optional): デッキのシャッフルに用いる乱数生成器.
+            Defaults to None (randomモジュール).
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng
+        self.deck = Deck(rng)
+        self.env = BlackjackEnv(self.deck)
+
+    @property
+    def player(self) -> BasePlayer:
+        return self.env.player
+
+    @property
+    def dealer(self) -> Dealer:
+        return self.env.dealer
+
+    @property
+    def in_game(self) -> bool:
+        return not self.env.done
+
+    def handle(self, line: str) -> str:
+        """コマンドを処理して応答を返す。
+
+        Args:
+            line (str): コマンド
+
+        Returns:
+            str: 応答
+        """
+        command = line.strip().upper()
+        try:
+            if command == "DEAL":
+                return self.deal()
+            if command == "HIT":
+                return self.hit()
+            if command == "STAND":
+                return self.stand()
+        except ProtocolError as e:
+            return f"ERROR {e}"
+        return f"ERROR unknown command {command!r}"
+
+    def deal(self) -> str:
+        """新しいゲームを始め、二枚ずつ配る。"""
+        if self.in_game:
+            raise ProtocolError("game in progress")
+
+        # 配ったカードを全てデッキに戻してシャッフルする
+        self.deck.cards[:] = CARDS
+        self.deck.shuffle()
+        self.env.reset()
+        return self._state()
+
+    def hit(self) -> str:
+        """Playerがもう一枚引く。"""
+        return self._step(Action.draw)
+
+    def stand(self) -> str:
+        """Dealerが17ポイント以上になるまで引き、勝敗を決める。"""
+        return self._step(Action.stand)
+
+    def _step(self, action: Action) -> str:
+        if not self.in_game:
+            raise ProtocolError("no game in progress")
+
+        _, reward, done = self.env.step(action)
+        if done:
+            return self._result(reward)
+        return self._state()
+
+    def _state(self) -> str:
+        cards = ",".join(map(repr, self.player.hands))
+        return f"STATE {self.player.total_points} {cards} {self.dealer.hands[0]!r}"
+
+    def _result(self, reward: Reward) -> str:
+        dealer_cards = ",".join(map(repr, self.dealer.hands))
+        return (
+            f"RESULT {RESULT_NAMES[reward]} {self.player.total_points} "
+            f"{self.dealer.total_points} {dealer_cards}"
+        )
+
+
+async def _reject(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reason: str
+) -> None:
+    # 未読のデータを残して閉じると接続がリセットされ、応答が届かないことがある。
+    # 応答を送って送信側を閉じ、相手が切断するまで残りの入力を読み捨てる
+    try:
+        writer.write(f"ERROR {reason}\n".encode())
+        writer.write_eof()
+        while await reader.read(1 << 16):
+            pass
+    except ConnectionError:
+        pass
+
+
+async def handle_connection(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """一つの接続でコマンドを受け取り続ける。"""
+    session = GameSession()
+    writer.write(f"WELCOME blackjack {VERSION}\n".encode())
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip().upper() == b"QUIT":
+                writer.write(b"BYE\n")
+                break
+            writer.write((session.handle(line.decode()) + "\n").encode())
+            await writer.drain()
+    except (ConnectionError, UnicodeDecodeError):
+        pass
+    except ValueError:
+        # 行がStreamReaderの上限より長い場合
+        await _reject(reader, writer, "line too long")
+    finally:
+        writer.close()
+
+
+async def start_server(
+    host: str = "127.0.0.1",
+    port: int = 8470,
+    path: Optional[str] = None,
+    backlog: int = 1024,
+) -> asyncio.AbstractServer:
+    """サーバーを起動する。
+
+    Args:
+        host (str, optional): 待ち受けるホスト. Defaults to "127.0.0.1".
+        port (int, optional): 待ち受けるポート。0の場合は空いているポート.
+            Defaults to 8470.
+        path (Optional[str], optional): 指定した場合はUnixドメインソケットで待ち受ける.
+            Defaults to None.
+        backlog (int, optional): 受け付け待ちの接続の上限。
+            多数のクライアントが同時に接続すると既定の100では取りこぼす.
+            Defaults to 1024.
+
+    Returns:
+        asyncio.AbstractServer: 起動したサーバー
+    """
+    if path is not None:
+        return await asyncio.start_unix_server(
+            handle_connection, path, backlog=backlog
+        )
+    return await asyncio.start_server(handle_connection, host, port, backlog=backlog)
+
+
+class Client:
+    """サーバーに接続してコマンドを送るクライアント。
+    各コマンドの応答時間（秒）をlatenciesに記録する。
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = []
+
+    @classmethod
+    async def connect(
+        cls, host: str = "127.0.0.1", port: int = 8470, path: Optional[str] = None
+    ) -> "Client":
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        await client._readline()  # WELCOME
+        return client
+
+    async def _readline(self) -> str:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        return line.decode().rstrip("\n")
+
+    async def send(self, command: str) -> str:
+        """コマンドを送り、応答を受け取る。
+
+        Args:
+            command (str): コマンド
+
+        Returns:
+            str: 応答
+        """
+        start = time.perf_counter()
+        self.writer.write(f"{command}\n".encode())
+        await self.writer.drain()
+        response = await self._readline()
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+    async def play(self, strategy: Callable[[int], bool]) -> str:
+        """一回のゲームを最後までプレイする。
+
+        Args:
+            strategy (Callable[[int], bool]): 総ポイントを受け取り、カードを引くかどうかを返す
+
+        Returns:
+            str: 勝敗（win, tie, lose）
+        """
+        response = await self.send("DEAL")
+        while response.startswith("STATE"):
+            points = int(response.split()[1])
+            response = await self.send("HIT" if strategy(points) else "STAND")
+        if not response.startswith("RESULT"):
+            raise ConnectionError(f"unexpected response {response!r}")
+        return response.split()[1]
+
+    async def close(self) -> None:
+        try:
+            await self.send("QUIT")
+        except ConnectionError:
+            pass
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def load_test(
+    num_clients: int,
+    games_per_client: int,
+    host: str = "127.0.0.1",
+    port: int = 8470,
+    path: Optional[str] = None,
+) -> dict:
+    """多数のBotクライアントを同時に接続させ、応答時間とスループットを測定する。
+    Botは総ポイントが17未満の間はカードを引く。
+
+    Args:
+        num_clients (int): 同時に接続するクライアントの数
+        games_per_client (int): 各クライアントがプレイするゲームの数
+        host (str, optional): サーバーのホスト. Defaults to "127.0.0.1".
+        port (int, optional): サーバーのポート. Defaults to 8470.
+        path (Optional[str], optional): Unixドメインソケットのパス. Defaults to None.
+
+    Returns:
+        dict: ゲーム数、コマンド数、スループット、応答時間の分位点（ミリ秒）
+    """
+    latencies = []
+    results = {name: 0 for name in RESULT_NAMES.values()}
+
+    async def run_client():
+        client = await Client.connect(host, port, path)
+        for _ in range(games_per_client):
+            results[await client.play(lambda points: points < 17)] += 1
+        latencies.extend(client.latencies)
+        await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client() for _ in range(num_clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "clients": num_clients,
+        "games": num_clients * games_per_client,
+        "commands": len(latencies),
+        "elapsed": elapsed,
+        "games_per_sec": num_clients * games_per_client / elapsed,
+        "commands_per_sec": len(latencies) / elapsed,
+        "latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+        "latency_ms_p99": float(np.percentile(latencies_ms, 99)),
+        "latency_ms_max": float(latencies_ms.max()),
+        "results": results,
+    }
+
+
+def _add_address_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8470)
+    parser.add_argument("--unix", help="Unixドメインソケットのパス")
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Blackjackのゲームサーバーを起動する。")
+    _add_address_arguments(parser)
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = await start_server(args.host, args.port, args.unix)
+        print(f"{args.unix or f'{args.host}:{args.port}'}で待ち受けています。")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def client_main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="ゲームサーバーに接続してプレイする。--botsを指定した場合は負荷試験を行う。"
+    )
+    _add_address_arguments(parser)
+    parser.add_argument("--bots", type=int, default=0, help="同時に接続するBotの数")
+    parser.add_argument("--games", type=int, default=10, help="Bot一つあたりのゲーム数")
+    args = parser.parse_args(argv)
+
+    if args.bots > 0:
+        report = asyncio.run(
+            load_test(args.bots, args.games, args.host, args.port, args.unix)
+        )
+        for name, value in report.items():
+            print(f"{name:20s} {value}")
+        return
+
+    async def interactive():
+        client = await Client.connect(args.host, args.port, args.unix)
+        print(await client.send("DEAL"))
+        while True:
+            command = input("コマンド (HIT/STAND/DEAL/QUIT) > ").strip().upper()
+            if command == "QUIT":
+                break
+            print(await client.send(command))
+        await client.close()
+
+    asyncio.run(interactive())
@@ -0,0 +1,264 @@
+"""複数のプロセスが共有メモリ上の一つのDenseTableを同時に更新しながら学習する。
+
+parallel.train_parallelは各プロセスが独立に学習したTableを最後に統合するため、
+学習中は他のプロセスの経験を参照できない。ここではRewardの合計と回数の配列を
+multiprocessing.shared_memoryに置き、全てのプロセスが同じ配列を参照・更新する。
+
+書き込みはHogwild!と同様にロックをとらない方法と、状態のインデックスで配列を
+stripeに分けてstripeごとにロックをとる方法から選べる。ロックをとらない場合は
+同じ要素への同時の書き込みの一部が失われることがあるが、失われるのは
+ごく一部の経験であり、評価値はほとんど変わらない。
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import Action, Agent, DenseTable, Reward
+from blackjack.parallel import split_episodes, train_parallel, worker_epsilons
+from blackjack.policy import FrozenPolicy
+from blackjack.simulator import train_batch
+from blackjack.state import NUM_STATES
+
+_SHAPE = (NUM_STATES, len(Action))
+_ARRAY_BYTES = NUM_STATES * len(Action) * 8
+
+
+class SharedTable(DenseTable):
+    """Rewardの合計と回数の配列を共有メモリに置いたDenseTable。
+    nameを省略すると新しい共有メモリを確保し、指定すると既存のものに接続する。
+    確保したプロセスはunlinkで共有メモリを解放する必要がある。
+
+    Args:
+        name (Optional[str], optional): 接続する共有メモリの名前. Defaults to None.
+        locks (Optional[list], optional): stripeごとのロック。
+            Noneの場合はロックをとらずに書き込む. Defaults to None.
+    """
+
+    def __init__(self, name: Optional[str] = None, locks: Optional[list] = None):
+        self._shm = SharedMemory(name=name, create=name is None, size=2 * _ARRAY_BYTES)
+        self._sum = np.ndarray(_SHAPE, dtype=np.float64, buffer=self._shm.buf)
+        self._count = np.ndarray(
+            _SHAPE, dtype=np.int64, buffer=self._shm.buf, offset=_ARRAY_BYTES
+        )
+        if name is None:
+            self._sum.fill(0.0)
+            self._count.fill(0)
+        self.locks = locks
+
+    @classmethod
+    def create(cls, num_stripes: int = 0) -> "SharedTable":
+        """新しい共有メモリを確保する。
+
+        Args:
+            num_stripes (int, optional): ロックをとるstripeの数。
+                0の場合はロックをとらない. Defaults to 0.
+
+        Returns:
+            SharedTable: 空のSharedTable
+        """
+        locks = [multiprocessing.Lock() for _ in range(num_stripes)]
+        return cls(locks=locks or None)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def update_batch(
+        self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray
+    ) -> None:
+        if self.locks is None or len(states) == 0:
+            super().update_batch(states, actions, rewards)
+            return
+
+        # stripeの順にロックをとるため、複数のロックを同時に持つことはない
+        stripes = states % len(self.locks)
+        order = np.argsort(stripes, kind="stable")
+        stripes, states, actions = stripes[order], states[order], actions[order]
+        rewards = rewards[order]
+        bounds = np.flatnonzero(np.diff(stripes)) + 1
+        starts = [0, *bounds.tolist()]
+        ends = [*bounds.tolist(), len(states)]
+        for start, end in zip(starts, ends):
+            with self.locks[stripes[start]]:
+                super().update_batch(
+                    states[start:end], actions[start:end], rewards[start:end]
+                )
+
+    def to_dense(self) -> DenseTable:
+        """共有メモリの内容をコピーしたDenseTableを作る。
+
+        Returns:
+            DenseTable: 現在の評価値をもつDenseTable
+        """
+        return DenseTable.from_arrays(self._sum.copy(), self._count.copy())
+
+    def close(self) -> None:
+        """このプロセスから共有メモリへの接続を閉じる。"""
+        # 配列が共有メモリを参照したままでは閉じられない
+        self._sum = self._count = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """共有メモリを解放する。確保したプロセスで一度だけ呼び出す。"""
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        self.unlink()
+
+    def __reduce__(self):
+        raise TypeError(
+            "SharedTable cannot be pickled; attach by name in the worker instead"
+        )
+
+
+# 各ワーカープロセスが接続したSharedTable
+_worker_table: Optional[SharedTable] = None
+
+
+def _attach(name: str, locks: Optional[list]) -> None:
+    global _worker_table
+    _worker_table = SharedTable(name, locks)
+
+
+def _train_worker(
+    num_episodes: int,
+    epsilon: float,
+    factor: float,
+    batch_size: int,
+    seed: np.random.SeedSequence,
+    start_episode: int,
+) -> None:
+    agent = Agent(_worker_table)
+    epsilons = worker_epsilons(num_episodes, epsilon, factor, start_episode)
+    train_batch(agent, epsilons, batch_size, np.random.default_rng(seed))
+
+
+def train_shared(
+    num_episodes: int,
+    workers: int,
+    epsilon: float = 0.8,
+    factor: float = 0.99,
+    batch_size: int = 100,
+    seed: Optional[int] = None,
+    num_stripes: int = 0,
+    start_episode: int = 0,
+) -> DenseTable:
+    """エピソードをworkers個のプロセスに分け、共有メモリ上の一つのTableを
+    同時に更新しながら学習させる。各プロセスは他のプロセスの経験も参照して行動する。
+
+    Args:
+        num_episodes (int): 全プロセスの合計エピソード数
+        workers (int): プロセスの数
+        epsilon (float, optional): epsilonの初期値. Defaults to 0.8.
+        factor (float, optional): epsilonの減衰率. Defaults to 0.99.
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 100.
+        seed (Optional[int], optional): 乱数のシード. Defaults to None.
+        num_stripes (int, optional): ロックをとるstripeの数。
+            0の場合はロックをとらない. Defaults to 0.
+        start_episode (int, optional): 再開前に学習したエピソード数。各プロセスの
+            epsilonは再開前の分だけ減衰させた値から始める. Defaults to 0.
+
+    Returns:
+        DenseTable: 学習したTableのコピー
+    """
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    episodes = split_episodes(num_episodes, workers, start_episode)
+
+    with SharedTable.create(num_stripes) as table:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_attach, initargs=(table.name, table.locks)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _train_worker, n, epsilon, factor, batch_size, worker_seed, start
+                )
+                for (n, start), worker_seed in zip(episodes, seeds)
+            ]
+            for future in futures:
+                future.result()
+        return table.to_dense()
+
+
+def _win_rate(table: DenseTable, num_games: int, seed: int) -> float:
+    # 同じseedでは同じデッキでプレイするため、方法の間で比較しやすい
+    rewards = train_batch(
+        Agent(FrozenPolicy.freeze(table)),
+        np.zeros(num_games),
+        10000,
+        np.random.default_rng(seed),
+        learn=False,
+    )
+    return float(np.mean(rewards == Reward.win))
+
+
+def compare(
+    num_episodes: int,
+    workers: int,
+    num_stripes: int = 16,
+    eval_games: int = 100000,
+    seed: int = 0,
+) -> dict[str, dict[str, float]]:
+    """同じエピソード数を一つのプロセス、独立に学習してmerge、共有メモリで
+    ロックなし・stripeごとのロックの四通りで学習し、速度と勝率を比較する。
+
+    Args:
+        num_episodes (int): 学習するエピソード数
+        workers (int): プロセスの数
+        num_stripes (int, optional): stripeごとのロックで用いるstripeの数.
+            Defaults to 16.
+        eval_games (int, optional): 勝率を測るゲームの数. Defaults to 100000.
+        seed (int, optional): 乱数のシード. Defaults to 0.
+
+    Returns:
+        dict[str, dict[str, float]]: 方法ごとの秒数、一秒あたりのエピソード数、勝率
+    """
+    methods = {
+        "single": lambda: train_parallel(num_episodes, 1, seed=seed),
+        "merge": lambda: train_parallel(num_episodes, workers, seed=seed),
+        "hogwild": lambda: train_shared(num_episodes, workers, seed=seed),
+        "striped": lambda: train_shared(
+            num_episodes, workers, seed=seed, num_stripes=num_stripes
+        ),
+    }
+    results = {}
+    for name, method in methods.items():
+        start = time.perf_counter()
+        table = method()
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "seconds": elapsed,
+            "episodes_per_sec": num_episodes / elapsed,
+            "win_rate": _win_rate(table, eval_games, seed),
+        }
+    return results
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="共有メモリを用いた並列学習を、一つのプロセスでの学習と比較する。"
+    )
+    parser.add_argument("--episodes", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--stripes", type=int, default=16)
+    parser.add_argument("--eval-games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = compare(
+        args.episodes, args.workers, args.stripes, args.eval_games, args.seed
+    )
+    print(f"{'method':10s} {'seconds':>10s} {'episodes/sec':>14s} {'win rate':>10s}")
+    for name, result in results.items():
+        print(
+            f"{name:10s} {result['seconds']:10.2f} "
+            f"{result['episodes_per_sec']:14,.0f} {result['win_rate']:10.4f}"
+        )
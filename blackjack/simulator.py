@@ -0,0 +1,384 @@
+"""NumPyの整数配列を用いて、多数のゲームを同時に進めるバッチシミュレータ。
+
+Deck, Dealer, Agent.drawを一枚ずつ呼び出す代わりに、
+ゲームごとのデッキ・手札・ポイントを配列として保持するVectorBlackjackEnvを用いて、
+全ゲームの同じ手番をまとめて処理する。
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import (
+    ACTION_INDEX,
+    Action,
+    Agent,
+    Card,
+    DenseTable,
+    Environment,
+    Rank,
+    Reward,
+    Suit,
+)
+from blackjack.dealer import DEALER_BUST, OUTCOME_POINTS, DealerCache
+from blackjack.engine import (
+    DECK_RANKS,
+    MAX_HAND_SIZE,
+    NUM_CARDS,
+    RANK_CODES,
+    RANK_POINTS,
+    VectorBlackjackEnv,
+    hand_values,
+    lookup_dealer_distributions,
+)
+from blackjack.policy import FrozenPolicy
+from blackjack.profiling import Profiler
+from blackjack.replay import episode_steps
+from blackjack.state import encode_state, state_index_array
+
+# Environmentを組み立てる際に用いる各ランクの代表カード
+# Environmentはスートを区別しないため、スートは何でもよい
+_REPRESENTATIVE_CARDS = [None] + [Card(Suit.spade, rank) for rank in Rank]
+
+
+@dataclass
+class BatchResult:
+    """バッチで行ったゲームの結果。
+
+    Attributes:
+        player_cards (np.ndarray): Agentが受け取ったカードのランク (games, MAX_HAND_SIZE + 1)
+        upcards (np.ndarray): Dealerの表向きのカードのランク (games,)
+        actions (np.ndarray): 各手番でAgentがカードを引いたかどうか (games, MAX_HAND_SIZE)
+        num_actions (np.ndarray): 各ゲームでAgentがとったActionの数 (games,)
+        rewards (np.ndarray): 各ゲームのReward (games,)
+    """
+
+    player_cards: np.ndarray
+    upcards: np.ndarray
+    actions: np.ndarray
+    num_actions: np.ndarray
+    rewards: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rewards)
+
+    def episode(self, i: int) -> tuple[list[Environment], list[Action], Reward]:
+        """i番目のゲームを(Environment, Action, Reward)の形式に戻す。
+
+        Args:
+            i (int): ゲームの番号
+
+        Returns:
+            tuple[list[Environment], list[Action], Reward]: Agent.register_experienceの引数
+        """
+        cards = [_REPRESENTATIVE_CARDS[r] for r in self.player_cards[i]]
+        upcard = [_REPRESENTATIVE_CARDS[self.upcards[i]]]
+        num_actions = self.num_actions[i]
+
+        envs = [Environment(cards[: step + 2], upcard) for step in range(num_actions)]
+        actions = [
+            Action.draw if drew else Action.stand
+            for drew in self.actions[i, :num_actions]
+        ]
+        return envs, actions, Reward(self.rewards[i])
+
+    def transitions(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """全ゲームの各手番を(状態のインデックス, Actionのインデックス, Reward)の配列にする。
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: DenseTable.update_batchの引数
+        """
+        # k枚目までのカードからなる手札の符号
+        hand_codes = np.cumsum(RANK_CODES[self.player_cards], axis=1, dtype=np.uint64)
+        steps = np.arange(self.actions.shape[1])
+        taken = steps < self.num_actions[:, None]
+        games, steps = np.nonzero(taken)
+
+        states = state_index_array(hand_codes[games, steps + 1], self.upcards[games])
+        actions = np.where(
+            self.actions[games, steps],
+            ACTION_INDEX[Action.draw],
+            ACTION_INDEX[Action.stand],
+        )
+        return states, actions, self.rewards[games].astype(np.float64)
+
+
+def shuffled_decks(num_games: int, rng: np.random.Generator) -> np.ndarray:
+    """シャッフル済みのデッキをゲームの数だけ用意する。
+
+    Args:
+        num_games (int): ゲームの数
+        rng (np.random.Generator): 乱数生成器
+
+    Returns:
+        np.ndarray: 各デッキのカードのランク (num_games, NUM_CARDS)
+    """
+    return rng.permuted(np.tile(DECK_RANKS, (num_games, 1)), axis=1)
+
+
+def epsilon_schedule(
+    num_episodes: int, epsilon: float, factor: float, num_explores: float
+) -> np.ndarray:
+    """学習ループのEpsilon-Greedyで各エピソードに用いるepsilonを計算する。
+    num_exploresエピソードを超えた後は、エピソードごとにepsilonにfactorを掛ける。
+
+    Args:
+        num_episodes (int): エピソード数
+        epsilon (float): epsilonの初期値
+        factor (float): 減衰率
+        num_explores (float): epsilonを減衰させ始めるエピソード
+
+    Returns:
+        np.ndarray: 各エピソードのepsilon (num_episodes,)
+    """
+    episodes = np.arange(num_episodes)
+    num_decays = np.maximum(episodes - (np.floor(num_explores) + 1), 0)
+    return epsilon * factor**num_decays
+
+
+def _greedy_draws(
+    agent: Agent, hand_codes: np.ndarray, upcards: np.ndarray, u_tie: np.ndarray
+) -> np.ndarray:
+    """Agentの評価値をもとに、各ゲームでカードを引くかどうかを決める。
+    同じEnvironmentにあるゲームは一度のTable参照にまとめる。
+    """
+    if isinstance(agent.table, FrozenPolicy):
+        return agent.table.decide(state_index_array(hand_codes, upcards), u_tie)
+
+    if isinstance(agent.table, DenseTable):
+        scores = agent.table.lookup(state_index_array(hand_codes, upcards))
+    else:
+        states = np.stack([hand_codes, RANK_CODES[upcards]], axis=1)
+        unique_states, inverse = np.unique(states, axis=0, return_inverse=True)
+
+        scores = np.empty((len(unique_states), len(Action)))
+        for j, (hand_code, upcard_code) in enumerate(unique_states):
+            key = encode_state(int(hand_code), int(upcard_code))
+            value = agent.table[Environment.from_key(key)]
+            scores[j] = [value[action] for action in ACTION_INDEX]
+        scores = scores[inverse.reshape(-1)]
+
+    draw_scores = scores[:, ACTION_INDEX[Action.draw]]
+    stand_scores = scores[:, ACTION_INDEX[Action.stand]]
+    # Actionの評価値が同じ場合はランダムに選ぶ
+    tie = draw_scores == stand_scores
+    return np.where(tie, u_tie > 0.5, draw_scores > stand_scores)
+
+
+def play_batch(
+    agent: Agent,
+    decks: np.ndarray,
+    epsilons: np.ndarray,
+    rng: np.random.Generator,
+    profiler: Optional[Profiler] = None,
+    dealer_cache: Optional[DealerCache] = None,
+    env: Optional[VectorBlackjackEnv] = None,
+) -> BatchResult:
+    """複数のゲームを同時に一回ずつプレイする。
+    カードはDeck.popと同様に各デッキの末尾から配る。
+    バッチの途中ではTableを更新しないため、全ゲームがバッチ開始時点の評価値に従う。
+
+    Args:
+        agent (Agent): 評価値を参照するAgent
+        decks (np.ndarray): シャッフル済みのデッキ (games, NUM_CARDS)
+        epsilons (np.ndarray): 各ゲームのEpsilon-Greedyのepsilon (games,)
+        rng (np.random.Generator): 乱数生成器
+        profiler (Optional[Profiler], optional): 各フェーズの時間を記録する. Defaults to None.
+        dealer_cache (Optional[DealerCache], optional): 指定した場合は、Dealerの結果を
+            カードを引く代わりに最終的な結果の分布から一度のサンプリングで決める.
+            envを指定した場合はenvのものを用いる. Defaults to None.
+        env (Optional[VectorBlackjackEnv], optional): 配列を使い回すエンジン。
+            Noneの場合は新たに作る. Defaults to None.
+
+    Returns:
+        BatchResult: ゲームの結果
+    """
+    if profiler is not None:
+        t = profiler.now()
+
+    if env is None:
+        env = VectorBlackjackEnv(dealer_cache)
+    num_games = len(decks)
+    u_explore = rng.random((num_games, MAX_HAND_SIZE))
+    u_tie = rng.random((num_games, MAX_HAND_SIZE))
+    hand_codes = env.reset(decks, rng)
+    draws = np.zeros(num_games, dtype=bool)
+
+    if profiler is not None:
+        t = profiler.lap("deal", t)
+
+    step = 0
+    done = env.done
+    while not done.all():
+        idx = np.flatnonzero(~done)
+
+        # Epsilon-Greedy
+        # 探索時は常にカードを引く（学習ループと同じ挙動）
+        explore = u_explore[idx, step] < epsilons[idx]
+        draws[idx] = explore
+        greedy = idx[~explore]
+        if len(greedy) > 0:
+            if profiler is not None:
+                t = profiler.lap("player", t)
+            draws[greedy] = _greedy_draws(
+                agent, hand_codes[greedy], env.upcards[greedy], u_tie[greedy, step]
+            )
+            if profiler is not None:
+                t = profiler.lap("strategy", t)
+
+        # standしたゲームはこの手番でDealerの手番まで進む
+        hand_codes, _, done = env.step(draws)
+        step += 1
+
+    if profiler is not None:
+        profiler.lap("dealer", t)
+        profiler.count("decisions", int(env.num_actions.sum()))
+
+    return BatchResult(
+        env.player_cards.copy(),
+        env.upcards.copy(),
+        env.actions.copy(),
+        env.num_actions.copy(),
+        env.rewards.copy(),
+    )
+
+
+def _dealer_outcomes(
+    result: BatchResult, dealer_cache: DealerCache
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """バーストしていないゲームについて、Dealerの結果の分布と、
+    各結果に対するPlayerの勝敗(1, 0, -1)を求める。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: バーストしていないゲームの
+            インデックス、Dealerの結果の分布、勝敗
+    """
+    # 各ゲームのランクごとの枚数（インデックス0は未使用）
+    num_ranks = len(Rank) + 1
+    games = np.arange(len(result))[:, None]
+    counts = np.bincount(
+        (games * num_ranks + result.player_cards).ravel(),
+        minlength=len(result) * num_ranks,
+    ).reshape(len(result), num_ranks)
+    counts[:, 0] = 0
+
+    hard_points = RANK_POINTS[result.player_cards].sum(axis=1)
+    has_ace = (result.player_cards == Rank.ace).any(axis=1)
+    points = hand_values(hard_points, has_ace)
+
+    idx = np.flatnonzero(hard_points <= 21)
+    distributions = lookup_dealer_distributions(
+        dealer_cache, result.upcards[idx], counts[idx]
+    )
+    outcomes = np.sign(points[idx, None] - OUTCOME_POINTS[None, :])
+    outcomes[:, DEALER_BUST] = 1
+    return idx, distributions, outcomes
+
+
+def expected_rewards(result: BatchResult, dealer_cache: DealerCache) -> np.ndarray:
+    """各ゲームでAgentのActionを固定したときの、Dealerの結果についての期待Rewardを求める。
+    実際に引いたDealerのカードの代わりに分布の期待値を用いるため、
+    Rewardそのものよりも分散が小さい。
+
+    Args:
+        result (BatchResult): ゲームの結果
+        dealer_cache (DealerCache): Dealerの結果の分布
+
+    Returns:
+        np.ndarray: 期待Reward (games,)
+    """
+    rewards = np.full(len(result), float(Reward.lose.value))
+    idx, distributions, outcomes = _dealer_outcomes(result, dealer_cache)
+    rewards[idx] = (distributions * outcomes).sum(axis=1)
+    return rewards
+
+
+def expected_outcomes(result: BatchResult, dealer_cache: DealerCache) -> np.ndarray:
+    """expected_rewardsと同様に、各ゲームの勝ち・引き分け・負けの確率を求める。
+
+    Args:
+        result (BatchResult): ゲームの結果
+        dealer_cache (DealerCache): Dealerの結果の分布
+
+    Returns:
+        np.ndarray: 勝ち・引き分け・負けの確率 (games, 3)
+    """
+    probabilities = np.zeros((len(result), 3))
+    # バーストしたゲームは確率1で負け
+    probabilities[:, 2] = 1.0
+    idx, distributions, outcomes = _dealer_outcomes(result, dealer_cache)
+    for column, outcome in enumerate((1, 0, -1)):
+        probabilities[idx, column] = (distributions * (outcomes == outcome)).sum(axis=1)
+    return probabilities
+
+
+def register_batch(agent: Agent, result: BatchResult) -> None:
+    """バッチの結果をゲームの順番にAgentのTableへ書き込む。
+    DenseTableの場合は全ゲームの経験を一度の配列演算で書き込む。
+    Agentに学習則がある場合は、ゲームの順に一つずつ学習させる。
+
+    Args:
+        agent (Agent): 経験を登録するAgent
+        result (BatchResult): ゲームの結果
+    """
+    if isinstance(agent.table, DenseTable):
+        states, actions, rewards = result.transitions()
+        if agent.learner is not None:
+            agent.learner.update_episodes(
+                agent.table, states, actions, result.rewards, result.num_actions
+            )
+        else:
+            agent.table.update_batch(states, actions, rewards)
+        if agent.experience_log is not None:
+            steps = episode_steps(result.num_actions)
+            agent.experience_log.append_batch(states, actions, rewards, steps)
+        return
+
+    for i in range(len(result)):
+        agent.register_experience(*result.episode(i))
+
+
+def train_batch(
+    agent: Agent,
+    epsilons: np.ndarray,
+    batch_size: int,
+    rng: np.random.Generator,
+    learn: bool = True,
+    profiler: Optional[Profiler] = None,
+) -> np.ndarray:
+    """batch_size個ずつゲームをプレイし、バッチごとにTableを更新する。
+
+    Args:
+        agent (Agent): 学習するAgent
+        epsilons (np.ndarray): 各エピソードのepsilon (episodes,)
+        batch_size (int): 一度にプレイするゲームの数
+        rng (np.random.Generator): 乱数生成器
+        learn (bool, optional): Tableを更新するかどうか. Defaults to True.
+        profiler (Optional[Profiler], optional): 各フェーズの時間を記録する. Defaults to None.
+
+    Returns:
+        np.ndarray: 各エピソードのReward (episodes,)
+    """
+    rewards = []
+    # 配列はバッチをまたいで使い回す
+    env = VectorBlackjackEnv()
+    for start in range(0, len(epsilons), batch_size):
+        if profiler is not None:
+            t = profiler.now()
+        batch_epsilons = epsilons[start : start + batch_size]
+        decks = shuffled_decks(len(batch_epsilons), rng)
+        if profiler is not None:
+            profiler.lap("shuffle", t)
+
+        result = play_batch(agent, decks, batch_epsilons, rng, profiler, env=env)
+
+        if profiler is not None:
+            t = profiler.now()
+        if learn:
+            register_batch(agent, result)
+        rewards.append(result.rewards)
+        if profiler is not None:
+            profiler.lap("update", t)
+            profiler.episode_done(agent.table, len(result))
+
+    return np.concatenate(rewards) if rewards else np.zeros(0, dtype=np.int8)
@@ -0,0 +1,192 @@
+"""現在のルールにおける最適な方策を厳密に求めるソルバー。
+
+Agentから見える状態（自分の手札とDealerの表向きのカード）ごとに、
+残りのカードを全て列挙してAction.drawとAction.standの期待Rewardを計算する。
+ゲームの結果はカードのポイントにしか依存しないため、10, J, Q, Kを同一視した
+ポイントごとの枚数を状態として再帰計算をメモ化する。
+"""
+import argparse
+from typing import Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from blackjack.base import ACTION_INDEX, Action, DenseTable, Environment
+from blackjack.checkpoint import save_table
+from blackjack.dealer import (
+    DEALER_BUST,
+    NUM_POINTS,
+    dealer_distribution,
+    hand_value,
+    point_counts,
+)
+from blackjack.state import (
+    NUM_OPPONENTS,
+    NUM_RANKS,
+    NUM_STATES,
+    decode_hand,
+    decode_state,
+    state_from_index,
+)
+
+
+class Solver:
+    """num_decks組のデッキを毎回シャッフルし直してプレイする場合の期待Rewardを求める。
+
+    Args:
+        num_decks (int, optional): デッキの数. Defaults to 1.
+    """
+
+    def __init__(self, num_decks: int = 1):
+        self.num_decks = num_decks
+        self._full = (4 * num_decks,) * (NUM_POINTS - 1) + (16 * num_decks,)
+        self._values = {}
+        self._dealer = {}
+
+    def dealer_distribution(
+        self, hard_points: int, has_ace: bool, remaining: tuple[int, ...]
+    ) -> np.ndarray:
+        """Dealerが残りのカードから17ポイント以上になるまで引いたときの、
+        最終的な結果の確率分布を求める。
+
+        Args:
+            hard_points (int): エースを1ポイントとして数えたDealerの総ポイント
+            has_ace (bool): Dealerの手札にエースが含まれるかどうか
+            remaining (tuple[int, ...]): 残りのカードのポイントごとの枚数
+
+        Returns:
+            np.ndarray: 17から21ポイントとバーストの確率 (NUM_DEALER_OUTCOMES,)
+        """
+        return dealer_distribution(hard_points, has_ace, remaining, self._dealer)
+
+    def _action_values(self, player: tuple[int, ...], upcard: int) -> np.ndarray:
+        key = (player, upcard)
+        if key in self._values:
+            return self._values[key]
+
+        remaining = list(self._full)
+        for i, count in enumerate(player):
+            remaining[i] -= count
+        remaining[upcard] -= 1
+        remaining = tuple(remaining)
+
+        hard_points = sum(count * (i + 1) for i, count in enumerate(player))
+        value = hand_value(hard_points, player[0] > 0)
+
+        values = np.zeros(len(Action))
+
+        # Action.stand: DealerはHole cardを含めて残りのカードから引く
+        distribution = self.dealer_distribution(upcard + 1, upcard == 0, remaining)
+        outcomes = np.sign(value - np.arange(17, 22))
+        values[ACTION_INDEX[Action.stand]] = (
+            distribution[DEALER_BUST] + distribution[:DEALER_BUST] @ outcomes
+        )
+
+        # Action.draw: 引いたカードでバーストしなければ、その後も最適にプレイする
+        total = sum(remaining)
+        draw_value = 0.0
+        for i, count in enumerate(remaining):
+            if count == 0:
+                continue
+            if hard_points + i + 1 > 21:
+                draw_value -= count / total
+            else:
+                next_player = player[:i] + (player[i] + 1,) + player[i + 1 :]
+                draw_value += (count / total) * self._action_values(
+                    next_player, upcard
+                ).max()
+        values[ACTION_INDEX[Action.draw]] = draw_value
+
+        self._values[key] = values
+        return values
+
+    def is_reachable(self, env: Environment) -> bool:
+        """デッキの枚数の範囲で実際に起こりうるEnvironmentかどうか。
+        自分の手札が2枚以上21ポイント以下で、相手の表向きのカードが1枚の場合に限る。
+
+        Args:
+            env (Environment): Agentの置かれた環境
+
+        Returns:
+            bool: 起こりうるかどうか
+        """
+        if len(env.hands) < 2 or len(env.opponent_hands) != 1:
+            return False
+        if sum(c.point for c in env.hands) > 21:
+            return False
+        counts = [0] * NUM_RANKS
+        for card in env.hands + env.opponent_hands:
+            counts[card.rank - 1] += 1
+        return max(counts) <= 4 * self.num_decks
+
+    def action_values(self, env: Environment) -> dict[Action, float]:
+        """各Actionをとった後に最適にプレイした場合の期待Rewardを求める。
+
+        Args:
+            env (Environment): Agentの置かれた環境
+
+        Raises:
+            ValueError: 起こりえないEnvironmentの場合
+
+        Returns:
+            dict[Action, float]: 各Actionの期待Reward
+        """
+        if not self.is_reachable(env):
+            raise ValueError(f"{env} is not reachable")
+
+        hand_code, _ = decode_state(env.key)
+        player = point_counts(decode_hand(hand_code))
+        upcard = env.opponent_hands[0].point - 1
+        values = self._action_values(player, upcard)
+        return {action: float(values[i]) for action, i in ACTION_INDEX.items()}
+
+    def best_action(self, env: Environment) -> Action:
+        """期待Rewardが最大となるActionを求める。
+
+        Args:
+            env (Environment): Agentの置かれた環境
+
+        Returns:
+            Action: 最適なAction
+        """
+        values = self.action_values(env)
+        return max(values, key=values.get)  # type: ignore
+
+    def to_table(self, show_progress: bool = False) -> DenseTable:
+        """起こりうる全てのEnvironmentについて期待Rewardを求め、DenseTableにする。
+        各状態の回数を1とするため、評価値は期待Rewardそのものになり、
+        Agent(table)としてそのまま方策に用いることができる。
+
+        Args:
+            show_progress (bool, optional): 進捗を表示するかどうか. Defaults to False.
+
+        Returns:
+            DenseTable: 期待Rewardを評価値とするDenseTable
+        """
+        table = DenseTable()
+        indices = range(NUM_STATES)
+        if show_progress:
+            indices = tqdm(indices, desc="Solving...")
+
+        for index in indices:
+            if index % NUM_OPPONENTS == 0:
+                continue
+            env = Environment.from_key(state_from_index(index))
+            if not self.is_reachable(env):
+                continue
+            values = self.action_values(env)
+            for action, i in ACTION_INDEX.items():
+                table._sum[index, i] = values[action]
+                table._count[index, i] = 1
+
+        return table
+
+
+def solve(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="最適な方策を厳密に求めて保存する。")
+    parser.add_argument("output", help="DenseTableを保存するパス")
+    parser.add_argument("--decks", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    table = Solver(args.decks).to_table(show_progress=True)
+    save_table(table, args.output)
@@ -0,0 +1,197 @@
+"""Environmentの状態を一つの整数に符号化する。
+
+手札はランクごとの枚数のベクトルとして表し、各ランクの枚数を固定のビット幅で
+一つの整数に詰め込む。自分の手札の符号をHAND_BITSビットの下位に、
+相手の手札の符号を上位に置いたものを状態の符号とする。
+ランクは1から13の整数で扱う。
+"""
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+NUM_RANKS = 13
+# 21ポイント以下の手札に含まれうる各ランクの最大枚数を表現できるビット幅
+# エースは21枚まで、それ以外のランクは10枚（2が10枚）まで入りうる
+RANK_BITS = (5,) + (4,) * (NUM_RANKS - 1)
+RANK_OFFSETS = tuple(sum(RANK_BITS[:i]) for i in range(NUM_RANKS))
+MAX_COUNTS = tuple((1 << bits) - 1 for bits in RANK_BITS)
+HAND_BITS = 64
+
+# HAND_UNITS[rank]はそのランクのカードを一枚加えたときに手札の符号に足す値
+HAND_UNITS = (0,) + tuple(1 << offset for offset in RANK_OFFSETS)
+_HAND_MASK = (1 << HAND_BITS) - 1
+_UNITS_ARRAY = np.array(HAND_UNITS[1:], dtype=np.uint64)
+
+
+def encode_counts(counts: Sequence[int]) -> int:
+    """ランクごとの枚数を手札の符号にする。
+
+    Args:
+        counts (Sequence[int]): 各ランクの枚数。i番目の要素がランクi+1の枚数を表す
+
+    Raises:
+        ValueError: 枚数が表現できる範囲を超えている場合
+
+    Returns:
+        int: 手札の符号
+    """
+    code = 0
+    for count, offset, max_count in zip(counts, RANK_OFFSETS, MAX_COUNTS):
+        if not 0 <= count <= max_count:
+            raise ValueError(f"count {count} is out of range [0, {max_count}]")
+        code |= count << offset
+    return code
+
+
+def encode_hand(ranks: Iterable[int]) -> int:
+    """カードのランクの列を手札の符号にする。並び順は区別しない。
+
+    Args:
+        ranks (Iterable[int]): 手札のカードのランク
+
+    Returns:
+        int: 手札の符号
+    """
+    counts = [0] * NUM_RANKS
+    for rank in ranks:
+        counts[rank - 1] += 1
+    return encode_counts(counts)
+
+
+def decode_hand(code: int) -> tuple[int, ...]:
+    """手札の符号をランクごとの枚数に戻す。
+
+    Args:
+        code (int): 手札の符号
+
+    Returns:
+        tuple[int, ...]: 各ランクの枚数。i番目の要素がランクi+1の枚数を表す
+    """
+    return tuple(
+        (code >> offset) & max_count
+        for offset, max_count in zip(RANK_OFFSETS, MAX_COUNTS)
+    )
+
+
+def encode_state(hand_code: int, opponent_code: int) -> int:
+    """自分と相手の手札の符号を状態の符号にまとめる。
+
+    Args:
+        hand_code (int): 自分の手札の符号
+        opponent_code (int): 相手の手札の符号
+
+    Returns:
+        int: 状態の符号
+    """
+    return hand_code | (opponent_code << HAND_BITS)
+
+
+def decode_state(key: int) -> tuple[int, int]:
+    """状態の符号を自分と相手の手札の符号に分ける。
+
+    Args:
+        key (int): 状態の符号
+
+    Returns:
+        tuple[int, int]: 自分の手札の符号と相手の手札の符号
+    """
+    return key & _HAND_MASK, key >> HAND_BITS
+
+
+def encode_counts_array(counts: np.ndarray) -> np.ndarray:
+    """encode_countsを複数の手札にまとめて適用する。
+
+    Args:
+        counts (np.ndarray): 各手札のランクごとの枚数 (hands, NUM_RANKS)
+
+    Raises:
+        ValueError: 枚数が表現できる範囲を超えている場合
+
+    Returns:
+        np.ndarray: 各手札の符号 (hands,)
+    """
+    counts = np.asarray(counts)
+    if np.any(counts < 0) or np.any(counts > np.array(MAX_COUNTS)):
+        raise ValueError("count is out of range")
+    return (counts.astype(np.uint64) * _UNITS_ARRAY).sum(axis=-1, dtype=np.uint64)
+
+
+def _enumerate_hands(limit: int) -> list[int]:
+    """ポイントの合計がlimit以下となる全ての手札の符号を列挙する。
+    エースは1ポイントとして数える。
+    """
+    codes = []
+
+    def visit(rank: int, remaining: int, code: int) -> None:
+        if rank > NUM_RANKS:
+            codes.append(code)
+            return
+        point = min(rank, 10)
+        for count in range(remaining // point + 1):
+            code_with_rank = code + count * HAND_UNITS[rank]
+            visit(rank + 1, remaining - count * point, code_with_rank)
+
+    visit(1, limit, 0)
+    return sorted(codes)
+
+
+# 21ポイント以下の全ての手札の符号。Environmentを配列のインデックスに対応させるために用いる
+HAND_CODES = np.array(_enumerate_hands(21), dtype=np.uint64)
+NUM_HANDS = len(HAND_CODES)
+_HAND_INDEX = {int(code): i for i, code in enumerate(HAND_CODES)}
+# 相手の手札は表向きのカード一枚まで（0は手札なし、1から13はそのランク）
+NUM_OPPONENTS = NUM_RANKS + 1
+_OPPONENT_INDEX = {HAND_UNITS[rank]: rank for rank in range(1, NUM_RANKS + 1)}
+_OPPONENT_INDEX[0] = 0
+NUM_STATES = NUM_HANDS * NUM_OPPONENTS
+
+
+def state_index(key: int) -> int:
+    """状態の符号を0からNUM_STATES - 1までのインデックスに変換する。
+    自分の手札が21ポイント以下、相手の手札が一枚以下の状態のみ変換できる。
+
+    Args:
+        key (int): 状態の符号
+
+    Raises:
+        KeyError: インデックスを持たない状態の場合
+
+    Returns:
+        int: 状態のインデックス
+    """
+    hand_code, opponent_code = decode_state(key)
+    return _HAND_INDEX[hand_code] * NUM_OPPONENTS + _OPPONENT_INDEX[opponent_code]
+
+
+def state_from_index(index: int) -> int:
+    """state_indexの逆変換。
+
+    Args:
+        index (int): 状態のインデックス
+
+    Returns:
+        int: 状態の符号
+    """
+    hand, opponent = divmod(index, NUM_OPPONENTS)
+    return encode_state(int(HAND_CODES[hand]), HAND_UNITS[opponent])
+
+
+def state_index_array(hand_codes: np.ndarray, upcards: np.ndarray) -> np.ndarray:
+    """手札の符号と相手の表向きのカードのランクから、状態のインデックスをまとめて計算する。
+
+    Args:
+        hand_codes (np.ndarray): 自分の手札の符号 (states,)
+        upcards (np.ndarray): 相手の表向きのカードのランク。0は手札なし (states,)
+
+    Raises:
+        KeyError: インデックスを持たない手札が含まれる場合
+
+    Returns:
+        np.ndarray: 状態のインデックス (states,)
+    """
+    hand_codes = np.asarray(hand_codes, dtype=np.uint64)
+    hands = np.searchsorted(HAND_CODES, hand_codes)
+    hands = np.minimum(hands, NUM_HANDS - 1)
+    if np.any(HAND_CODES[hands] != hand_codes):
+        raise KeyError("hand has no index")
+    return hands * NUM_OPPONENTS + np.asarray(upcards, dtype=np.int64)
@@ -3,8 +3,8 @@ import random
 ALLOWED_STRATEGIES = ("random", "input")
 
 
-def random_strategy() -> bool:
-    return random.random() < 0.5
+def random_strategy(rng=random) -> bool:
+    return rng.random() < 0.5
 
 
 def input_strategy() -> bool:
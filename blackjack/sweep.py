@@ -0,0 +1,353 @@
+"""学習の設定を並列に試し、評価時の勝率で順位をつける。
+
+epsilonの初期値、減衰率、エピソード数の組をグリッドまたはランダムに選び、
+プロセスプールで学習と評価を行う。結果は設定とシードから計算したキーで
+一つずつJSONファイルに保存し、同じ設定をもう一度試すときは学習を省略する。
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import product
+from typing import Optional
+
+import numpy as np
+
+from blackjack.base import Agent, DenseTable, Reward
+from blackjack.policy import FrozenPolicy
+from blackjack.simulator import (
+    epsilon_schedule,
+    play_batch,
+    shuffled_decks,
+    train_batch,
+)
+
+# 学習や評価の方法を変えたときに増やし、古いキャッシュを使わないようにする
+CACHE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    """一回の学習の設定。epsilonの減衰はエピソード数の半分を過ぎてから始める。
+
+    Attributes:
+        epsilon (float): epsilonの初期値
+        factor (float): epsilonの減衰率
+        episodes (int): 学習するエピソード数
+    """
+
+    epsilon: float
+    factor: float
+    episodes: int
+
+
+@dataclass
+class SweepResult:
+    """一つの設定の学習と評価の結果。
+
+    Attributes:
+        config (SweepConfig): 学習の設定
+        seed (int): 乱数のシード
+        win_rate (float): 評価時の勝率
+        seconds (float): 学習にかかった秒数
+        cached (bool): キャッシュから読み込んだかどうか
+    """
+
+    config: SweepConfig
+    seed: int
+    win_rate: float
+    seconds: float
+    cached: bool = False
+
+
+def grid_configs(
+    epsilons: list[float], factors: list[float], episodes: list[int]
+) -> list[SweepConfig]:
+    """全ての組み合わせの設定を作る。
+
+    Args:
+        epsilons (list[float]): epsilonの初期値の候補
+        factors (list[float]): 減衰率の候補
+        episodes (list[int]): エピソード数の候補
+
+    Returns:
+        list[SweepConfig]: 設定
+    """
+    return [SweepConfig(*values) for values in product(epsilons, factors, episodes)]
+
+
+def random_configs(
+    num_configs: int,
+    epsilon_range: tuple[float, float],
+    factor_range: tuple[float, float],
+    episodes: list[int],
+    seed: Optional[int] = None,
+) -> list[SweepConfig]:
+    """epsilonと減衰率を範囲から一様に、エピソード数を候補から選んだ設定を作る。
+    キャッシュが効くように、epsilonと減衰率は小数点以下4桁に丸める。
+
+    Args:
+        num_configs (int): 設定の数
+        epsilon_range (tuple[float, float]): epsilonの初期値の下限と上限
+        factor_range (tuple[float, float]): 減衰率の下限と上限
+        episodes (list[int]): エピソード数の候補
+        seed (Optional[int], optional): 乱数のシード. Defaults to None.
+
+    Returns:
+        list[SweepConfig]: 設定
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        SweepConfig(
+            round(float(rng.uniform(*epsilon_range)), 4),
+            round(float(rng.uniform(*factor_range)), 4),
+            int(rng.choice(episodes)),
+        )
+        for _ in range(num_configs)
+    ]
+
+
+class ResultCache:
+    """SweepResultを一つずつJSONファイルとしてディレクトリに保存する。
+
+    Args:
+        directory (str): 保存先のディレクトリ
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(config: SweepConfig, seed: int, eval_games: int, batch_size: int) -> str:
+        """結果を左右する値の全てからキーを計算する。
+
+        Args:
+            config (SweepConfig): 学習の設定
+            seed (int): 乱数のシード
+            eval_games (int): 評価に用いるゲームの数
+            batch_size (int): 一度にプレイするゲームの数
+
+        Returns:
+            str: キー
+        """
+        values = {
+            "version": CACHE_VERSION,
+            **asdict(config),
+            "seed": seed,
+            "eval_games": eval_games,
+            "batch_size": batch_size,
+        }
+        text = json.dumps(values, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[SweepResult]:
+        """保存した結果を読み込む。
+
+        Args:
+            key (str): キー
+
+        Returns:
+            Optional[SweepResult]: 結果。保存されていないか壊れている場合はNone
+        """
+        try:
+            with open(self._path(key)) as f:
+                values = json.load(f)
+            return SweepResult(
+                SweepConfig(**values["config"]),
+                values["seed"],
+                values["win_rate"],
+                values["seconds"],
+                cached=True,
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key: str, result: SweepResult) -> None:
+        """結果を保存する。一時ファイルに書き込んでから置き換える。
+
+        Args:
+            key (str): キー
+            result (SweepResult): 結果
+        """
+        values = asdict(result)
+        del values["cached"]
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(values, f)
+        os.replace(tmp_path, path)
+
+
+def run_config(
+    config: SweepConfig, seed: int, eval_games: int, batch_size: int = 100
+) -> SweepResult:
+    """一つの設定で空のDenseTableから学習し、探索を行わずに勝率を測る。
+    評価に用いるデッキはseedのみから決まるため、同じseedの設定どうしは
+    同じカードの並びで比較される。
+
+    Args:
+        config (SweepConfig): 学習の設定
+        seed (int): 乱数のシード
+        eval_games (int): 評価に用いるゲームの数
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 100.
+
+    Returns:
+        SweepResult: 結果
+    """
+    train_seed, eval_seed = np.random.SeedSequence(seed).spawn(2)
+    agent = Agent(DenseTable())
+    epsilons = epsilon_schedule(
+        config.episodes, config.epsilon, config.factor, config.episodes / 2
+    )
+
+    start = time.perf_counter()
+    train_batch(agent, epsilons, batch_size, np.random.default_rng(train_seed))
+    seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(eval_seed)
+    result = play_batch(
+        Agent(FrozenPolicy.freeze(agent.table)),
+        shuffled_decks(eval_games, rng),
+        np.zeros(eval_games),
+        rng,
+    )
+    win_rate = float(np.mean(result.rewards == Reward.win))
+    return SweepResult(config, seed, win_rate, seconds)
+
+
+def sweep(
+    configs: list[SweepConfig],
+    seed: int = 0,
+    eval_games: int = 20000,
+    batch_size: int = 100,
+    workers: int = 1,
+    cache_dir: Optional[str] = None,
+) -> list[SweepResult]:
+    """全ての設定を学習・評価し、勝率の高い順、同じ勝率では速い順に並べる。
+    cache_dirを指定した場合は、保存済みの設定を学習せずに結果を読み込み、
+    新しく学習した結果を保存する。
+
+    Args:
+        configs (list[SweepConfig]): 設定
+        seed (int, optional): 乱数のシード. Defaults to 0.
+        eval_games (int, optional): 評価に用いるゲームの数. Defaults to 20000.
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 100.
+        workers (int, optional): 並列に学習するプロセス数. Defaults to 1.
+        cache_dir (Optional[str], optional): キャッシュのディレクトリ.
+            Defaults to None.
+
+    Returns:
+        list[SweepResult]: 順位の順の結果
+    """
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    # 同じ設定が複数回与えられた場合は一度だけ学習する
+    configs = list(dict.fromkeys(configs))
+
+    results = []
+    pending = []
+    for config in configs:
+        cached = None
+        if cache is not None:
+            cached = cache.get(ResultCache.key(config, seed, eval_games, batch_size))
+        if cached is not None:
+            results.append(cached)
+        else:
+            pending.append(config)
+
+    def store(result: SweepResult) -> None:
+        if cache is not None:
+            key = ResultCache.key(result.config, seed, eval_games, batch_size)
+            cache.put(key, result)
+        results.append(result)
+
+    if workers <= 1 or len(pending) <= 1:
+        for config in pending:
+            store(run_config(config, seed, eval_games, batch_size))
+    else:
+        n = len(pending)
+        with ProcessPoolExecutor(max_workers=min(workers, n)) as executor:
+            for result in executor.map(
+                run_config, pending, [seed] * n, [eval_games] * n, [batch_size] * n
+            ):
+                store(result)
+
+    return sorted(results, key=lambda r: (-r.win_rate, r.seconds))
+
+
+def format_results(results: list[SweepResult]) -> str:
+    """結果を順位つきの表にする。
+
+    Args:
+        results (list[SweepResult]): 順位の順の結果
+
+    Returns:
+        str: 表
+    """
+    lines = [
+        f"{'rank':>4s} {'epsilon':>8s} {'factor':>8s} {'episodes':>10s} "
+        f"{'win rate':>9s} {'seconds':>9s}"
+    ]
+    for rank, result in enumerate(results, 1):
+        config = result.config
+        mark = " (cached)" if result.cached else ""
+        lines.append(
+            f"{rank:4d} {config.epsilon:8.4f} {config.factor:8.4f} "
+            f"{config.episodes:10d} {result.win_rate:9.4f} {result.seconds:9.2f}{mark}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="学習の設定をグリッドまたはランダムに試し、評価時の勝率で順位をつける。"
+    )
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[0.8])
+    parser.add_argument("--factors", type=float, nargs="+", default=[0.99])
+    parser.add_argument("--episodes", type=int, nargs="+", default=[10000])
+    parser.add_argument(
+        "--random",
+        type=int,
+        metavar="N",
+        help="グリッドの代わりにN個の設定をランダムに選ぶ。"
+        "epsilonと減衰率は--epsilonsと--factorsの最小値から最大値の範囲から選ぶ",
+    )
+    parser.add_argument("--eval-games", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cache-dir", default=".sweep_cache", help="結果を保存するディレクトリ"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="キャッシュを読み込まず、保存もしない"
+    )
+    args = parser.parse_args(argv)
+
+    if args.random is not None:
+        configs = random_configs(
+            args.random,
+            (min(args.epsilons), max(args.epsilons)),
+            (min(args.factors), max(args.factors)),
+            args.episodes,
+            args.seed,
+        )
+    else:
+        configs = grid_configs(args.epsilons, args.factors, args.episodes)
+
+    results = sweep(
+        configs,
+        args.seed,
+        args.eval_games,
+        args.batch_size,
+        args.workers,
+        None if args.no_cache else args.cache_dir,
+    )
+    print(format_results(results))
@@ -0,0 +1,198 @@
+"""時間またはエピソード数の予算の範囲で学習し、方策が収束したら打ち切る。
+
+window個のエピソードごとに、Tableの評価値の変化量と、評価値が最大のActionが
+変わった状態の割合を記録する。ほとんど訪れない状態の方策は長い間揺れ続けるため、
+どちらもそのwindowで各状態を訪れた回数で重み付けする。
+方策の変化がtolerance以下のwindowがpatience回続いた場合に収束したとみなす。
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from blackjack.base import Agent, DenseTable, Table
+from blackjack.policy import FrozenPolicy, table_values
+from blackjack.profiling import Profiler
+from blackjack.simulator import train_batch
+from blackjack.state import NUM_STATES, state_index
+
+
+@dataclass
+class WindowStats:
+    """一つのwindowの学習の記録。
+
+    Attributes:
+        episodes (int): これまでに学習したエピソードの数
+        elapsed (float): 学習を始めてからの経過時間（秒）
+        episodes_per_sec (float): このwindowの一秒あたりのエピソード数
+        epsilon (float): このwindowで用いたepsilon
+        value_change (float): 訪れた回数で重み付けした評価値の変化量の平均
+        policy_change (float): 訪れた状態のうち、評価値が最大のActionが変わった
+            状態の割合（訪れた回数で重み付け）
+    """
+
+    episodes: int
+    elapsed: float
+    episodes_per_sec: float
+    epsilon: float
+    value_change: float
+    policy_change: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.episodes:>10d}エピソード {self.elapsed:7.1f}秒 "
+            f"{self.episodes_per_sec:10,.0f}エピソード/秒 epsilon={self.epsilon:.3f} "
+            f"評価値の変化={self.value_change:.4f} 方策の変化={self.policy_change:.4f}"
+        )
+
+
+@dataclass
+class TrainingReport:
+    """予算つきの学習の結果。
+
+    Attributes:
+        episodes (int): 学習したエピソードの数
+        elapsed (float): 学習にかかった時間（秒）
+        stopped_by (str): 打ち切った理由（"converged", "episodes", "time"）
+        history (list[WindowStats]): 各windowの記録
+    """
+
+    episodes: int
+    elapsed: float
+    stopped_by: str
+    history: list[WindowStats] = field(default_factory=list)
+
+    @property
+    def episodes_per_sec(self) -> float:
+        return self.episodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _visit_counts(table: Union[Table, DenseTable]) -> np.ndarray:
+    """各状態を訪れた回数をDenseTableの状態のインデックスの順に並べる。"""
+    if isinstance(table, DenseTable):
+        return table._count.sum(axis=1)
+
+    counts = np.zeros(NUM_STATES, dtype=np.int64)
+    for env, action_counts in table._count.items():
+        try:
+            counts[state_index(env.key)] = sum(action_counts.values())
+        except KeyError:
+            continue
+    return counts
+
+
+def train_until(
+    agent: Agent,
+    rng: np.random.Generator,
+    max_episodes: Optional[int] = None,
+    max_seconds: Optional[float] = None,
+    window: int = 10000,
+    patience: Optional[int] = 3,
+    tolerance: float = 0.005,
+    epsilon: float = 0.8,
+    decay: float = 0.7,
+    batch_size: int = 100,
+    profiler: Optional[Profiler] = None,
+    callback: Optional[Callable[[WindowStats], None]] = None,
+    start_episode: int = 0,
+) -> TrainingReport:
+    """予算の範囲でバッチシミュレータを用いて学習し、方策が収束したら打ち切る。
+    max_episodes, max_seconds, patienceの少なくとも一つを指定する必要がある。
+
+    Args:
+        agent (Agent): 学習するAgent
+        rng (np.random.Generator): 乱数生成器
+        max_episodes (Optional[int], optional): エピソード数の上限. Defaults to None.
+        max_seconds (Optional[float], optional): 学習時間の上限（秒）。
+            batch_size個のエピソードごとに確認する. Defaults to None.
+        window (int, optional): 収束を判定する間隔のエピソード数. Defaults to 10000.
+        patience (Optional[int], optional): 方策の変化がtolerance以下のwindowが
+            何回続いたら収束とみなすか。Noneの場合は収束による打ち切りを行わない.
+            Defaults to 3.
+        tolerance (float, optional): 変化しなかったとみなす方策の変化の割合.
+            Defaults to 0.005.
+        epsilon (float, optional): 最初のwindowのepsilon. Defaults to 0.8.
+        decay (float, optional): windowごとにepsilonに掛ける減衰率. Defaults to 0.7.
+        batch_size (int, optional): 一度にプレイするゲームの数. Defaults to 100.
+        profiler (Optional[Profiler], optional): 各フェーズの時間を記録する.
+            Defaults to None.
+        callback (Optional[Callable[[WindowStats], None]], optional): windowごとに
+            記録を渡して呼び出す. Defaults to None.
+        start_episode (int, optional): 再開前に学習したエピソード数。epsilonは
+            最初から学習した場合と同じく、このエピソード数の分だけ減衰させた値から
+            始める. Defaults to 0.
+
+    Returns:
+        TrainingReport: 学習の結果
+    """
+    if max_episodes is None and max_seconds is None and patience is None:
+        raise ValueError(
+            "at least one of max_episodes, max_seconds and patience is required"
+        )
+
+    started = time.perf_counter()
+    deadline = None if max_seconds is None else started + max_seconds
+    report = TrainingReport(0, 0.0, "converged")
+
+    values = table_values(agent.table)
+    decisions = FrozenPolicy.from_values(values).decisions
+    counts = _visit_counts(agent.table)
+    stable = 0
+
+    while True:
+        window_started = time.perf_counter()
+        # 再開した場合も、最初から学習した場合と同じwindowのepsilonを用いる
+        windows_done = (start_episode + report.episodes) // window
+        window_epsilon = epsilon * decay**windows_done
+        size = window
+        if max_episodes is not None:
+            size = min(size, max_episodes - report.episodes)
+
+        played = 0
+        while played < size:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            n = min(batch_size, size - played)
+            train_batch(
+                agent, np.full(n, window_epsilon), batch_size, rng, profiler=profiler
+            )
+            played += n
+        report.episodes += played
+
+        now = time.perf_counter()
+        new_values = table_values(agent.table)
+        new_decisions = FrozenPolicy.from_values(new_values).decisions
+        new_counts = _visit_counts(agent.table)
+        visits = new_counts - counts
+        total_visits = max(int(visits.sum()), 1)
+        stats = WindowStats(
+            episodes=report.episodes,
+            elapsed=now - started,
+            episodes_per_sec=played / (now - window_started) if played else 0.0,
+            epsilon=window_epsilon,
+            value_change=float(
+                visits @ np.abs(new_values - values).max(axis=1) / total_visits
+            ),
+            policy_change=float(visits @ (new_decisions != decisions) / total_visits),
+        )
+        report.history.append(stats)
+        if callback is not None:
+            callback(stats)
+        values, decisions, counts = new_values, new_decisions, new_counts
+
+        # 途中で打ち切られたwindowでは収束を判定しない
+        if patience is not None and played == window:
+            stable = stable + 1 if stats.policy_change <= tolerance else 0
+            if stable >= patience:
+                report.stopped_by = "converged"
+                break
+        if deadline is not None and now >= deadline:
+            report.stopped_by = "time"
+            break
+        if max_episodes is not None and report.episodes >= max_episodes:
+            report.stopped_by = "episodes"
+            break
+
+    report.elapsed = time.perf_counter() - started
+    return report
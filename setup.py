@@ -8,10 +8,20 @@ setup(
     # author_email='',
     url="https://github.com/ykskks/blackjack",
     packages=find_packages(),
+    install_requires=["numpy", "tqdm"],
     entry_points={
         "console_scripts": [
             "bj-play = blackjack.cli:play",
             "bj-train = blackjack.cli:train",
+            "bj-solve = blackjack.solver:solve",
+            "bj-bench = blackjack.bench:main",
+            "bj-replay = blackjack.replay:main",
+            "bj-compare = blackjack.comparison:main",
+            "bj-serve = blackjack.server:main",
+            "bj-client = blackjack.server:client_main",
+            "bj-learners = blackjack.learners:main",
+            "bj-shared = blackjack.shared:main",
+            "bj-sweep = blackjack.sweep:main",
         ]
     },
 )
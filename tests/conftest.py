@@ -0,0 +1,21 @@
+import pytest
+
+from blackjack.base import Card, Deck, Rank, Suit
+from blackjack.solver import Solver
+
+
+@pytest.fixture(scope="session")
+def solved_table():
+    # 厳密に解いた方策。求めるのに時間がかかるため、全てのテストで共有する
+    return Solver().to_table()
+
+
+@pytest.fixture
+def deck_from_ranks():
+    # ランクの並びからデッキを作る関数。カードはDeck.popと同様に末尾から配られる
+    def make(ranks):
+        deck = Deck()
+        deck.cards = [Card(Suit.spade, Rank(r)) for r in ranks]
+        return deck
+
+    return make
@@ -0,0 +1,29 @@
+import json
+
+from blackjack.bench import main, measure_rate
+
+
+def test_measure_rate():
+    assert measure_rate(lambda: None, 100) > 0
+
+
+def test_main_writes_json(tmp_path, capsys):
+    output = tmp_path / "bench.json"
+
+    main(["--quick", "--output", str(output)])
+    main(["--quick", "--baseline", str(output)])
+
+    report = json.loads(output.read_text())
+    results = report["results"]
+    for key in (
+        "object_episodes_per_sec",
+        "table_updates_per_sec",
+        "table_lookups_per_sec",
+        "frozen_policy_decisions_per_sec",
+        "environment_hash_per_sec",
+        "deck_shuffle_per_sec",
+        "table_bytes_per_state",
+        "random_stream_draws_per_sec",
+    ):
+        assert results[key] > 0
+    assert "x)" in capsys.readouterr().out
@@ -1,21 +1,31 @@
+import pickle
 import random
 
+import numpy as np
 import pytest
 
 from blackjack.base import (
+    ACTION_INDEX,
+    CARDS,
     Action,
     Agent,
     BasePlayer,
+    BoundedTable,
     Card,
     Dealer,
     Deck,
+    DenseTable,
     Environment,
+    Hand,
     Player,
     Rank,
     Reward,
+    Shoe,
     Suit,
     Table,
 )
+from blackjack.cli import train
+from blackjack.events import TranscriptWriter
 
 
 class TestCard:
@@ -41,11 +51,38 @@ class TestCard:
     def test_as_string(self, test_input, expected):
         assert Card(*test_input).as_string == expected
 
+    def test_singleton(self):
+        assert Card(Suit.heart, Rank.three) is Card(Suit.heart, Rank.three)
+        assert len(set(map(id, CARDS))) == 52
+
+    def test_from_index(self):
+        for index, card in enumerate(CARDS):
+            assert Card.from_index(index) is card
+            assert Card(card.suit, card.rank).index == index
+
+    def test_immutable(self):
+        card = Card(Suit.heart, Rank.three)
+        with pytest.raises(AttributeError):
+            card.rank = Rank.four
+        with pytest.raises(AttributeError):
+            card.other = 1
+
+    def test_pickle(self):
+        card = Card(Suit.club, Rank.king)
+        assert pickle.loads(pickle.dumps(card)) is card
+
+    def test_invalid_rank(self):
+        with pytest.raises(ValueError):
+            Card(Suit.club, 0)
+
 
 class TestDeck:
     def test_len_cards(self):
         assert len(Deck().cards) == 52
 
+    def test_reuses_cards(self):
+        assert all(a is b for a, b in zip(Deck().cards, CARDS))
+
     def test_shuffle(self):
         deck = Deck()
         cards_original = deck.cards.copy()
@@ -62,6 +99,68 @@ class TestDeck:
         assert deck.pop() == Card(Suit.spade, Rank.queen)
 
 
+class TestShoe:
+    def test_len_cards(self):
+        assert len(Shoe(num_decks=6)) == 52 * 6
+
+    def test_reuses_cards(self):
+        shoe = Shoe(num_decks=2, penetration=0.5)
+        card_ids = {id(c) for c in shoe.cards}
+
+        for _ in range(200):
+            shoe.start_round()
+            for _ in range(5):
+                assert id(shoe.pop()) in card_ids
+
+    def test_reshuffle_after_penetration(self):
+        shoe = Shoe(num_decks=1, penetration=0.5)
+
+        for _ in range(25):
+            shoe.pop()
+        assert not shoe.start_round()
+        assert len(shoe) == 27
+
+        shoe.pop()
+        assert shoe.start_round()
+        assert len(shoe) == 52
+
+    def test_zero_penetration_shuffles_every_round(self):
+        shoe = Shoe(num_decks=1, penetration=0.0)
+        shoe.pop()
+        assert shoe.start_round()
+        assert len(shoe) == 52
+
+    def test_pop_from_empty_shoe(self):
+        shoe = Shoe(num_decks=1, penetration=1.0)
+        for _ in range(12):
+            shoe.start_round()
+            for _ in range(4):
+                shoe.pop()
+        shoe.start_round()
+        in_play = {shoe.pop() for _ in range(4)}
+        assert len(shoe) == 0
+
+        # 手札にあるカードは捨て札と一緒にシャッフルし直さない
+        drawn = {shoe.pop() for _ in range(48)}
+        assert not drawn & in_play
+        assert len(drawn | in_play) == 52
+        with pytest.raises(ValueError):
+            shoe.pop()
+
+    @pytest.mark.parametrize(
+        "num_decks,penetration", [(0, 0.5), (1, -0.1), (1, 1.5)]
+    )
+    def test_invalid_arguments(self, num_decks, penetration):
+        with pytest.raises(ValueError):
+            Shoe(num_decks, penetration)
+
+    @pytest.mark.parametrize("option", [["--decks", "6"], ["--penetration", "0.5"]])
+    def test_train_batch_rejects_shoe(self, option):
+        # batchでは無視される代わりにエラーにする
+        with pytest.raises(SystemExit):
+            train(["--engine", "batch", "--episodes", "10"] + option)
+
+
 class TestEnvironment:
     def test_eq_true(self):
         assert Environment(
@@ -107,6 +206,49 @@ class TestEnvironment:
             )
         )
 
+    def test_eq_repeated_rank(self):
+        # 同じ数字のカードの枚数は区別する
+        assert Environment(
+            [Card(Suit.spade, Rank.five), Card(Suit.heart, Rank.five)],
+            [Card(Suit.spade, Rank.ace)],
+        ) != Environment(
+            [Card(Suit.spade, Rank.five)],
+            [Card(Suit.spade, Rank.ace)],
+        )
+
+    def test_from_key(self):
+        env = Environment(
+            [Card(Suit.spade, Rank.five), Card(Suit.heart, Rank.five)],
+            [Card(Suit.spade, Rank.ace)],
+        )
+        restored = Environment.from_key(env.key)
+        assert restored == env
+        assert sorted(c.rank for c in restored.hands) == [Rank.five, Rank.five]
+        assert [c.rank for c in restored.opponent_hands] == [Rank.ace]
+
+
+class TestHand:
+    def test_add(self):
+        hand = Hand()
+        hand.add(Card(Suit.heart, Rank.ace))
+        hand.add(Card(Suit.heart, Rank.six))
+        assert (hand.hard_points, hand.total_points, hand.is_soft) == (7, 17, True)
+
+        hand.add(Card(Suit.spade, Rank.nine))
+        assert (hand.hard_points, hand.total_points, hand.is_soft) == (16, 16, False)
+
+    def test_clear(self):
+        hand = Hand([Card(Suit.heart, Rank.ace), Card(Suit.heart, Rank.six)])
+        cards = hand.cards
+
+        hand.clear()
+
+        assert len(hand) == 0
+        assert hand.total_points == 0
+        assert not hand.is_soft
+        # 手札のリストは使い回す
+        assert hand.cards is cards
+
 
 class TestBasePlayer:
     def test_total_points(self):
@@ -116,6 +258,21 @@ class TestBasePlayer:
         player.hands = [Card(Suit.heart, Rank.five), Card(Suit.spade, Rank.queen)]
         assert player.total_points == 15
 
+    @pytest.mark.parametrize(
+        "ranks,expected",
+        [
+            ((Rank.ace, Rank.king), 21),
+            ((Rank.ace, Rank.five), 16),
+            ((Rank.ace, Rank.five, Rank.king), 16),
+            ((Rank.ace, Rank.ace), 12),
+            ((Rank.ace, Rank.ace, Rank.nine), 21),
+        ],
+    )
+    def test_total_points_with_ace(self, ranks, expected):
+        player = BasePlayer()
+        player.hands = [Card(Suit.heart, rank) for rank in ranks]
+        assert player.total_points == expected
+
     def test_draw(self):
         deck = Deck()
         player = BasePlayer()
@@ -134,10 +291,14 @@ class TestPlayer:
     def test_draw_displayed_class_name(self, capsys):
         deck = Deck()
         player = Player(lambda: False)
-        player.draw(deck)
+        player.draw(deck, listeners=[TranscriptWriter(buffer_size=1)])
         captured = capsys.readouterr()
         assert "Player" in captured.out
 
+    def test_draw_without_listeners_is_silent(self, capsys):
+        Player(lambda: False).draw(Deck())
+        assert capsys.readouterr().out == ""
+
     def test_draw_again(self):
         player = Player(lambda: False)
         assert not player.draw_again()
@@ -150,7 +311,7 @@ class TestDealer:
     def test_draw_displayed_class_name(self, capsys):
         deck = Deck()
         dealer = Dealer()
-        dealer.draw(deck)
+        dealer.draw(deck, listeners=[TranscriptWriter(buffer_size=1)])
         captured = capsys.readouterr()
         assert "Dealer" in captured.out
 
@@ -236,6 +397,213 @@ class TestTable:
         table._table[env_same_total_points][Action.draw] = -1.0
         assert table._table[env][Action.draw] != -1.0
 
+    def test_lookup_does_not_insert(self, envs, actions):
+        table = Table()
+        table.update(envs[:1], actions[:1], Reward.win)
+
+        assert table[envs[1]] == {Action.draw: 0.0, Action.stand: 0.0}
+        assert table[envs[0]][Action.stand] == 0.0
+        assert len(table) == 1
+        assert list(table._table[envs[0]]) == [actions[0]]
+
+    def test_merge(self, envs, actions):
+        table_a, table_b, table_all = Table(), Table(), Table()
+
+        rewards = [Reward.win, Reward.tie, Reward.lose, Reward.win, Reward.win]
+        for i, reward in enumerate(rewards):
+            (table_a if i % 2 else table_b).update(envs, actions, reward)
+            table_all.update(envs, actions, reward)
+
+        table_a.merge(table_b)
+
+        for env, action in zip(envs, actions):
+            assert table_a[env][action] == pytest.approx(table_all[env][action])
+            assert table_a._count[env][action] == table_all._count[env][action]
+
+
+class TestBoundedTable:
+    @pytest.fixture
+    def distinct_envs(self):
+        # Playerの総ポイントが互いに異なるEnvironment
+        return [
+            Environment(
+                [Card(Suit.spade, Rank.two), Card(Suit.spade, rank)],
+                [Card(Suit.heart, Rank.four)],
+            )
+            for rank in [Rank.three, Rank.four, Rank.five, Rank.six, Rank.seven]
+        ]
+
+    def test_show_fewer_than_k(self, distinct_envs, capsys):
+        table = BoundedTable(3, slack=0.0)
+        for env in distinct_envs:
+            table.update([env], [Action.stand], Reward.win)
+
+        table.show(k=5, rng=random.Random(0))
+
+        assert capsys.readouterr().out.count("Count of each action taken") == 3
+
+    def test_capacity(self, distinct_envs):
+        table = BoundedTable(3, slack=0.0)
+
+        for env in distinct_envs:
+            table.update([env], [Action.stand], Reward.win)
+
+        assert len(table) == 3
+        assert table.evictions == 2
+        assert len(table._count) == len(table._recency) == 3
+
+    def test_lru_keeps_recently_used(self, distinct_envs):
+        table = BoundedTable(3, "lru", slack=0.0)
+        for env in distinct_envs[:3]:
+            table.update([env], [Action.stand], Reward.win)
+
+        table.update([distinct_envs[0]], [Action.draw], Reward.lose)
+        table.update([distinct_envs[3]], [Action.stand], Reward.win)
+
+        assert table[distinct_envs[0]][Action.stand] == 1.0
+        assert table[distinct_envs[1]][Action.stand] == 0.0
+        assert distinct_envs[1] not in table._table
+
+    def test_lookup_keeps_recency(self, distinct_envs):
+        table = BoundedTable(3, "lru", slack=0.0)
+        for env in distinct_envs[:3]:
+            table.update([env], [Action.stand], Reward.win)
+
+        # 評価のための参照では破棄される順番は変わらない
+        table[distinct_envs[0]]
+        table.show(k=3, rng=random.Random(0))
+        table.update([distinct_envs[3]], [Action.stand], Reward.win)
+
+        assert distinct_envs[0] not in table._table
+        assert distinct_envs[1] in table._table
+
+    def test_lfu_evicts_least_visited(self, distinct_envs):
+        table = BoundedTable(3, "lfu", slack=0.0)
+        for i, env in enumerate(distinct_envs[:3]):
+            for _ in range(3 - i):
+                table.update([env], [Action.stand], Reward.win)
+        table.update([distinct_envs[3]], [Action.stand], Reward.win)
+        table.update([distinct_envs[3]], [Action.stand], Reward.win)
+
+        assert distinct_envs[2] not in table._table
+        assert set(table._table) == {
+            distinct_envs[0],
+            distinct_envs[1],
+            distinct_envs[3],
+        }
+
+    def test_lookup_does_not_insert(self, distinct_envs):
+        table = BoundedTable(2)
+
+        assert table[distinct_envs[0]] == {Action.draw: 0.0, Action.stand: 0.0}
+        assert len(table) == 0
+        assert len(table._recency) == 0
+
+    def test_slack(self, distinct_envs):
+        table = BoundedTable(4, slack=0.5)
+
+        for env in distinct_envs:
+            table.update([env], [Action.stand], Reward.win)
+
+        assert len(table) == 2
+        assert table.evictions == 3
+
+    def test_merge(self, distinct_envs):
+        table, other = BoundedTable(3, slack=0.0), Table()
+        for env in distinct_envs:
+            other.update([env], [Action.stand], Reward.win)
+
+        table.merge(other)
+
+        assert len(table) == 3
+        assert table.evictions == 2
+
+    def test_info(self, distinct_envs):
+        table = BoundedTable(3)
+        empty = table.memory_bytes()
+        table.update(distinct_envs[:2], [Action.draw, Action.stand], Reward.win)
+
+        info = table.info()
+        assert info["states"] == 2
+        assert info["capacity"] == 3
+        assert info["eviction"] == "lru"
+        assert info["evictions"] == 0
+        assert info["memory_bytes"] > empty
+
+    def test_pickle(self, distinct_envs):
+        table = BoundedTable(3, "lfu")
+        table.update(distinct_envs[:2], [Action.draw, Action.stand], Reward.win)
+
+        restored = pickle.loads(pickle.dumps(table))
+
+        assert restored.capacity == 3
+        assert restored.eviction == "lfu"
+        assert restored[distinct_envs[0]][Action.draw] == 1.0
+
+    @pytest.mark.parametrize("capacity, eviction", [(0, "lru"), (3, "fifo")])
+    def test_invalid_arguments(self, capacity, eviction):
+        with pytest.raises(ValueError):
+            BoundedTable(capacity, eviction)
+
+
+class TestDenseTable:
+    def test_update_multiple(self, envs, actions):
+        table = DenseTable()
+
+        table.update(envs, actions, Reward.win)
+        table.update(envs, actions, Reward.tie)
+        table.update(envs, actions, Reward.win)
+        table.update(envs, actions, Reward.lose)
+
+        for env, action in zip(envs, actions):
+            assert table[env][action] == (1 + 0 + 1 - 1) / 4
+
+    def test_same_as_table(self, envs, actions):
+        table = Table()
+        dense_table = DenseTable()
+
+        rng = random.Random(0)
+        for _ in range(100):
+            reward = rng.choice(list(Reward))
+            table.update(envs, actions, reward)
+            dense_table.update(envs, actions, reward)
+
+        for env in envs:
+            for action in Action:
+                assert dense_table[env][action] == pytest.approx(table[env][action])
+
+    def test_merge(self, envs, actions):
+        table_a, table_b, table_all = DenseTable(), DenseTable(), DenseTable()
+
+        rewards = [Reward.win, Reward.tie, Reward.lose, Reward.win, Reward.win]
+        for i, reward in enumerate(rewards):
+            (table_a if i % 2 else table_b).update(envs, actions, reward)
+            table_all.update(envs, actions, reward)
+
+        table_a.merge(table_b)
+
+        # 回数とRewardの合計を足し合わせるため、順番に登録した場合と完全に一致する
+        assert np.array_equal(table_a._count, table_all._count)
+        assert np.array_equal(table_a.values, table_all.values)
+
+    def test_update_batch_with_duplicates(self, envs, actions):
+        table = DenseTable()
+        states = np.array([DenseTable.index(envs[0])] * 3)
+        action_indices = np.array([ACTION_INDEX[actions[0]]] * 3)
+
+        table.update_batch(states, action_indices, np.array([1.0, 1.0, -1.0]))
+
+        assert table[envs[0]][actions[0]] == pytest.approx(1 / 3)
+        assert len(table) == 1
+
+    def test_agent_with_dense_table(self, envs, actions):
+        agent = Agent(DenseTable())
+
+        agent.register_experience(envs, actions, Reward.win)
+
+        for env, action in zip(envs, actions):
+            assert agent._strategy(env) == action
+
 
 class TestAgent:
     def test_strategy_one_is_better(self, envs, actions):
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from blackjack.base import DenseTable
+from blackjack.checkpoint import (
+    CheckpointError,
+    load_table,
+    read_episodes,
+    save_table,
+)
+from blackjack.cli import train
+from blackjack.parallel import train_worker
+
+
+@pytest.fixture
+def table():
+    return train_worker(500, 0.8, 0.99, 100, np.random.SeedSequence(0))
+
+
+@pytest.mark.parametrize("mmap_mode", ["r", "c", None])
+def test_round_trip(table, tmp_path, mmap_mode):
+    path = str(tmp_path / "table.bin")
+    save_table(table, path, episodes=500)
+
+    loaded = load_table(path, mmap_mode=mmap_mode)
+
+    assert read_episodes(path) == 500
+    assert np.array_equal(loaded._count, table._count)
+    assert np.array_equal(loaded.values, table.values)
+
+
+def test_read_only_mmap_is_not_writable(table, tmp_path):
+    path = str(tmp_path / "table.bin")
+    save_table(table, path)
+
+    loaded = load_table(path, mmap_mode="r")
+
+    with pytest.raises(ValueError):
+        loaded.merge(table)
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "table.bin"
+    path.write_bytes(b"not a checkpoint" * 10)
+
+    with pytest.raises(CheckpointError):
+        load_table(str(path))
+
+
+def test_train_resume(tmp_path, capsys):
+    path = str(tmp_path / "table.bin")
+    args = ["--engine", "batch", "--table", "dense", "--test-episodes", "10"]
+
+    train(args + ["--episodes", "200", "--save", path, "--save-every", "50"])
+    assert read_episodes(path) == 200
+    count_before = load_table(path)._count.sum()
+
+    train(args + ["--episodes", "300", "--resume", path, "--save", path])
+    assert read_episodes(path) == 300
+    assert load_table(path)._count.sum() > count_before
+
+
+def test_from_arrays_shape():
+    with pytest.raises(ValueError):
+        DenseTable.from_arrays(np.zeros((1, 2)), np.zeros((1, 2), dtype=np.int64))
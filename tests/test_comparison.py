@@ -0,0 +1,51 @@
+import pytest
+
+from blackjack.base import Agent
+from blackjack.checkpoint import save_table
+from blackjack.comparison import ComparisonResult, compare, main
+
+
+def test_same_policy_has_no_difference():
+    # 同じ方策どうしでは全てのゲームが同じ結果になる
+    result = compare(Agent(), Agent(), num_games=2000, batch_size=500, seed=0)
+    assert result.difference == 0.0
+    assert result.std_error == 0.0
+    assert not result.significant
+
+
+def test_optimal_policy_beats_random(solved_table):
+    result = compare(Agent(solved_table), num_games=5000, batch_size=1000, seed=0)
+    assert result.games == 5000
+    assert result.significant
+    assert result.interval[0] > 0
+    # 同じデッキで比較することで、差の分散が小さくなる
+    assert result.variance_reduction > 1.0
+
+
+def test_deterministic(solved_table):
+    kwargs = dict(num_games=1000, batch_size=300, seed=3)
+    assert compare(Agent(solved_table), **kwargs) == compare(
+        Agent(solved_table), **kwargs
+    )
+
+
+def test_does_not_learn(solved_table):
+    values = solved_table.values.copy()
+    compare(Agent(solved_table), num_games=1000, seed=0)
+    assert (solved_table.values == values).all()
+
+
+def test_interval():
+    result = ComparisonResult(100, 0.1, -0.1, 0.05, 0.1)
+    low, high = result.interval
+    assert result.difference == pytest.approx(0.2)
+    assert low == pytest.approx(0.2 - 1.96 * 0.05, abs=1e-3)
+    assert high == pytest.approx(0.2 + 1.96 * 0.05, abs=1e-3)
+    assert result.variance_reduction == pytest.approx(4.0)
+
+
+def test_main(tmp_path, capsys, solved_table):
+    path = tmp_path / "table.bin"
+    save_table(solved_table, path)
+    main([str(path), "--games", "1000", "--seed", "0"])
+    assert "1000ゲーム" in capsys.readouterr().out
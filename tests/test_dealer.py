@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from blackjack.base import Agent, Rank
+from blackjack.dealer import DEALER_BUST, DealerCache, point_counts
+from blackjack.simulator import expected_rewards, play_batch, shuffled_decks
+from blackjack.solver import Solver
+
+
+def removed(*ranks):
+    counts = [0] * len(Rank)
+    for rank in ranks:
+        counts[rank - 1] += 1
+    return counts
+
+
+@pytest.fixture
+def cache():
+    return DealerCache()
+
+
+def test_point_counts():
+    counts = removed(Rank.ace, Rank.ten, Rank.jack, Rank.king, Rank.five)
+    assert point_counts(counts) == (1, 0, 0, 0, 1, 0, 0, 0, 0, 3)
+
+
+class TestDealerCache:
+    def test_matches_solver(self, cache):
+        distribution = cache.distribution(Rank.six, removed(Rank.ten, Rank.seven))
+        remaining = (4, 4, 4, 4, 4, 3, 3, 4, 4, 15)
+        expected = Solver().dealer_distribution(6, False, remaining)
+        assert distribution.sum() == pytest.approx(1.0)
+        assert np.allclose(distribution, expected)
+
+    def test_ten_point_ranks_share_entry(self, cache):
+        first = cache.distribution(Rank.king, removed(Rank.queen, Rank.two))
+        second = cache.distribution(Rank.ten, removed(Rank.jack, Rank.two))
+        assert first is second
+        assert cache.info()["hits"] == 1
+        assert cache.info()["misses"] == 1
+
+    def test_read_only(self, cache):
+        distribution = cache.distribution(Rank.two, removed())
+        with pytest.raises(ValueError):
+            distribution[0] = 1.0
+
+    def test_lru_eviction(self):
+        cache = DealerCache(maxsize=2)
+        cache.distribution(Rank.two, removed())
+        cache.distribution(Rank.three, removed())
+        # 参照したものは新しくなる
+        cache.distribution(Rank.two, removed())
+        cache.distribution(Rank.four, removed())
+
+        assert len(cache) == 2
+        misses = cache.misses
+        cache.distribution(Rank.two, removed())
+        assert cache.misses == misses
+        cache.distribution(Rank.three, removed())
+        assert cache.misses == misses + 1
+
+    def test_too_many_removed(self, cache):
+        with pytest.raises(ValueError):
+            cache.distribution(Rank.ace, removed(*[Rank.ace] * 4))
+
+    def test_sample(self, cache):
+        counts = removed(Rank.ten, Rank.nine)
+        distribution = cache.distribution(Rank.six, counts)
+        first = int(np.flatnonzero(distribution)[0])
+        assert cache.sample(Rank.six, counts, 0.0) == 17 + first
+        assert cache.sample(Rank.six, counts, 1.0 - 1e-12) == 17 + DEALER_BUST
+
+    def test_expected_reward(self, cache):
+        counts = removed(Rank.ten, Rank.nine)
+        distribution = cache.distribution(Rank.seven, counts)
+        expected = distribution[DEALER_BUST] + distribution[:2].sum()
+        expected -= distribution[3:DEALER_BUST].sum()
+        assert cache.expected_reward(19, Rank.seven, counts) == pytest.approx(expected)
+        assert cache.expected_reward(22, Rank.seven, counts) == -1.0
+
+
+@pytest.fixture
+def solved_agent(solved_table):
+    return Agent(solved_table)
+
+
+def test_play_batch_with_dealer_cache(solved_agent):
+    num_games = 5000
+    decks = shuffled_decks(num_games, np.random.default_rng(0))
+    epsilons = np.zeros(num_games)
+    played = play_batch(solved_agent, decks, epsilons, np.random.default_rng(1))
+    sampled = play_batch(
+        solved_agent,
+        decks,
+        epsilons,
+        np.random.default_rng(1),
+        dealer_cache=DealerCache(),
+    )
+
+    # Agentの手番は同じで、Dealerの結果のみ分布から決まる
+    assert np.array_equal(played.num_actions, sampled.num_actions)
+    assert set(np.unique(sampled.rewards)) <= {-1, 0, 1}
+    assert sampled.rewards.mean() == pytest.approx(played.rewards.mean(), abs=0.05)
+
+
+def test_expected_rewards(solved_agent):
+    num_games = 5000
+    cache = DealerCache()
+    decks = shuffled_decks(num_games, np.random.default_rng(0))
+    result = play_batch(
+        solved_agent, decks, np.zeros(num_games), np.random.default_rng(1)
+    )
+    rewards = expected_rewards(result, cache)
+
+    assert (rewards >= -1).all() and (rewards <= 1).all()
+    assert rewards.mean() == pytest.approx(result.rewards.mean(), abs=0.03)
+    # 期待値で置き換えることで分散が小さくなる
+    assert rewards.var() < result.rewards.var()
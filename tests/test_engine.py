@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+
+from blackjack.base import Action, Agent, Card, Rank, Reward, Suit
+from blackjack.dealer import DealerCache
+from blackjack.engine import (
+    RANK_POINTS,
+    BlackjackEnv,
+    VectorBlackjackEnv,
+    hand_values,
+)
+from blackjack.simulator import shuffled_decks
+from blackjack.state import encode_counts_array
+
+
+@pytest.fixture
+def decks():
+    return shuffled_decks(300, np.random.default_rng(0))
+
+
+def threshold_policy(points):
+    # 総ポイントが17未満であれば引く
+    return points < 17
+
+
+class TestBlackjackEnv:
+    def test_reset(self, deck_from_ranks):
+        # 末尾から Player: 10, Dealer: 5, Player: 6, Dealer: 9 の順に配る
+        env = BlackjackEnv(deck_from_ranks([2, 9, 6, 5, 10]))
+
+        observation = env.reset()
+
+        assert env.player.total_points == 16
+        assert env.dealer.total_points == 14
+        assert observation.hands == (
+            Card(Suit.spade, Rank.ten),
+            Card(Suit.spade, Rank.six),
+        )
+        assert observation.opponent_hands == (Card(Suit.spade, Rank.five),)
+        assert not env.done
+
+    def test_draw_until_bust(self, deck_from_ranks):
+        env = BlackjackEnv(deck_from_ranks([10, 2, 9, 6, 5, 10]))
+        env.reset()
+
+        observation, reward, done = env.step(Action.draw)
+        assert (reward, done) == (None, False)
+        assert env.player.total_points == 18
+
+        observation, reward, done = env.step(Action.draw)
+        assert (observation, reward, done) == (None, Reward.lose, True)
+        assert env.reward == Reward.lose
+
+        with pytest.raises(RuntimeError):
+            env.step(Action.stand)
+
+    def test_stand(self, deck_from_ranks):
+        # Dealerは14から3を引いて17で止まる
+        env = BlackjackEnv(deck_from_ranks([10, 3, 9, 10, 5, 10]))
+        env.reset()
+
+        assert env.step(Action.stand) == (None, Reward.win, True)
+        assert env.dealer.total_points == 17
+
+    def test_reuses_hands(self, deck_from_ranks):
+        agent = Agent()
+        env = BlackjackEnv(deck_from_ranks([1] * 4 + [2] * 4), agent)
+        hand = agent.hand
+
+        env.reset()
+        env.reset()
+
+        assert agent.hand is hand
+        assert len(agent.hands) == 2
+        assert agent.total_points == 12
+
+
+class TestVectorBlackjackEnv:
+    def _play(self, env, decks, rng=None):
+        env.reset(decks, rng)
+        while not env.done.all():
+            points = hand_values(env._player_points, env._player_aces)
+            env.step(threshold_policy(points))
+        return env.rewards.copy()
+
+    def test_same_as_single_env(self, decks, deck_from_ranks):
+        rewards = self._play(VectorBlackjackEnv(), decks)
+
+        expected = []
+        for deck in decks:
+            env = BlackjackEnv(deck_from_ranks(deck))
+            env.reset()
+            done = False
+            while not done:
+                draw = threshold_policy(env.player.total_points)
+                _, reward, done = env.step(Action.draw if draw else Action.stand)
+            expected.append(reward)
+        assert list(rewards) == expected
+
+    def test_observation(self, decks):
+        env = VectorBlackjackEnv()
+        hand_codes = env.reset(decks)
+
+        for draws in (np.ones(len(decks), dtype=bool), np.zeros(len(decks), bool)):
+            expected = encode_counts_array(env.counts[:, 1:])
+            assert np.array_equal(hand_codes, expected)
+            hand_codes, _, _ = env.step(draws)
+
+    def test_reuses_arrays(self, decks):
+        env = VectorBlackjackEnv()
+        first = self._play(env, decks)
+        counts = env.counts
+
+        # 同じデッキで再びプレイすると、同じ配列に同じ結果が得られる
+        assert np.array_equal(self._play(env, decks), first)
+        assert env.counts is counts
+
+        self._play(env, decks[:10])
+        assert env.num_envs == 10
+
+    def test_done_games_are_not_stepped(self, decks):
+        env = VectorBlackjackEnv()
+        env.reset(decks)
+        _, rewards, done = env.step(np.zeros(len(decks), dtype=bool))
+        snapshot = rewards.copy(), env.num_actions.copy()
+
+        env.step(np.ones(len(decks), dtype=bool))
+
+        assert done.all()
+        assert np.array_equal(env.rewards, snapshot[0])
+        assert np.array_equal(env.num_actions, snapshot[1])
+
+    def test_dealer_cache(self, decks):
+        env = VectorBlackjackEnv(DealerCache())
+        rewards = self._play(env, decks, np.random.default_rng(0))
+
+        assert set(np.unique(rewards)) <= {-1, 0, 1}
+        # 17以上でstandしたゲームではバーストしない
+        busted = rewards == Reward.lose
+        assert busted.any()
+        points = RANK_POINTS[env.player_cards].sum(axis=1)
+        assert (points[~busted] <= 21).all()
+
+    def test_dealer_cache_requires_rng(self, decks):
+        with pytest.raises(ValueError):
+            VectorBlackjackEnv(DealerCache()).reset(decks)
+
+    def test_dealer_cache_uses_injected_rng(self, decks):
+        cache = DealerCache()
+        rewards = [
+            self._play(VectorBlackjackEnv(cache, np.random.default_rng(1)), decks)
+            for _ in range(2)
+        ]
+        assert np.array_equal(*rewards)
@@ -0,0 +1,111 @@
+import pickle
+
+import pytest
+
+from blackjack.base import Agent, Reward, Table
+from blackjack.cli import train
+from blackjack.dealer import DealerCache
+from blackjack.evaluation import EvaluationResult, evaluate, wilson_interval
+
+
+@pytest.fixture
+def solved_agent(solved_table):
+    return Agent(solved_table)
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(0, 10)
+    assert low == pytest.approx(0.0) and 0.0 < high < 1.0
+
+
+def test_result_rates():
+    result = EvaluationResult(40, 10, 50, 0.95, "max_games")
+    assert result.games == 100
+    assert result.rate(Reward.win) == 0.4
+    assert result.interval(Reward.lose) == wilson_interval(50, 100)
+    assert "100ゲーム" in str(result)
+
+
+def test_table_picklable():
+    # 並列に評価するため、Tableを別のプロセスに渡せる
+    table = Table()
+    restored = pickle.loads(pickle.dumps(table))
+    assert len(restored) == 0
+
+
+class TestEvaluate:
+    def test_stop_by_precision(self, solved_agent):
+        result = evaluate(solved_agent, precision=0.02, batch_size=1000, seed=0)
+        assert result.stopped_by == "precision"
+        for reward in Reward:
+            low, high = result.interval(reward)
+            assert (high - low) / 2 <= 0.02
+        # 打ち切りはバッチの区切りで判定する
+        assert result.games % 1000 == 0
+        assert result.games < 10000
+
+    def test_stop_by_max_games(self, solved_agent):
+        result = evaluate(
+            solved_agent, precision=1e-4, max_games=1500, batch_size=1000, seed=0
+        )
+        assert result.stopped_by == "max_games"
+        assert result.games == 1500
+
+    def test_does_not_learn(self, solved_agent):
+        values = solved_agent.table.values.copy()
+        evaluate(solved_agent, precision=0.05, batch_size=1000, seed=0)
+        assert (solved_agent.table.values == values).all()
+
+    @pytest.mark.parametrize("threshold, decision", [(0.2, "better"), (0.7, "worse")])
+    def test_sprt(self, solved_agent, threshold, decision):
+        result = evaluate(
+            solved_agent,
+            precision=1e-4,
+            min_games=100,
+            batch_size=100,
+            threshold=threshold,
+            indifference=0.05,
+            seed=0,
+        )
+        assert result.stopped_by == "sprt"
+        assert result.decision == decision
+
+    def test_workers_deterministic(self):
+        # 辞書のTableでも別のプロセスで評価できる
+        kwargs = dict(precision=0.05, batch_size=500, workers=2, seed=1)
+        first = evaluate(Agent(), **kwargs)
+        second = evaluate(Agent(), **kwargs)
+        assert first == second
+        assert first.games % 1000 == 0
+
+    def test_dealer_cache_matches_sampled(self, solved_agent):
+        kwargs = dict(precision=0.01, batch_size=5000, seed=0)
+        sampled = evaluate(solved_agent, **kwargs)
+        expected = evaluate(solved_agent, dealer_cache=DealerCache(), **kwargs)
+
+        assert expected.games % 5000 == 0
+        assert isinstance(expected.wins, float)
+        for reward in Reward:
+            low, high = sampled.interval(reward)
+            assert low <= expected.rate(reward) <= high
+
+    def test_dealer_cache_workers(self):
+        # DealerCacheも別のプロセスに渡せる
+        kwargs = dict(precision=0.05, batch_size=500, workers=2, seed=1)
+        first = evaluate(Agent(), dealer_cache=DealerCache(), **kwargs)
+        second = evaluate(Agent(), dealer_cache=DealerCache(), **kwargs)
+        assert first == second
+        assert first.games % 1000 == 0
+
+
+@pytest.mark.parametrize("engine", ["batch", "object"])
+def test_train_eval_threshold_alone(capsys, engine):
+    # --eval-precisionを指定しなくても固定のゲーム数の評価の代わりにevaluateを行う
+    train(["--engine", engine, "--episodes", "200", "--eval-threshold", "0.4"])
+    out = capsys.readouterr().out
+    assert "SPRT: " in out
+    assert "Agentの勝率" not in out
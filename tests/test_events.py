@@ -0,0 +1,148 @@
+import io
+import json
+
+import pytest
+
+from blackjack.base import Action, Reward
+from blackjack.cli import play, train
+from blackjack.engine import BlackjackEnv
+from blackjack.events import (
+    CounterListener,
+    GameListener,
+    JsonTranscriptWriter,
+    TranscriptWriter,
+)
+
+
+class RecordingListener(GameListener):
+    def __init__(self):
+        self.events = []
+
+    def on_draw(self, player, card, display_card):
+        self.events.append(("draw", type(player).__name__, card.rank.value))
+
+    def on_turn(self, player):
+        self.events.append(("turn", player.total_points))
+
+    def on_stand(self, player):
+        self.events.append(("stand", type(player).__name__))
+
+    def on_bust(self, player):
+        self.events.append(("bust", type(player).__name__))
+
+    def on_result(self, reward, player, dealer):
+        self.events.append(("result", reward))
+
+
+def test_event_order_on_stand(deck_from_ranks):
+    listener = RecordingListener()
+    # Dealerは14から3を引いて17で止まる
+    env = BlackjackEnv(deck_from_ranks([10, 3, 9, 10, 5, 10]), listeners=[listener])
+
+    env.reset()
+    env.step(Action.stand)
+
+    assert listener.events == [
+        ("draw", "BasePlayer", 10),
+        ("draw", "Dealer", 5),
+        ("draw", "BasePlayer", 10),
+        ("draw", "Dealer", 9),
+        ("turn", 20),
+        ("stand", "BasePlayer"),
+        ("draw", "Dealer", 3),
+        ("stand", "Dealer"),
+        ("result", Reward.win),
+    ]
+
+
+def test_event_order_on_bust(deck_from_ranks):
+    listener = RecordingListener()
+    env = BlackjackEnv(deck_from_ranks([10, 9, 6, 5, 10]), listeners=[listener])
+
+    env.reset()
+    env.step(Action.draw)
+
+    assert listener.events[-3:] == [
+        ("draw", "BasePlayer", 10),
+        ("bust", "BasePlayer"),
+        ("result", Reward.lose),
+    ]
+
+
+def test_transcript_writer_buffers(deck_from_ranks):
+    file = io.StringIO()
+    writer = TranscriptWriter(file, buffer_size=100)
+    env = BlackjackEnv(deck_from_ranks([10, 9, 6, 5, 10]), listeners=[writer])
+
+    env.reset()
+    env.step(Action.draw)
+    assert file.getvalue() == ""
+
+    writer.flush()
+    lines = file.getvalue().splitlines()
+    assert lines[0] == "BasePlayerはspade_10を引きました。"
+    assert lines[3] == "Dealerはカードを引きました。"
+    assert lines[-2:] == ["BasePlayerはバーストしました。", "Dealerの勝ちです。"]
+
+
+def test_invalid_buffer_size():
+    with pytest.raises(ValueError):
+        TranscriptWriter(buffer_size=0)
+
+
+def test_json_transcript_writer(tmp_path, deck_from_ranks):
+    path = tmp_path / "transcript.jsonl"
+    with JsonTranscriptWriter(open(path, "w")) as writer:
+        env = BlackjackEnv(deck_from_ranks([10, 9, 6, 5, 10]), listeners=[writer])
+        env.reset()
+        env.step(Action.draw)
+
+    with open(path) as f:
+        events = [json.loads(line) for line in f]
+    assert [e["event"] for e in events] == ["draw"] * 5 + ["bust", "result"]
+    assert events[3]["hidden"]
+    assert events[-1]["reward"] == "lose"
+    assert events[-1]["points"] == 26
+
+
+def test_counter_listener(deck_from_ranks):
+    counter = CounterListener()
+    env = BlackjackEnv(deck_from_ranks([10, 3, 9, 10, 5, 10]), listeners=[counter])
+    env.reset()
+    env.step(Action.stand)
+    env.reset(deck_from_ranks([10, 9, 6, 5, 10]))
+    env.step(Action.draw)
+
+    assert counter.summary() == {
+        "games": 2,
+        "draws": {"BasePlayer": 5, "Dealer": 5},
+        "stands": {"BasePlayer": 1, "Dealer": 1},
+        "busts": {"BasePlayer": 1},
+        "results": {"win": 1, "lose": 1},
+    }
+
+
+def test_play_prints_transcript(monkeypatch, capsys):
+    answers = iter(["input", "n"])
+    monkeypatch.setattr("builtins.input", lambda *args: next(answers))
+
+    play()
+
+    out = capsys.readouterr().out
+    assert "現在の総ポイントは" in out
+    assert "Dealerはカードを引きました。" in out
+    assert any(result in out for result in ("の勝ちです。", "引き分けです。"))
+
+
+def test_train_transcript(tmp_path, capsys):
+    path = tmp_path / "transcript.jsonl"
+    train(["--episodes", "20", "--test-episodes", "5", "--transcript", str(path)])
+
+    with open(path, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f if '"result"' in line]
+    assert len(results) == 20
+
+
+def test_train_transcript_requires_object_engine(tmp_path):
+    with pytest.raises(SystemExit):
+        train(["--engine", "batch", "--transcript", str(tmp_path / "t.jsonl")])
@@ -0,0 +1,172 @@
+import csv
+
+import numpy as np
+import pytest
+
+from blackjack.base import ACTION_INDEX, Action, Agent, DenseTable, Table
+from blackjack.checkpoint import load_table, save_table
+from blackjack.cli import train
+from blackjack.learners import (
+    Learner,
+    MonteCarlo,
+    QLambda,
+    SarsaLambda,
+    create_learner,
+    learning_curve,
+    main,
+)
+from blackjack.simulator import play_batch, register_batch, shuffled_decks
+
+DRAW = ACTION_INDEX[Action.draw]
+STAND = ACTION_INDEX[Action.stand]
+
+
+def test_monte_carlo_constant_step():
+    table = DenseTable()
+    learner = MonteCarlo(alpha=0.5)
+
+    learner.learn_episode(table, [0, 1], [DRAW, STAND], 1.0)
+    learner.learn_episode(table, [0], [DRAW], -1.0)
+
+    assert table.values[0, DRAW] == pytest.approx(0.5 + 0.5 * (-1.0 - 0.5))
+    assert table.values[1, STAND] == pytest.approx(0.5)
+    assert table._count[0, DRAW] == 2
+
+
+def test_monte_carlo_forgets_old_rewards():
+    averaged, stepped = DenseTable(), DenseTable()
+    learner = MonteCarlo(alpha=0.1)
+    for reward in [-1.0] * 100 + [1.0] * 100:
+        averaged.update_batch(np.array([0]), np.array([STAND]), np.array([reward]))
+        learner.learn_episode(stepped, [0], [STAND], reward)
+
+    assert averaged.values[0, STAND] == pytest.approx(0.0)
+    assert stepped.values[0, STAND] > 0.99
+
+
+def test_sarsa_lambda_traces():
+    table = DenseTable()
+    learner = SarsaLambda(alpha=0.5, lam=0.5)
+
+    learner.learn_episode(table, [0, 1], [DRAW, STAND], 1.0)
+
+    # 最後の手番のTD誤差1がtrace 0.5で一つ前の手番にも伝わる
+    assert table.values[1, STAND] == pytest.approx(0.5)
+    assert table.values[0, DRAW] == pytest.approx(0.25)
+
+
+def test_sarsa_lambda_zero_is_one_step_td():
+    table = DenseTable()
+    learner = SarsaLambda(alpha=0.5, lam=0.0)
+
+    learner.learn_episode(table, [0, 1], [DRAW, STAND], 1.0)
+    assert table.values[0, DRAW] == 0.0
+
+    learner.learn_episode(table, [0, 1], [DRAW, STAND], 1.0)
+    assert table.values[0, DRAW] == pytest.approx(0.25)
+
+
+def test_q_lambda_cuts_traces_after_exploration():
+    table = DenseTable()
+    table._sum[1, DRAW], table._count[1, DRAW] = 1.0, 1
+    learner = QLambda(alpha=0.5, lam=1.0)
+
+    # 状態1ではdrawの評価値が最大だが、standを選んでいる
+    learner.learn_episode(table, [0, 1], [DRAW, STAND], -1.0)
+
+    assert table.values[0, DRAW] == pytest.approx(0.5)
+    assert table.values[1, STAND] == pytest.approx(-0.5)
+
+
+def test_update_matches_update_episodes():
+    rng = np.random.default_rng(0)
+    result = play_batch(Agent(), shuffled_decks(200, rng), np.full(200, 0.5), rng)
+    batch_agent = Agent(DenseTable(), learner=SarsaLambda())
+    episode_agent = Agent(DenseTable(), learner=SarsaLambda())
+
+    register_batch(batch_agent, result)
+    for i in range(len(result)):
+        episode_agent.register_experience(*result.episode(i))
+
+    np.testing.assert_allclose(batch_agent.table._sum, episode_agent.table._sum)
+    np.testing.assert_array_equal(
+        batch_agent.table._count, episode_agent.table._count
+    )
+
+
+def test_values_survive_checkpoint(tmp_path):
+    table = DenseTable()
+    MonteCarlo(alpha=0.3).learn_episode(table, [5, 6], [DRAW, STAND], 1.0)
+    path = str(tmp_path / "table.bin")
+
+    save_table(table, path)
+
+    np.testing.assert_allclose(load_table(path).values, table.values)
+
+
+def test_requires_dense_table():
+    with pytest.raises(TypeError):
+        Agent(Table(), learner=MonteCarlo())
+
+
+@pytest.mark.parametrize(
+    "name, cls", [("mc", MonteCarlo), ("sarsa", SarsaLambda), ("q", QLambda)]
+)
+def test_create_learner(name, cls):
+    assert type(create_learner(name, alpha=0.1)) is cls
+    assert create_learner("average") is None
+
+
+@pytest.mark.parametrize(
+    "factory", [lambda: MonteCarlo(0.0), lambda: SarsaLambda(0.1, 1.5)]
+)
+def test_invalid_arguments(factory):
+    with pytest.raises(ValueError):
+        factory()
+
+
+def test_learner_requires_learn_episode():
+    class Incomplete(Learner):
+        pass
+
+    # 学習の途中ではなく、インスタンスを作る時点で失敗する
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_learning_curve():
+    curve = learning_curve(QLambda(), 2500, 1000, eval_games=500, seed=0)
+
+    assert [episodes for episodes, _ in curve] == [1000, 2000, 2500]
+    assert all(0 < rate < 1 for _, rate in curve)
+    assert curve == learning_curve(QLambda(), 2500, 1000, eval_games=500, seed=0)
+
+
+def test_main_writes_csv(tmp_path, capsys):
+    output = tmp_path / "curve.csv"
+
+    args = ["--learners", "average", "mc", "--episodes", "1000"]
+    args += ["--eval-every", "500", "--eval-games", "200", "--output", str(output)]
+    main(args)
+
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["learner"], row["episodes"]) for row in rows] == [
+        ("average", "500"),
+        ("average", "1000"),
+        ("mc", "500"),
+        ("mc", "1000"),
+    ]
+    assert "average" in capsys.readouterr().out
+
+
+def test_train_with_learner(capsys):
+    args = ["--engine", "batch", "--table", "dense", "--learner", "sarsa"]
+    args += ["--episodes", "1000", "--test-episodes", "100", "--seed", "0"]
+    train(args)
+    assert "Agentの勝率" in capsys.readouterr().out
+
+
+def test_train_learner_requires_dense():
+    with pytest.raises(SystemExit):
+        train(["--learner", "mc", "--episodes", "10"])
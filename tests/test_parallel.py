@@ -0,0 +1,48 @@
+import numpy as np
+
+from blackjack.base import DenseTable
+from blackjack.parallel import (
+    split_episodes,
+    train_parallel,
+    train_worker,
+    worker_epsilons,
+)
+from blackjack.simulator import epsilon_schedule
+
+
+def test_train_parallel_same_as_serial():
+    # プロセスを分けて学習した結果は、同じシードで順番に学習して統合した結果と一致する
+    table = train_parallel(2000, workers=2, batch_size=100, seed=0)
+
+    seeds = np.random.SeedSequence(0).spawn(2)
+    expected = DenseTable()
+    for seed in seeds:
+        expected.merge(train_worker(1000, 0.8, 0.99, 100, seed))
+
+    assert np.array_equal(table._count, expected._count)
+    assert np.array_equal(table.values, expected.values)
+
+
+def test_worker_epsilons_resume():
+    full = worker_epsilons(1000, 0.8, 0.99)
+    assert np.array_equal(full, epsilon_schedule(1000, 0.8, 0.99, 500))
+    # 再開した場合は、最初から学習した場合の続きのepsilonを用いる
+    resumed = worker_epsilons(400, 0.8, 0.99, start_episode=600)
+    assert np.array_equal(resumed, full[600:])
+
+
+def test_split_episodes():
+    assert split_episodes(1000, 2) == [(500, 0), (500, 0)]
+    assert split_episodes(1001, 2, start_episode=999) == [(500, 500), (501, 499)]
+
+
+def test_train_parallel_resume_same_as_serial():
+    table = train_parallel(1000, workers=2, batch_size=100, seed=0, start_episode=2000)
+
+    seeds = np.random.SeedSequence(0).spawn(2)
+    expected = DenseTable()
+    for seed in seeds:
+        expected.merge(train_worker(500, 0.8, 0.99, 100, seed, start_episode=1000))
+
+    assert np.array_equal(table._count, expected._count)
+    assert np.array_equal(table.values, expected.values)
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from blackjack.base import ACTION_INDEX, Action, Agent, DenseTable, Environment, Table
+from blackjack.policy import DRAW, STAND, TIE, FrozenPolicy
+from blackjack.simulator import play_batch, shuffled_decks
+from blackjack.state import NUM_STATES, state_from_index
+
+
+def env_at(index):
+    return Environment.from_key(state_from_index(int(index)))
+
+
+@pytest.fixture
+def trained_tables():
+    rng = np.random.default_rng(0)
+    decks = shuffled_decks(2000, rng)
+    result = play_batch(Agent(), decks, np.full(2000, 0.5), rng)
+    table, dense_table = Table(), DenseTable()
+    for i in range(len(result)):
+        table.update(*result.episode(i))
+        dense_table.update(*result.episode(i))
+    return table, dense_table
+
+
+def test_freeze_table_and_dense_table_agree(trained_tables):
+    table, dense_table = trained_tables
+    assert FrozenPolicy.freeze(table) == FrozenPolicy.freeze(dense_table)
+
+
+def test_freeze_does_not_mutate(trained_tables):
+    table, _ = trained_tables
+    num_envs = len(table)
+    policy = FrozenPolicy.freeze(table)
+    assert len(table) == num_envs
+
+    # 参照しても未登録のEnvironmentは追加されない
+    Agent(table).draw_again(env_at(np.flatnonzero(policy.decisions == TIE)[1]))
+    assert len(table) == num_envs
+
+
+def test_decisions_are_read_only(trained_tables):
+    policy = FrozenPolicy.freeze(trained_tables[1])
+    assert policy.decisions.dtype == np.int8
+    with pytest.raises(ValueError):
+        policy.decisions[0] = DRAW
+
+
+def test_decide_matches_agent(trained_tables):
+    _, dense_table = trained_tables
+    policy = FrozenPolicy.freeze(dense_table)
+    agent = Agent(dense_table)
+
+    states = np.flatnonzero(policy.decisions != TIE)
+    draws = policy.decide(states, rng=np.random.default_rng(0))
+    for state, draw in zip(states[:200], draws[:200]):
+        assert agent.draw_again(env_at(state)) == draw
+
+
+def test_decide_ties():
+    policy = FrozenPolicy(np.full(NUM_STATES, TIE))
+    states = np.arange(4)
+    u_tie = np.array([0.2, 0.7, 0.5, 0.9])
+    assert policy.decide(states, u_tie).tolist() == [False, True, False, True]
+
+    rng = np.random.default_rng(0)
+    expected = np.random.default_rng(0).random(4) > 0.5
+    assert policy.decide(states, rng=rng).tolist() == expected.tolist()
+
+
+def test_decide_requires_u_tie_or_rng():
+    policy = FrozenPolicy(np.full(NUM_STATES, TIE))
+    with pytest.raises(ValueError):
+        policy.decide(np.arange(4))
+
+
+def test_from_values():
+    values = np.zeros((NUM_STATES, len(Action)))
+    values[0, ACTION_INDEX[Action.draw]] = 1.0
+    values[1, ACTION_INDEX[Action.stand]] = 0.5
+    values[2] = [-0.3, -0.3]
+    policy = FrozenPolicy.from_values(values)
+    assert policy.decisions[:3].tolist() == [DRAW, STAND, TIE]
+    assert len(policy) == 2
+
+
+def test_play_batch_with_frozen_policy(trained_tables):
+    _, dense_table = trained_tables
+    policy = FrozenPolicy.freeze(dense_table)
+
+    # 同じ乱数を用いれば、凍結前のTableと全く同じようにプレイする
+    decks = shuffled_decks(500, np.random.default_rng(1))
+    result = play_batch(Agent(policy), decks, np.zeros(500), np.random.default_rng(2))
+    expected = play_batch(
+        Agent(dense_table), decks, np.zeros(500), np.random.default_rng(2)
+    )
+    assert np.array_equal(result.rewards, expected.rewards)
+    assert np.array_equal(result.num_actions, expected.num_actions)
+
+
+def test_save_load(tmp_path, trained_tables):
+    policy = FrozenPolicy.freeze(trained_tables[1])
+    path = tmp_path / "policy.npy"
+    policy.save(path)
+    assert FrozenPolicy.load(path) == policy
+
+
+def test_invalid_shape():
+    with pytest.raises(ValueError):
+        FrozenPolicy(np.zeros(10))
+
+
+def test_agent_with_frozen_policy(trained_tables):
+    # AgentのTableの代わりにも使える
+    policy = FrozenPolicy.freeze(trained_tables[1])
+    agent = Agent(policy)
+    assert agent.draw_again(env_at(np.flatnonzero(policy.decisions == DRAW)[0]))
+    assert not agent.draw_again(env_at(np.flatnonzero(policy.decisions == STAND)[0]))
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+
+from blackjack.base import Agent, DenseTable, Shoe
+from blackjack.cli import run_episode, train
+from blackjack.profiling import Profiler
+from blackjack.simulator import epsilon_schedule, train_batch
+
+
+class TestProfiler:
+    def test_lap(self):
+        profiler = Profiler()
+        t = profiler.now()
+        t = profiler.lap("a", t)
+        profiler.lap("a", t)
+
+        assert profiler.calls["a"] == 2
+        assert profiler.times["a"] >= 0
+
+    def test_snapshot_every(self):
+        profiler = Profiler(snapshot_every=10)
+        for _ in range(25):
+            profiler.episode_done(DenseTable())
+        profiler.episode_done(DenseTable(), n=10)
+
+        assert [s["episodes"] for s in profiler.snapshots] == [10, 20, 35]
+
+    def test_run_episode_phases(self):
+        profiler = Profiler()
+        agent = Agent()
+        shoe = Shoe(num_decks=1, penetration=0.0)
+        for _ in range(50):
+            shoe.start_round()
+            run_episode(agent, shoe, epsilon=0.0, profiler=profiler)
+
+        summary = profiler.summary()
+        assert {"deal", "strategy", "player", "dealer", "update"} <= set(
+            summary["phases"]
+        )
+        assert summary["phases"]["deal"]["calls"] == 50
+        assert summary["counters"]["decisions"] >= 50
+
+    def test_train_batch_phases(self):
+        profiler = Profiler(snapshot_every=100)
+        agent = Agent(DenseTable())
+        epsilons = epsilon_schedule(300, 0.8, 0.99, 150)
+
+        train_batch(agent, epsilons, 100, np.random.default_rng(0), profiler=profiler)
+
+        summary = profiler.summary()
+        assert summary["counters"]["episodes"] == 300
+        assert len(summary["snapshots"]) == 3
+        assert summary["snapshots"][-1]["table_size"] == len(agent.table)
+
+
+def test_train_writes_profile(tmp_path, capsys):
+    path = tmp_path / "profile.json"
+
+    train(
+        [
+            "--episodes",
+            "200",
+            "--test-episodes",
+            "10",
+            "--profile",
+            str(path),
+            "--profile-every",
+            "100",
+        ]
+    )
+
+    summary = json.loads(path.read_text())
+    assert summary["counters"]["episodes"] == 200
+    assert len(summary["snapshots"]) == 3
+    assert "strategy" in summary["phases"]
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from blackjack.base import Agent, DenseTable
+from blackjack.checkpoint import load_table
+from blackjack.cli import train
+from blackjack.learners import SarsaLambda
+from blackjack.replay import (
+    ExperienceLogError,
+    ExperienceWriter,
+    episode_steps,
+    main,
+    read_experiences,
+    replay,
+)
+from blackjack.simulator import epsilon_schedule, train_batch
+
+
+@pytest.fixture
+def epsilons():
+    return epsilon_schedule(500, 0.8, 0.99, 250)
+
+
+def test_episode_steps():
+    assert list(episode_steps(np.array([2, 1, 3]))) == [0, 1, 0, 0, 1, 2]
+
+
+def test_replay_same_as_training(tmp_path, epsilons):
+    path = str(tmp_path / "log.bin")
+    agent = Agent(DenseTable())
+
+    with ExperienceWriter(path, buffer_size=100) as writer:
+        agent.experience_log = writer
+        train_batch(agent, epsilons, 100, np.random.default_rng(0))
+
+    table = replay(path, chunk_size=64)
+
+    assert np.array_equal(table._count, agent.table._count)
+    assert np.array_equal(table.values, agent.table.values)
+
+
+def test_replay_with_learner_same_as_training(tmp_path, epsilons):
+    path = str(tmp_path / "log.bin")
+    agent = Agent(DenseTable(), learner=SarsaLambda(alpha=0.1, lam=0.5))
+
+    with ExperienceWriter(path, buffer_size=100) as writer:
+        agent.experience_log = writer
+        train_batch(agent, epsilons, 100, np.random.default_rng(0))
+
+    # chunkの境界がエピソードの途中に来ても同じ結果になる
+    table = replay(path, chunk_size=7, learner=SarsaLambda(alpha=0.1, lam=0.5))
+
+    assert np.array_equal(table._count, agent.table._count)
+    assert np.allclose(table.values, agent.table.values)
+
+
+def test_dict_table_logs_each_episode(tmp_path, epsilons):
+    path = str(tmp_path / "log.bin")
+    agent = Agent()
+
+    with ExperienceWriter(path) as writer:
+        agent.experience_log = writer
+        train_batch(agent, epsilons, 100, np.random.default_rng(0))
+
+    records = np.concatenate(list(read_experiences(path)))
+    num_updates = sum(sum(counts.values()) for counts in agent.table._count.values())
+    assert len(records) == num_updates
+    assert np.count_nonzero(records["step"] == 0) == len(epsilons)
+
+    table = replay(path)
+    for env, values in agent.table._table.items():
+        for action, value in values.items():
+            if agent.table._count[env][action]:
+                assert table[env][action] == pytest.approx(value)
+
+
+def test_append_to_existing_log(tmp_path, epsilons):
+    path = str(tmp_path / "log.bin")
+    for seed in range(2):
+        agent = Agent(DenseTable())
+        with ExperienceWriter(path) as writer:
+            agent.experience_log = writer
+            train_batch(agent, epsilons, 100, np.random.default_rng(seed))
+
+    records = np.concatenate(list(read_experiences(path)))
+    assert np.count_nonzero(records["step"] == 0) == 2 * len(epsilons)
+
+
+def test_truncated_record_is_skipped(tmp_path, epsilons):
+    path = tmp_path / "log.bin"
+    agent = Agent(DenseTable())
+    with ExperienceWriter(str(path)) as writer:
+        agent.experience_log = writer
+        train_batch(agent, epsilons, 100, np.random.default_rng(0))
+
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    assert np.array_equal(replay(str(path))._count, agent.table._count)
+
+
+def test_append_after_truncated_record(tmp_path, epsilons):
+    path = tmp_path / "log.bin"
+    for seed in range(2):
+        agent = Agent(DenseTable())
+        with ExperienceWriter(str(path)) as writer:
+            agent.experience_log = writer
+            train_batch(agent, epsilons, 100, np.random.default_rng(seed))
+        if seed == 0:
+            first = np.concatenate(list(read_experiences(str(path))))
+            with open(path, "ab") as f:
+                f.write(b"\x01\x02\x03")
+
+    # 途切れたレコードを切り詰めてから追記するため、後のレコードもずれない
+    records = np.concatenate(list(read_experiences(str(path))))
+    assert np.array_equal(records[: len(first)], first)
+    assert len(records) == len(first) + writer.records
+    assert np.count_nonzero(records["step"] == 0) == 2 * len(epsilons)
+    assert records["action"].max() <= 1
+
+
+def test_invalid_log(tmp_path):
+    path = tmp_path / "log.bin"
+    path.write_bytes(b"not a log at all")
+
+    with pytest.raises(ExperienceLogError):
+        replay(str(path))
+    with pytest.raises(ExperienceLogError):
+        ExperienceWriter(str(path))
+
+
+def test_train_log_and_replay(tmp_path, capsys):
+    log, table = str(tmp_path / "log.bin"), str(tmp_path / "table.bin")
+
+    train(["--episodes", "200", "--test-episodes", "10", "--log", log])
+    main([log, "--save", table])
+
+    assert load_table(table)._count.sum() == len(
+        np.concatenate(list(read_experiences(log)))
+    )
+
+
+def test_replay_main_learner(tmp_path, capsys):
+    log, table = str(tmp_path / "log.bin"), str(tmp_path / "table.bin")
+
+    train(["--episodes", "200", "--test-episodes", "10", "--log", log])
+    main([log, "--save", table, "--learner", "mc", "--alpha", "0.1"])
+
+    assert load_table(table)._count.sum() == len(
+        np.concatenate(list(read_experiences(log)))
+    )
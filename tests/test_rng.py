@@ -0,0 +1,103 @@
+import pickle
+import random
+
+import pytest
+
+from blackjack.base import (
+    Action,
+    Agent,
+    Card,
+    Deck,
+    Environment,
+    Rank,
+    Reward,
+    Shoe,
+    Suit,
+)
+from blackjack.cli import train
+from blackjack.rng import RandomStream
+
+
+class TestRandomStream:
+    def test_same_seed_same_sequence(self):
+        a, b = RandomStream(0), RandomStream(0)
+        assert [a.random() for _ in range(10)] == [b.random() for _ in range(10)]
+
+    def test_block_size_does_not_change_sequence(self):
+        a, b = RandomStream(0, block_size=3), RandomStream(0, block_size=1000)
+        assert [a.random() for _ in range(10)] == [b.random() for _ in range(10)]
+
+    def test_pickle_continues_sequence(self):
+        stream = RandomStream(0, block_size=4)
+        for _ in range(6):
+            stream.random()
+
+        copied = pickle.loads(pickle.dumps(stream))
+
+        assert [copied.random() for _ in range(10)] == [
+            stream.random() for _ in range(10)
+        ]
+
+    def test_different_seeds(self):
+        assert RandomStream(0).random() != RandomStream(1).random()
+
+    def test_shuffle(self):
+        x, y = list(range(52)), list(range(52))
+        RandomStream(0).shuffle(x)
+        RandomStream(0).shuffle(y)
+        assert x == y
+        assert sorted(x) == list(range(52))
+        assert x != list(range(52))
+
+    def test_sample(self):
+        sample = RandomStream(0).sample(list("abcdef"), 4)
+        assert len(set(sample)) == 4
+        assert set(sample) <= set("abcdef")
+
+    def test_spawn(self):
+        streams = RandomStream(0).spawn(3)
+        values = [s.random() for s in streams]
+        assert len(set(values)) == 3
+        assert values == [s.random() for s in RandomStream(0).spawn(3)]
+
+
+def test_deck_and_shoe_use_rng():
+    decks = [Deck(RandomStream(0)) for _ in range(2)]
+    for deck in decks:
+        deck.shuffle()
+    assert decks[0].cards == decks[1].cards
+
+    shoes = [Shoe(2, rng=RandomStream(0)) for _ in range(2)]
+    assert shoes[0].cards == shoes[1].cards
+
+
+def test_agent_uses_rng():
+    env = Environment(
+        [Card(Suit.spade, Rank.two), Card(Suit.spade, Rank.queen)],
+        [Card(Suit.heart, Rank.four)],
+    )
+    agent = Agent(rng=RandomStream(0))
+    agent.register_experience([env], [Action.draw], Reward.tie)
+
+    # 評価値が同じ場合は、渡した乱数列に従って選ぶ
+    expected = RandomStream(0)
+    for _ in range(20):
+        assert agent.draw_again(env) == (expected.random() > 0.5)
+
+
+@pytest.mark.parametrize("engine", ["object", "batch"])
+def test_train_repeatable(tmp_path, capsys, engine):
+    # 同じシードで学習すると、保存したTableがバイト単位で一致する
+    state = random.getstate()
+    paths = [tmp_path / f"{i}.bin" for i in range(2)]
+    for path in paths:
+        train(
+            ["--engine", engine, "--table", "dense", "--episodes", "300"]
+            + ["--test-episodes", "10", "--seed", "5", "--save", str(path)]
+        )
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+    # グローバルな乱数は用いない
+    assert random.getstate() == state
+    # 出力（表示したEnvironmentや勝率）も一致する
+    out = capsys.readouterr().out.split("Agentの勝率")
+    assert out[1].splitlines()[0] == out[2].splitlines()[0]
@@ -0,0 +1,132 @@
+import asyncio
+import random
+
+import pytest
+
+from blackjack.server import Client, GameSession, load_test, start_server
+
+
+@pytest.fixture
+def session():
+    random.seed(0)
+    return GameSession()
+
+
+class TestGameSession:
+    def test_deal(self, session):
+        response = session.handle("deal")
+        kind, points, cards, upcard = response.split()
+        assert kind == "STATE"
+        assert int(points) == session.player.total_points
+        assert len(cards.split(",")) == 2
+        assert upcard == repr(session.dealer.hands[0])
+
+    def test_commands_require_game(self, session):
+        assert session.handle("HIT").startswith("ERROR")
+        assert session.handle("STAND").startswith("ERROR")
+
+    def test_deal_twice(self, session):
+        session.handle("DEAL")
+        assert session.handle("DEAL").startswith("ERROR")
+
+    def test_unknown_command(self, session):
+        assert session.handle("SPLIT").startswith("ERROR")
+
+    def test_hit_until_bust(self, session):
+        response = session.handle("DEAL")
+        while response.startswith("STATE"):
+            response = session.handle("HIT")
+        assert response.split()[:2] == ["RESULT", "lose"]
+        assert int(response.split()[2]) > 21
+        assert not session.in_game
+
+    def test_stand(self, session):
+        session.handle("DEAL")
+        _, result, player_points, dealer_points, _ = session.handle("STAND").split()
+        player_points, dealer_points = int(player_points), int(dealer_points)
+        assert dealer_points >= 17
+        if dealer_points > 21 or player_points > dealer_points:
+            assert result == "win"
+        elif player_points < dealer_points:
+            assert result == "lose"
+        else:
+            assert result == "tie"
+        # ゲームが終わったら次のゲームを始められる
+        assert session.handle("DEAL").startswith("STATE")
+
+
+def _run_with_server(coroutine_function, **server_kwargs):
+    async def main():
+        server = await start_server(port=0, **server_kwargs)
+        async with server:
+            if "path" in server_kwargs:
+                return await coroutine_function(path=server_kwargs["path"])
+            port = server.sockets[0].getsockname()[1]
+            return await coroutine_function(port=port)
+
+    return asyncio.run(main())
+
+
+def test_client_plays_games():
+    async def play(**address):
+        client = await Client.connect(**address)
+        results = [await client.play(lambda points: points < 17) for _ in range(5)]
+        assert (await client.send("STAND")).startswith("ERROR")
+        await client.close()
+        return results
+
+    results = _run_with_server(play)
+    assert len(results) == 5
+    assert set(results) <= {"win", "tie", "lose"}
+
+
+def test_sessions_are_independent():
+    async def play(**address):
+        a = await Client.connect(**address)
+        b = await Client.connect(**address)
+        assert (await a.send("DEAL")).startswith("STATE")
+        # 別の接続のゲームには影響しない
+        assert (await b.send("HIT")).startswith("ERROR")
+        assert (await b.send("DEAL")).startswith("STATE")
+        await a.close()
+        await b.close()
+
+    _run_with_server(play)
+
+
+def test_line_too_long():
+    async def send(**address):
+        client = await Client.connect(**address)
+        client.writer.write(b"H" * (1 << 17) + b"\n")
+        response = await client._readline()
+        assert await client.reader.read() == b""
+        await client.close()
+        return response
+
+    assert _run_with_server(send) == "ERROR line too long"
+
+
+def test_unix_socket(tmp_path):
+    async def play(**address):
+        client = await Client.connect(**address)
+        result = await client.play(lambda points: False)
+        await client.close()
+        return result
+
+    assert _run_with_server(play, path=str(tmp_path / "bj.sock")) in (
+        "win",
+        "tie",
+        "lose",
+    )
+
+
+def test_load_test():
+    async def run(**address):
+        # 既定のbacklogを超える数のクライアントが同時に接続する
+        return await load_test(500, 2, **address)
+
+    report = _run_with_server(run)
+    assert report["games"] == 1000
+    assert sum(report["results"].values()) == 1000
+    assert report["commands"] >= 2000
+    assert report["latency_ms_p50"] <= report["latency_ms_p99"]
@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from blackjack.base import DenseTable
+from blackjack.cli import train
+from blackjack.shared import SharedTable, compare, train_shared
+
+
+@pytest.fixture
+def experiences():
+    rng = np.random.default_rng(0)
+    # 同じ状態とActionのペアが複数回含まれるようにする
+    states = rng.integers(0, 50, 1000)
+    actions = rng.integers(0, 2, 1000)
+    rewards = rng.integers(-1, 2, 1000).astype(np.float64)
+    return states, actions, rewards
+
+
+def test_attach_by_name(experiences):
+    with SharedTable.create() as table:
+        other = SharedTable(table.name)
+        other.update_batch(*experiences)
+
+        expected = DenseTable()
+        expected.update_batch(*experiences)
+        assert np.array_equal(table._count, expected._count)
+        assert np.array_equal(table.values, expected.values)
+        other.close()
+
+
+@pytest.mark.parametrize("num_stripes", [0, 1, 7])
+def test_update_batch_same_as_dense(experiences, num_stripes):
+    expected = DenseTable()
+    expected.update_batch(*experiences)
+
+    with SharedTable.create(num_stripes) as table:
+        table.update_batch(*experiences)
+        table.update_batch(*(a[:0] for a in experiences))
+        copied = table.to_dense()
+
+    assert type(copied) is DenseTable
+    assert np.array_equal(copied._count, expected._count)
+    assert np.allclose(copied._sum, expected._sum)
+
+
+def test_not_picklable():
+    with SharedTable.create() as table:
+        with pytest.raises(TypeError):
+            pickle.dumps(table)
+
+
+def test_unlinked_after_exit():
+    with SharedTable.create() as table:
+        name = table.name
+    with pytest.raises(FileNotFoundError):
+        SharedTable(name)
+
+
+@pytest.mark.parametrize("num_stripes, start_episode", [(0, 0), (4, 0), (0, 4000)])
+def test_train_shared(num_stripes, start_episode):
+    table = train_shared(
+        2000, workers=2, seed=0, num_stripes=num_stripes, start_episode=start_episode
+    )
+
+    # 各エピソードは少なくとも一つのActionを含む
+    assert table._count.sum() >= 2000
+    assert len(table) > 0
+
+
+def test_compare():
+    results = compare(1000, workers=2, eval_games=1000)
+
+    assert list(results) == ["single", "merge", "hogwild", "striped"]
+    for result in results.values():
+        assert result["episodes_per_sec"] > 0
+        assert 0 < result["win_rate"] < 1
+
+
+def test_train_cli_shared(capsys):
+    args = ["--engine", "batch", "--table", "dense", "--workers", "2", "--shared"]
+    args += ["--stripes", "4", "--episodes", "1000", "--test-episodes", "100"]
+    train(args)
+    assert "Agentの勝率" in capsys.readouterr().out
+
+
+def test_train_cli_shared_requires_workers():
+    with pytest.raises(SystemExit):
+        train(["--engine", "batch", "--table", "dense", "--shared"])
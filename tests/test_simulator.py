@@ -0,0 +1,153 @@
+import random
+
+import numpy as np
+import pytest
+
+from blackjack.base import (
+    ACTION_INDEX,
+    Action,
+    Agent,
+    DenseTable,
+    Reward,
+)
+from blackjack.cli import run_episode, train
+from blackjack.simulator import (
+    DECK_RANKS,
+    NUM_CARDS,
+    epsilon_schedule,
+    play_batch,
+    register_batch,
+    shuffled_decks,
+)
+
+
+class ConstantGenerator:
+    """常に同じ値を返す乱数生成器。random.randomを固定した場合と揃えるために用いる。"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def random(self, size=None):
+        return np.full(size, self.value)
+
+
+def trained_table_items(agent):
+    return {
+        (env, action): (agent.table._table[env][action], count)
+        for env, counts in agent.table._count.items()
+        for action, count in counts.items()
+        if count > 0
+    }
+
+
+@pytest.fixture
+def decks():
+    return shuffled_decks(200, np.random.default_rng(0))
+
+
+class TestShuffledDecks:
+    def test_each_deck_is_permutation(self, decks):
+        assert decks.shape == (200, NUM_CARDS)
+        for deck in decks:
+            assert sorted(deck) == sorted(DECK_RANKS)
+
+    def test_seed_is_reproducible(self):
+        decks_a = shuffled_decks(10, np.random.default_rng(1))
+        decks_b = shuffled_decks(10, np.random.default_rng(1))
+        assert np.array_equal(decks_a, decks_b)
+
+
+class TestEpsilonSchedule:
+    def test_same_as_training_loop(self):
+        epsilon, factor, num_explores = 0.8, 0.9, 5
+        expected = []
+        for episode in range(10):
+            expected.append(epsilon)
+            if episode > num_explores:
+                epsilon *= factor
+
+        assert np.allclose(epsilon_schedule(10, 0.8, 0.9, 5), expected)
+
+
+class TestPlayBatch:
+    @pytest.mark.parametrize("u", [0.2, 0.7])
+    def test_same_as_object_loop(self, decks, u, monkeypatch, deck_from_ranks):
+        # バッチの大きさが1のとき、一回ずつプレイした場合と同じTableが得られる
+        monkeypatch.setattr(random, "random", lambda: u)
+        epsilons = np.full(len(decks), 0.5)
+
+        object_agent = Agent()
+        object_rewards = []
+        for deck, epsilon in zip(decks, epsilons):
+            reward = run_episode(object_agent, deck_from_ranks(deck), epsilon)
+            object_rewards.append(reward)
+
+        batch_agent = Agent()
+        batch_rewards = []
+        for i in range(len(decks)):
+            result = play_batch(
+                batch_agent, decks[i : i + 1], epsilons[i : i + 1], ConstantGenerator(u)
+            )
+            register_batch(batch_agent, result)
+            batch_rewards.extend(result.rewards)
+
+        assert batch_rewards == object_rewards
+        assert trained_table_items(batch_agent) == trained_table_items(object_agent)
+
+    def test_batch_rewards_same_as_object_loop(
+        self, decks, monkeypatch, deck_from_ranks
+    ):
+        # Tableが固定されていれば、まとめてプレイしても結果は変わらない
+        monkeypatch.setattr(random, "random", lambda: 0.7)
+        agent = Agent()
+        for deck in decks[:100]:
+            run_episode(agent, deck_from_ranks(deck), epsilon=0.5)
+
+        result = play_batch(agent, decks, np.zeros(len(decks)), ConstantGenerator(0.7))
+        expected = [
+            run_episode(agent, deck_from_ranks(deck), learn=False) for deck in decks
+        ]
+        assert list(result.rewards) == expected
+
+    def test_dense_table_same_as_table(self, decks, monkeypatch):
+        monkeypatch.setattr(random, "random", lambda: 0.7)
+        agent = Agent()
+        dense_agent = Agent(DenseTable())
+        epsilons = np.full(len(decks), 0.5)
+
+        for start in range(0, len(decks), 50):
+            batch = slice(start, start + 50)
+            for a in (agent, dense_agent):
+                rng = ConstantGenerator(0.7)
+                register_batch(a, play_batch(a, decks[batch], epsilons[batch], rng))
+
+        for (env, action), (value, count) in trained_table_items(agent).items():
+            index = DenseTable.index(env)
+            assert dense_agent.table._count[index, ACTION_INDEX[action]] == count
+            assert dense_agent.table[env][action] == pytest.approx(value)
+        assert len(dense_agent.table) == len(
+            [env for env, counts in agent.table._count.items() if any(counts.values())]
+        )
+
+    def test_explore_always_draws_until_bust(self, decks):
+        result = play_batch(
+            Agent(), decks, np.ones(len(decks)), np.random.default_rng(0)
+        )
+        assert np.all(result.rewards == Reward.lose)
+        for i in range(len(result)):
+            envs, actions, _ = result.episode(i)
+            assert len(envs) == len(actions)
+            assert all(action == Action.draw for action in actions)
+
+
+def test_train_engines_statistically_equivalent(capsys):
+    # 同じseedでも乱数列が異なるため勝率は一致しないが、差は標本のばらつきの範囲に収まる
+    win_rates = {}
+    for engine in ("object", "batch"):
+        args = ["--engine", engine, "--seed", "0"]
+        train(args + ["--episodes", "5000", "--test-episodes", "5000"])
+        out = capsys.readouterr().out
+        win_rates[engine] = float(out.split("Agentの勝率: ")[1].split()[0])
+
+    # 5000ゲームの勝率の差の標準誤差は約0.01
+    assert abs(win_rates["object"] - win_rates["batch"]) < 0.04
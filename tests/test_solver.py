@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from blackjack.base import CARDS, Action, Card, Environment, Hand, Rank, Suit
+from blackjack.solver import Solver
+
+
+def make_env(ranks, upcard):
+    suits = [Suit.heart, Suit.diamond, Suit.club, Suit.spade]
+    hands = [Card(suits[i % 4], rank) for i, rank in enumerate(ranks)]
+    return Environment(hands, [Card(Suit.spade, upcard)])
+
+
+@pytest.fixture(scope="module")
+def solver():
+    return Solver(num_decks=1)
+
+
+class TestSolver:
+    def test_stand_on_twenty(self, solver):
+        env = make_env([Rank.king, Rank.queen], Rank.ten)
+        assert solver.best_action(env) == Action.stand
+
+    def test_draw_on_five(self, solver):
+        env = make_env([Rank.two, Rank.three], Rank.ten)
+        assert solver.best_action(env) == Action.draw
+
+    def test_draw_on_hard_twenty_one_always_busts(self, solver):
+        env = make_env([Rank.ten, Rank.five, Rank.six], Rank.seven)
+        assert solver.action_values(env)[Action.draw] == pytest.approx(-1.0)
+
+    def test_same_value_for_ten_point_ranks(self, solver):
+        values_jack = solver.action_values(make_env([Rank.jack, Rank.six], Rank.nine))
+        values_king = solver.action_values(make_env([Rank.king, Rank.six], Rank.nine))
+        assert values_jack == values_king
+
+    def test_dealer_distribution_sums_to_one(self, solver):
+        remaining = (4, 4, 4, 4, 4, 4, 4, 4, 4, 15)
+        distribution = solver.dealer_distribution(10, False, remaining)
+        assert distribution.sum() == pytest.approx(1.0)
+
+    def test_stand_value_matches_simulation(self, solver):
+        # Dealerのプレイを実際にシミュレーションした平均と一致する
+        player, upcard = [Rank.ten, Rank.eight], Rank.seven
+        env = make_env(player, upcard)
+        remaining = [c for c in CARDS if c not in env.hands + env.opponent_hands]
+
+        rng = np.random.default_rng(0)
+        rewards = []
+        for _ in range(20000):
+            order = rng.permutation(len(remaining))
+            dealer = Hand([Card(Suit.spade, upcard)])
+            for i in order:
+                if dealer.total_points >= 17:
+                    break
+                dealer.add(remaining[i])
+            if dealer.total_points > 21:
+                rewards.append(1)
+            else:
+                rewards.append(np.sign(18 - dealer.total_points))
+
+        expected = solver.action_values(env)[Action.stand]
+        assert np.mean(rewards) == pytest.approx(expected, abs=0.03)
+
+    def test_unreachable(self, solver):
+        with pytest.raises(ValueError):
+            solver.action_values(make_env([Rank.ace] * 5, Rank.two))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from blackjack.state import (
+    MAX_COUNTS,
+    NUM_RANKS,
+    decode_hand,
+    decode_state,
+    encode_counts,
+    encode_counts_array,
+    encode_hand,
+    encode_state,
+)
+
+
+class TestEncodeHand:
+    def test_order_does_not_matter(self):
+        assert encode_hand([1, 5, 13]) == encode_hand([13, 1, 5])
+
+    def test_repeated_rank(self):
+        assert encode_hand([5, 5]) != encode_hand([5])
+
+    def test_decode(self):
+        counts = decode_hand(encode_hand([1, 1, 2, 13]))
+        assert counts == (2, 1) + (0,) * 10 + (1,)
+
+    def test_max_counts(self):
+        assert decode_hand(encode_counts(MAX_COUNTS)) == MAX_COUNTS
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            encode_counts([MAX_COUNTS[0] + 1] + [0] * (NUM_RANKS - 1))
+
+
+class TestEncodeState:
+    def test_round_trip(self):
+        hand_code, opponent_code = encode_hand([2, 10]), encode_hand([1])
+        key = encode_state(hand_code, opponent_code)
+        assert decode_state(key) == (hand_code, opponent_code)
+
+    def test_swapped_hands(self):
+        hand_code, opponent_code = encode_hand([2, 10]), encode_hand([1])
+        assert encode_state(hand_code, opponent_code) != encode_state(
+            opponent_code, hand_code
+        )
+
+
+class TestEncodeCountsArray:
+    def test_same_as_encode_counts(self):
+        rng = np.random.default_rng(0)
+        counts = rng.integers(0, 4, size=(100, NUM_RANKS))
+        codes = encode_counts_array(counts)
+        assert [int(code) for code in codes] == [encode_counts(c) for c in counts]
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            encode_counts_array(np.full((1, NUM_RANKS), 16))
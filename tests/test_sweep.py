@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from blackjack.sweep import (
+    ResultCache,
+    SweepConfig,
+    grid_configs,
+    main,
+    random_configs,
+    run_config,
+    sweep,
+)
+
+
+def test_grid_configs():
+    configs = grid_configs([0.5, 0.8], [0.99], [100, 200])
+
+    assert configs == [
+        SweepConfig(0.5, 0.99, 100),
+        SweepConfig(0.5, 0.99, 200),
+        SweepConfig(0.8, 0.99, 100),
+        SweepConfig(0.8, 0.99, 200),
+    ]
+
+
+def test_random_configs():
+    configs = random_configs(20, (0.1, 0.9), (0.9, 0.999), [100, 200], seed=0)
+
+    assert len(configs) == 20
+    for config in configs:
+        assert 0.1 <= config.epsilon <= 0.9
+        assert 0.9 <= config.factor <= 0.999
+        assert config.episodes in (100, 200)
+    assert configs == random_configs(20, (0.1, 0.9), (0.9, 0.999), [100, 200], seed=0)
+
+
+def test_run_config_is_reproducible():
+    config = SweepConfig(0.8, 0.99, 500)
+
+    result = run_config(config, seed=0, eval_games=500)
+
+    assert 0 < result.win_rate < 1
+    assert result.win_rate == run_config(config, seed=0, eval_games=500).win_rate
+
+
+def test_cache_key():
+    config = SweepConfig(0.8, 0.99, 500)
+    key = ResultCache.key(config, 0, 1000, 100)
+
+    assert key == ResultCache.key(SweepConfig(0.8, 0.99, 500), 0, 1000, 100)
+    assert key != ResultCache.key(config, 1, 1000, 100)
+    assert key != ResultCache.key(config, 0, 2000, 100)
+    assert key != ResultCache.key(SweepConfig(0.8, 0.98, 500), 0, 1000, 100)
+
+
+def test_sweep_ranks_and_caches(tmp_path, monkeypatch):
+    configs = grid_configs([0.2, 0.8], [0.99], [300])
+    cache_dir = str(tmp_path / "cache")
+
+    results = sweep(configs, eval_games=500, workers=2, cache_dir=cache_dir)
+
+    assert {r.config for r in results} == set(configs)
+    assert [r.win_rate for r in results] == sorted(
+        (r.win_rate for r in results), reverse=True
+    )
+    assert not any(r.cached for r in results)
+    assert len(os.listdir(cache_dir)) == 2
+
+    # 保存済みの設定は学習しない
+    def fail(*args):
+        raise AssertionError("run_config should not be called")
+
+    monkeypatch.setattr("blackjack.sweep.run_config", fail)
+    cached = sweep(configs, eval_games=500, cache_dir=cache_dir)
+    assert all(r.cached for r in cached)
+    assert [(r.config, r.win_rate) for r in cached] == [
+        (r.config, r.win_rate) for r in results
+    ]
+
+
+def test_broken_cache_entry_is_ignored(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(SweepConfig(0.8, 0.99, 100), 0, 100, 100)
+    with open(tmp_path / f"{key}.json", "w") as f:
+        f.write("{")
+
+    assert cache.get(key) is None
+
+
+@pytest.mark.parametrize("extra", [[], ["--random", "2"]])
+def test_main(tmp_path, capsys, extra):
+    args = ["--epsilons", "0.5", "0.8", "--episodes", "200", "--eval-games", "200"]
+    args += ["--workers", "1", "--cache-dir", str(tmp_path)] + extra
+    main(args)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[0] == "rank"
+    assert len(lines) == 3
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from blackjack.base import Agent, DenseTable, Table
+from blackjack.checkpoint import read_episodes
+from blackjack.cli import train
+from blackjack.training import train_until
+
+
+def test_episode_budget():
+    report = train_until(
+        Agent(DenseTable()), np.random.default_rng(0), max_episodes=2500, window=1000
+    )
+    assert report.stopped_by == "episodes"
+    assert report.episodes == 2500
+    assert [s.episodes for s in report.history] == [1000, 2000, 2500]
+    assert report.episodes_per_sec > 0
+
+
+def test_time_budget():
+    report = train_until(
+        Agent(DenseTable()),
+        np.random.default_rng(0),
+        max_seconds=0.2,
+        window=1000,
+        patience=None,
+    )
+    assert report.stopped_by == "time"
+    # 時間はbatch_sizeごとに確認するため、大きく超過しない
+    assert report.elapsed < 1.0
+    assert report.episodes > 0
+
+
+def test_converged():
+    # 十分大きいtoleranceでは、patience個のwindowの後に収束とみなす
+    report = train_until(
+        Agent(DenseTable()),
+        np.random.default_rng(0),
+        max_episodes=100000,
+        window=1000,
+        patience=2,
+        tolerance=1.0,
+    )
+    assert report.stopped_by == "converged"
+    assert report.episodes == 2000
+
+
+def test_history():
+    windows = []
+    report = train_until(
+        Agent(Table()),
+        np.random.default_rng(0),
+        max_episodes=3000,
+        window=1000,
+        callback=windows.append,
+    )
+    assert windows == report.history
+    first, last = report.history[0], report.history[-1]
+    # 学習が進むにつれてepsilonは減衰し、方策の変化は小さくなる
+    assert last.epsilon < first.epsilon
+    assert last.policy_change < first.policy_change
+    assert 0.0 <= last.policy_change <= 1.0
+
+
+def test_same_as_dense_and_dict():
+    reports = [
+        train_until(agent, np.random.default_rng(3), max_episodes=2000, window=500)
+        for agent in (Agent(Table()), Agent(DenseTable()))
+    ]
+    for a, b in zip(*(r.history for r in reports)):
+        assert a.policy_change == pytest.approx(b.policy_change)
+        assert a.value_change == pytest.approx(b.value_change)
+
+
+def test_requires_budget():
+    with pytest.raises(ValueError):
+        train_until(Agent(), np.random.default_rng(0), patience=None)
+
+
+def test_train_cli(tmp_path, capsys):
+    path = str(tmp_path / "table.bin")
+    args = ["--engine", "batch", "--table", "dense", "--test-episodes", "10"]
+    args += ["--converge", "--window", "500", "--episodes", "1500"]
+    train(args + ["--save", path])
+    assert read_episodes(path) == 1500
+    assert "エピソード/秒" in capsys.readouterr().out
+
+
+def test_train_cli_requires_batch():
+    with pytest.raises(SystemExit):
+        train(["--time-budget", "1"])
+
+
+def test_resume_continues_epsilon_schedule():
+    kwargs = dict(max_episodes=1000, window=500, epsilon=0.8, decay=0.5)
+    fresh = train_until(Agent(DenseTable()), np.random.default_rng(0), **kwargs)
+    resumed = train_until(
+        Agent(DenseTable()), np.random.default_rng(0), start_episode=1000, **kwargs
+    )
+
+    assert [s.epsilon for s in fresh.history] == [0.8, 0.4]
+    assert [s.epsilon for s in resumed.history] == [0.2, 0.1]
+
+
+def test_train_cli_resume_decay(tmp_path, capsys):
+    path = str(tmp_path / "table.bin")
+    args = ["--engine", "batch", "--table", "dense", "--test-episodes", "10"]
+    args += ["--converge", "--window", "500", "--decay", "0.5", "--save", path]
+    train(args + ["--episodes", "1000"])
+    capsys.readouterr()
+
+    train(args + ["--episodes", "1500", "--resume", path])
+
+    assert "epsilon=0.2" in capsys.readouterr().out
+    assert read_episodes(path) == 1500